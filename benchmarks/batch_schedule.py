@@ -0,0 +1,72 @@
+"""
+Multi-line !schedule micro-benchmark.
+Schedules the same interviews once as one `!schedule` per interview (one
+transaction and one reply each) and once as a single multi-line
+`!schedule` (one transaction, one reply), and compares the cost per
+interview.
+
+Usage: python -m benchmarks.batch_schedule [--sizes 1 5 10 25] [--rounds 50]
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from benchmarks.fakes import FakeContext
+from bot.cogs.interviews import InterviewCog
+from bot.db import close_storage, manager, open_storage
+from bot.db.guilds import GuildConfigManager
+
+ENTRY = "2030-01-01 14:30 Technical Bench"
+
+
+async def one_by_one(cog, size):
+    """`size` separate !schedule commands, like users send today"""
+    sent = 0
+    for _ in range(size):
+        ctx = FakeContext(1)
+        await InterviewCog.schedule.callback(cog, ctx, text=ENTRY)
+        sent += len(ctx.sent)
+    return sent
+
+
+async def batched(cog, size):
+    """One !schedule with `size` lines"""
+    ctx = FakeContext(1)
+    await InterviewCog.schedule.callback(cog, ctx, text="\n".join([ENTRY] * size))
+    return len(ctx.sent)
+
+
+async def bench(sizes, rounds):
+    cog = InterviewCog(None)
+    await one_by_one(cog, 10)  # Warm up the connection and caches
+    print(f"{'size':>5} | {'path':>10} | {'µs/interview':>12} | {'replies':>7}")
+    for size in sizes:
+        for label, func in (("one by one", one_by_one), ("batched", batched)):
+            start = time.perf_counter()
+            for _ in range(rounds):
+                sent = await func(cog, size)
+            per_interview = (time.perf_counter() - start) / (rounds * size) * 1e6
+            print(f"{size:>5} | {label:>10} | {per_interview:12.1f} | {sent:>7}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 5, 10, 25])
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        manager.DB_FILE = os.path.join(tmp, "bench.db")
+        await open_storage()
+        try:
+            await GuildConfigManager.load_all()
+            await bench(args.sizes, args.rounds)
+        finally:
+            await close_storage()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,81 @@
+"""
+Connection pooling micro-benchmark.
+Compares `add_interview` and `get_user_interviews` throughput between a
+fresh connection per call (the old behaviour) and the pooled WAL connection.
+
+Usage: python -m benchmarks.db_throughput [--ops 2000]
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import date
+
+from bot.db import manager, sqlite
+from bot.utils.dates import to_timestamp
+
+
+def fresh_connection():
+    """The old get_db(): a brand new connection for every query"""
+    conn = sqlite3.connect(manager.DB_FILE)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def bench(label, ops):
+    add = sqlite.SQLiteStorage.add_interview.sync
+    get = sqlite.SQLiteStorage.get_user_interviews.sync
+    when = to_timestamp(date(2030, 1, 1), "14:30")
+    since = to_timestamp(date(2029, 1, 1))
+
+    start = time.perf_counter()
+    for i in range(ops):
+        add(
+            {
+                "guild_id": 1,
+                "user_id": i % 50,
+                "user_name": f"user{i % 50}",
+                "scheduled_at": when,
+                "has_time": True,
+                "timezone": "Europe/Paris",
+                "interview_type": "Technical",
+                "description": "Bench",
+                "created_at": None,
+            }
+        )
+    add_rate = ops / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i in range(ops):
+        get(1, i % 50, since)
+    get_rate = ops / (time.perf_counter() - start)
+
+    print(
+        f"{label:>6}: add_interview {add_rate:8.0f} ops/s | "
+        f"get_user_interviews {get_rate:8.0f} ops/s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--ops", type=int, default=2000)
+    args = parser.parse_args()
+
+    pooled_get_db = sqlite.get_db
+
+    for label, get_db in (("fresh", fresh_connection), ("pooled", pooled_get_db)):
+        with tempfile.TemporaryDirectory() as tmp:
+            manager.DB_FILE = os.path.join(tmp, "bench.db")
+            manager.get_db = sqlite.get_db = get_db
+            try:
+                manager.init_db()
+                bench(label, args.ops)
+            finally:
+                manager.get_db = sqlite.get_db = pooled_get_db
+                manager.close_db()
+
+
+if __name__ == "__main__":
+    main()
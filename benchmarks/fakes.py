@@ -0,0 +1,36 @@
+"""
+Stand-ins for the discord.py objects the cog callbacks touch.
+Lets benchmarks call commands directly, without Discord or a network.
+"""
+
+
+class FakePermissions:
+    def __init__(self, administrator=False):
+        self.administrator = administrator
+
+
+class FakeAuthor:
+    def __init__(self, user_id, administrator=False):
+        self.id = user_id
+        self.name = f"user{user_id}"
+        self.guild_permissions = FakePermissions(administrator)
+
+
+class FakeGuild:
+    def __init__(self, guild_id):
+        self.id = guild_id
+
+
+class FakeContext:
+    """Just enough of commands.Context for the cog callbacks
+
+    Everything the command sends is kept in `sent`.
+    """
+
+    def __init__(self, user_id, guild_id=1, administrator=False):
+        self.author = FakeAuthor(user_id, administrator)
+        self.guild = FakeGuild(guild_id)
+        self.sent = []
+
+    async def send(self, content=None, **kwargs):
+        self.sent.append(content if content is not None else kwargs)
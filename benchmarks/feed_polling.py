@@ -0,0 +1,116 @@
+"""
+Calendar feed polling benchmark.
+Serves the feeds of a guild with `--interviews` interviews through the real
+aiohttp app, then has `--subscribers` calendar apps poll them: first with
+their ETag (304s), then without (cached 200s), then with a write before
+every poll, the worst case where every poll reads the database. Prints
+requests per second and how many feeds had to be rendered again for each.
+
+Usage: python -m benchmarks.feed_polling [--subscribers 500] [--interviews 1000]
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+
+os.environ.setdefault("FEED_SECRET", "benchmark")
+
+from aiohttp.test_utils import TestClient, TestServer
+from bot.db import close_storage, manager, open_storage
+from bot.db.guilds import GuildConfigManager
+from bot.db.models import InterviewManager
+from bot.feeds import FeedCache, feed_app, feed_token
+
+GUILD_ID = 1
+USERS = 50
+
+
+async def populate(count):
+    today = date.today()
+    await InterviewManager.import_interviews(
+        GUILD_ID,
+        (
+            {
+                "user_id": i % USERS,
+                "user_name": f"user{i % USERS}",
+                "interview_date": today + timedelta(days=i % 90),
+                "interview_time": "14:30",
+                "interview_type": "Technical",
+                "description": f"Round {i}",
+            }
+            for i in range(count)
+        ),
+    )
+
+
+async def poll(client, urls, etags=None, before=None):
+    """Every subscriber polls once, returns (requests/s, status counts)"""
+    statuses = {}
+    start = time.perf_counter()
+    for url in urls:
+        if before is not None:
+            await before()
+        headers = {"If-None-Match": etags[url]} if etags else {}
+        async with client.get(url, headers=headers) as response:
+            await response.read()
+            statuses[response.status] = statuses.get(response.status, 0) + 1
+    return len(urls) / (time.perf_counter() - start), statuses
+
+
+async def bench(subscribers, interviews):
+    await populate(interviews)
+    cache = FeedCache()
+    # Most subscribe to their own feed, one in ten to the whole guild's
+    urls = [
+        f"/feeds/{feed_token(GUILD_ID, None if i % 10 == 0 else i % USERS)}.ics"
+        for i in range(subscribers)
+    ]
+
+    async def write():
+        await InterviewManager.add_interview(
+            GUILD_ID, 0, "user0", date.today(), None, "Bench", ""
+        )
+
+    async with TestClient(TestServer(feed_app(cache))) as client:
+        etags = {}
+        for url in set(urls):
+            async with client.get(url) as response:
+                etags[url] = response.headers["ETag"]
+        print(f"{len(etags)} feeds, {cache.renders} renders to warm up")
+
+        cases = (
+            ("304 (ETag)", dict(etags=etags)),
+            ("200 cached", {}),
+            ("after write", dict(before=write)),
+        )
+        print(f"{'case':>12} | {'req/s':>8} | {'renders':>7} | statuses")
+        for label, kwargs in cases:
+            renders = cache.renders
+            per_second, statuses = await poll(client, urls, **kwargs)
+            print(
+                f"{label:>12} | {per_second:8.0f} | {cache.renders - renders:>7} | "
+                f"{statuses}"
+            )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--subscribers", type=int, default=500)
+    parser.add_argument("--interviews", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        manager.DB_FILE = os.path.join(tmp, "bench.db")
+        await open_storage()
+        try:
+            await GuildConfigManager.load_all()
+            await bench(args.subscribers, args.interviews)
+        finally:
+            await close_storage()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,405 @@
+"""
+Offline gateway simulator.
+Boots the real bot from bot/core.py against a fake HTTP client and a fake
+gateway, then floods it with MESSAGE_CREATE events from simulated users.
+Every message the bot sends is recorded instead of reaching Discord, so the
+whole thing runs on a machine with no network.
+
+Reports command throughput, tail latency (event received -> command done)
+and event-loop lag, optionally while every guild's daily digest fans out.
+
+Usage: python -m benchmarks.gateway_sim [--events 5000] [--rate 2000] [--digests]
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timezone
+
+# No metrics server or real database needed for a simulation
+os.environ["METRICS_PORT"] = "0"
+
+from bot.core import create_bot  # noqa: E402
+from bot.db import manager  # noqa: E402
+from bot.db.guilds import GuildConfigManager  # noqa: E402
+from benchmarks.loop_lag import measure_lag  # noqa: E402
+
+BOT_USER_ID = 1000
+# Snowflake-looking IDs for everything the simulator makes up
+_ids = itertools.count(10**17)
+
+# Share of each command in the simulated traffic
+WORKLOAD = [
+    ("schedule", 40),
+    ("my_interviews", 20),
+    ("total", 10),
+    ("search", 10),
+    ("history", 10),
+    ("update_interview", 5),
+    ("delete_interview", 5),
+]
+
+SEARCH_WORDS = ["python", "backend", "system design", "react", "onsite", "hr"]
+
+
+def _now_iso():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def user_payload(user_id, bot_account=False):
+    return {
+        "id": str(user_id),
+        "username": f"user{user_id}",
+        "global_name": None,
+        "discriminator": "0",
+        "avatar": None,
+        "bot": bot_account,
+    }
+
+
+def guild_payload(guild_id, channel_id, owner_id):
+    return {
+        "id": str(guild_id),
+        "name": f"Guild {guild_id}",
+        "owner_id": str(owner_id),
+        "roles": [
+            {
+                "id": str(guild_id),  # @everyone shares the guild's ID
+                "name": "@everyone",
+                "permissions": "68608",  # View channel, send and read messages
+                "position": 0,
+                "color": 0,
+                "hoist": False,
+                "managed": False,
+                "mentionable": False,
+            }
+        ],
+        "channels": [
+            {
+                "id": str(channel_id),
+                "type": 0,
+                "name": "interviews",
+                "position": 0,
+                "permission_overwrites": [],
+            }
+        ],
+        "members": [],
+        "emojis": [],
+        "stickers": [],
+        "features": [],
+        "member_count": 0,
+    }
+
+
+class FakeHTTPClient:
+    """Records outgoing messages instead of calling Discord's REST API
+
+    Only the endpoints the bot actually uses are implemented. Any other call
+    is counted in `unexpected` and answers with an empty payload.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency  # Simulated round trip of every request
+        self.sent = []  # (monotonic time, channel ID, content)
+        self.unexpected = {}
+        self.loop = None
+
+    async def static_login(self, token):
+        return user_payload(BOT_USER_ID, bot_account=True)
+
+    async def application_info(self):
+        return {
+            "id": str(BOT_USER_ID),
+            "name": "pweaseHiredMe",
+            "description": "",
+            "icon": None,
+            "bot_public": True,
+            "bot_require_code_grant": False,
+            "owner": user_payload(1),
+            "verify_key": "",
+            "flags": 0,
+        }
+
+    def _message(self, channel_id, payload, message_id=None):
+        return {
+            "id": str(message_id or next(_ids)),
+            "channel_id": str(channel_id),
+            "author": user_payload(BOT_USER_ID, bot_account=True),
+            "content": payload.get("content") or "",
+            "timestamp": _now_iso(),
+            "edited_timestamp": None,
+            "tts": False,
+            "mention_everyone": False,
+            "mentions": [],
+            "mention_roles": [],
+            "attachments": [],
+            "embeds": payload.get("embeds") or [],
+            "pinned": False,
+            "type": 0,
+        }
+
+    async def send_message(self, channel_id, *, params):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        payload = params.payload or {}
+        self.sent.append((time.monotonic(), int(channel_id), payload.get("content")))
+        return self._message(channel_id, payload)
+
+    async def edit_message(self, channel_id, message_id, *, params):
+        return self._message(channel_id, params.payload or {}, message_id)
+
+    async def bulk_upsert_global_commands(self, application_id, payload):
+        return [
+            dict(command, id=str(next(_ids)), application_id=str(application_id))
+            for command in payload
+        ]
+
+    async def close(self):
+        pass
+
+    def __getattr__(self, name):
+        async def unexpected(*args, **kwargs):
+            self.unexpected[name] = self.unexpected.get(name, 0) + 1
+            return {}
+
+        return unexpected
+
+
+class Simulator:
+    """Drives the bot like a gateway would, and times every command"""
+
+    def __init__(self, guilds, users, seed=42):
+        self.rng = random.Random(seed)
+        self.guilds = []  # (guild ID, channel ID)
+        self.users = users
+        self.injected = {}  # message ID -> monotonic time it was injected
+        self.latencies = []
+        self.errors = {}
+        self.injected_count = 0
+        self.bot = create_bot()
+
+        for _ in range(guilds):
+            self.guilds.append((next(_ids), next(_ids)))
+
+    async def boot(self):
+        """Log in with the fake HTTP client and replay a READY"""
+        bot = self.bot
+        bot.http = bot._connection.http = bot.tree._http = FakeHTTPClient()
+
+        # What run() does, minus the network
+        await bot.prepare_db()
+        await bot.login("simulated")
+
+        for guild_id, channel_id in self.guilds:
+            bot._connection._add_guild_from_data(
+                guild_payload(guild_id, channel_id, owner_id=1)
+            )
+            # Reminders and digests go to the same channel commands come from
+            await GuildConfigManager.update(guild_id, channel_id=channel_id)
+
+        bot.add_listener(self.on_command_completion, "on_command_completion")
+        bot.add_listener(self.on_command_error, "on_command_error")
+
+        bot._ready.set()
+        bot.dispatch("ready")
+
+    def _done(self, ctx):
+        start = self.injected.pop(ctx.message.id, None)
+        if start is not None:
+            self.latencies.append(time.monotonic() - start)
+
+    async def on_command_completion(self, ctx):
+        self._done(ctx)
+
+    async def on_command_error(self, ctx, error):
+        name = type(getattr(error, "original", error)).__name__
+        self.errors[name] = self.errors.get(name, 0) + 1
+        self._done(ctx)
+
+    def command_text(self):
+        """Pick a command according to WORKLOAD"""
+        name = self.rng.choices(
+            [name for name, _ in WORKLOAD], [weight for _, weight in WORKLOAD]
+        )[0]
+        day = f"2030-{self.rng.randint(1, 12):02d}-{self.rng.randint(1, 28):02d}"
+        # Random IDs near the top of the table, most belong to someone else
+        interview_id = self.rng.randint(1, max(1, self.injected_count // 2))
+
+        if name == "schedule":
+            return f'!schedule {day} {self.rng.randint(8, 18)}:30 Technical "Sim interview"'
+        if name == "search":
+            return f"!search {self.rng.choice(SEARCH_WORDS)}"
+        if name == "update_interview":
+            return f"!update_interview {interview_id} time=16:00"
+        if name == "delete_interview":
+            return f"!delete_interview {interview_id}"
+        return f"!{name}"
+
+    def inject(self):
+        """Feed one MESSAGE_CREATE through discord.py's real parser"""
+        guild_id, channel_id = self.rng.choice(self.guilds)
+        user_id = self.rng.randint(2, self.users + 1)
+        message_id = next(_ids)
+
+        data = {
+            "id": str(message_id),
+            "channel_id": str(channel_id),
+            "guild_id": str(guild_id),
+            "author": user_payload(user_id),
+            "member": {
+                "roles": [],
+                "joined_at": _now_iso(),
+                "deaf": False,
+                "mute": False,
+                "flags": 0,
+            },
+            "content": self.command_text(),
+            "timestamp": _now_iso(),
+            "edited_timestamp": None,
+            "tts": False,
+            "mention_everyone": False,
+            "mentions": [],
+            "mention_roles": [],
+            "attachments": [],
+            "embeds": [],
+            "pinned": False,
+            "type": 0,
+        }
+
+        self.injected[message_id] = time.monotonic()
+        self.injected_count += 1
+        self.bot._connection.parse_message_create(data)
+
+    async def run(self, events, rate, digests):
+        """Inject `events` messages at `rate` per second and wait for them"""
+        stop = asyncio.Event()
+        lag = []
+        probe = asyncio.create_task(measure_lag(stop, lag))
+
+        if digests:
+            # Every guild's daily digest fires in the middle of the flood
+            tasks_cog = self.bot.get_cog("TasksCog")
+            asyncio.get_running_loop().call_later(
+                events / rate / 2,
+                lambda: [
+                    asyncio.create_task(tasks_cog.run_daily_digest(guild_id))
+                    for guild_id, _ in self.guilds
+                ],
+            )
+
+        start = time.monotonic()
+        interval = 1 / rate
+        for i in range(events):
+            # Open loop: keep the schedule even if the bot falls behind
+            delay = start + i * interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            elif i % 100 == 0:
+                await asyncio.sleep(0)
+            self.inject()
+        inject_time = time.monotonic() - start
+
+        # Wait for the stragglers
+        deadline = time.monotonic() + 60
+        while self.injected and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        elapsed = time.monotonic() - start
+        await self.bot.dispatcher.stop()
+
+        stop.set()
+        await probe
+        return inject_time, elapsed, lag
+
+
+def percentiles(samples):
+    samples = sorted(samples) or [0.0]
+
+    def pick(p):
+        return samples[min(len(samples) - 1, int(len(samples) * p))] * 1000
+
+    return {
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+        "max_ms": samples[-1] * 1000,
+    }
+
+
+async def simulate(args):
+    sim = Simulator(args.guilds, args.users, args.seed)
+    await sim.boot()
+    await asyncio.sleep(0.1)  # Let the scheduler build its job list
+
+    inject_time, elapsed, lag = await sim.run(args.events, args.rate, args.digests)
+    bot = sim.bot
+    http = bot.http
+    completed = len(sim.latencies)
+
+    report = {
+        "events": args.events,
+        "target_rate": args.rate,
+        "achieved_inject_rate": args.events / inject_time,
+        "completed": completed,
+        "timed_out": len(sim.injected),
+        "throughput_cmd_per_sec": completed / elapsed,
+        "latency": percentiles(sim.latencies),
+        "loop_lag": percentiles(lag),
+        "errors": sim.errors,
+        "messages_sent": len(http.sent),
+        "dispatcher": bot.dispatcher.stats(),
+        "unexpected_http_calls": http.unexpected,
+    }
+
+    await bot.election.stop()
+    await bot.change_tailer.stop()
+    await bot.close()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--rate", type=float, default=2000, help="events per second")
+    parser.add_argument("--guilds", type=int, default=10)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--digests", action="store_true")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="also write the report to this JSON file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        manager.DB_FILE = os.path.join(tmp, "sim.db")
+        report = asyncio.run(simulate(args))
+        manager.close_db()
+
+    latency, lag = report["latency"], report["loop_lag"]
+    print(
+        f"📨 {report['completed']}/{report['events']} commands "
+        f"({report['timed_out']} timed out), injected at "
+        f"{report['achieved_inject_rate']:.0f}/s"
+    )
+    print(f"⚡ Throughput: {report['throughput_cmd_per_sec']:.0f} cmd/s")
+    print(
+        f"⏱️ Latency: p50 {latency['p50_ms']:.1f} ms, p95 {latency['p95_ms']:.1f} ms, "
+        f"p99 {latency['p99_ms']:.1f} ms, max {latency['max_ms']:.1f} ms"
+    )
+    print(
+        f"🔁 Loop lag: p50 {lag['p50_ms']:.2f} ms, p99 {lag['p99_ms']:.2f} ms, "
+        f"max {lag['max_ms']:.2f} ms"
+    )
+    print(f"📤 {report['messages_sent']} messages sent, errors: {report['errors']}")
+    if report["unexpected_http_calls"]:
+        print(f"⚠️ Unexpected HTTP calls: {report['unexpected_http_calls']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
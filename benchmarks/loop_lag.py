@@ -0,0 +1,92 @@
+"""
+Event-loop lag benchmark.
+Floods the `!schedule` command concurrently and measures how late the event
+loop wakes up while the database is busy.
+
+Usage: python -m benchmarks.loop_lag [--commands 500]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from bot.db import manager
+from bot.db.sqlite import SQLiteStorage
+from bot.cogs.interviews import InterviewCog
+from benchmarks.fakes import FakeContext
+
+
+async def measure_lag(stop, samples, interval=0.001):
+    """Record how late each short sleep wakes up compared to what we asked for"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(time.perf_counter() - start - interval)
+
+
+async def flood(count, blocking):
+    cog = InterviewCog(None)
+    add_async = SQLiteStorage.add_interview
+
+    if blocking:
+        # Simulate the old behaviour by running the query right on the loop
+        add_sync = add_async.sync
+
+        async def add_blocking(*args):
+            return add_sync(*args)
+
+        SQLiteStorage.add_interview = staticmethod(add_blocking)
+
+    stop = asyncio.Event()
+    samples = []
+    probe = asyncio.create_task(measure_lag(stop, samples))
+    await asyncio.sleep(0.01)
+
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(
+            *(
+                InterviewCog.schedule.callback(
+                    cog, FakeContext(i % 50), text="2030-01-01 14:30 Technical Bench"
+                )
+                for i in range(count)
+            )
+        )
+    finally:
+        SQLiteStorage.add_interview = staticmethod(add_async)
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await probe
+    return elapsed, samples
+
+
+def report(label, elapsed, samples, count):
+    samples = sorted(samples) or [0.0]
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    print(
+        f"{label:>9}: {count / elapsed:8.0f} cmd/s | loop lag "
+        f"mean {statistics.mean(samples) * 1000:6.2f} ms, "
+        f"p99 {p99 * 1000:6.2f} ms, max {samples[-1] * 1000:6.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--commands", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        manager.DB_FILE = os.path.join(tmp, "bench.db")
+        manager.init_db()
+
+        for label, blocking in (("blocking", True), ("worker", False)):
+            elapsed, samples = asyncio.run(flood(args.commands, blocking))
+            report(label, elapsed, samples, args.commands)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Command parser throughput benchmark.
+Compares the old `!update_interview` parser (a findall for quoted values,
+then an any() over them for every word, then strptime checks) with
+bot.utils.parser on inputs with more and more key=value pairs, and times
+`!schedule` lines with absolute and relative dates.
+
+Usage: python -m benchmarks.parser_throughput [--pairs 4 16 64 256]
+"""
+
+import argparse
+import re
+import time
+from datetime import date
+
+from bot.utils.parser import UPDATE_KEYS, parse_schedule, parse_updates
+from bot.utils.validators import validate_date, validate_time
+
+# Each case runs for at least this many seconds
+MIN_TIME = 0.3
+
+SCHEDULE_LINES = {
+    "absolute": '2030-03-01 14:30 Technical "System Design round"',
+    "relative": 'next fri 2:30pm Technical "System Design round"',
+    "in N days": "in 3 days Onsite panel with the team",
+}
+
+
+def legacy_parse_updates(updates):
+    """The old !update_interview parsing and validation, for comparison"""
+    update_dict = {}
+
+    quoted_parts = re.findall(r'(\w+)=("(?:[^"\\]|\\.)*")', updates)
+    for key, value in quoted_parts:
+        key = key.lower()
+        if key in UPDATE_KEYS:
+            update_dict[UPDATE_KEYS[key]] = value[1:-1]
+
+    for part in updates.split():
+        if "=" in part and not any(part.startswith(f"{k}=") for k, _ in quoted_parts):
+            key, value = part.split("=", 1)
+            key = key.lower()
+            if key in UPDATE_KEYS and UPDATE_KEYS[key] not in update_dict:
+                update_dict[UPDATE_KEYS[key]] = value
+
+    if "interview_date" in update_dict:
+        update_dict["interview_date"] = validate_date(update_dict["interview_date"])
+    if "interview_time" in update_dict:
+        validate_time(update_dict["interview_time"])
+    return update_dict
+
+
+def update_text(pairs):
+    """`pairs` key=value pairs, half of them quoted, the real keys last"""
+    parts = []
+    for i in range(pairs - 4):
+        parts.append(f'note{i}="quoted {i}"' if i % 2 else f"tag{i}=x{i}")
+    parts += ["date=2030-03-01", "time=15:30", "type=Technical", 'desc="Panel"']
+    return " ".join(parts)
+
+
+def rate(func):
+    """Calls per second of `func`, over at least MIN_TIME seconds"""
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        for _ in range(100):
+            func()
+        calls += 100
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_TIME:
+            return calls / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pairs", type=int, nargs="+", default=[4, 16, 64, 256])
+    args = parser.parse_args()
+    today = date.today()
+
+    print(f"{'update pairs':>12} | {'legacy/s':>10} | {'parser/s':>10} | speedup")
+    for pairs in args.pairs:
+        text = update_text(max(pairs, 4))
+        old = rate(lambda: legacy_parse_updates(text))
+        new = rate(lambda: parse_updates(text, today))
+        print(f"{pairs:>12} | {old:10.0f} | {new:10.0f} | {new / old:6.2f}x")
+
+    print()
+    for name, line in SCHEDULE_LINES.items():
+        per_second = rate(lambda: parse_schedule(line, today))
+        print(f"schedule {name:>10}: {per_second:10.0f} lines/s")
+
+
+if __name__ == "__main__":
+    main()
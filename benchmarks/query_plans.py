@@ -0,0 +1,160 @@
+"""
+Query plan check.
+Calls every SQLiteStorage method against a fully migrated scratch database,
+records the statements they really run with a trace callback, then runs
+EXPLAIN QUERY PLAN on each and fails if any of them scans the interviews or
+interviews_archive table instead of searching an index.
+
+Usage: python -m benchmarks.query_plans
+"""
+
+import os
+import re
+import sys
+import tempfile
+from datetime import date, datetime
+
+from bot.db import manager
+from bot.db.sqlite import SQLiteStorage
+from bot.utils.dates import to_timestamp
+
+# Tables that grow with every interview ever scheduled
+BIG_TABLES = ("interviews", "interviews_archive")
+
+# "SCAN x USING (COVERING) INDEX" still walks a whole index
+TABLE_SCAN = re.compile(rf"^SCAN ({'|'.join(BIG_TABLES)})\b")
+
+# Statements with a plan worth checking
+PLANNED = re.compile(r"^\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b", re.IGNORECASE)
+
+WHEN = to_timestamp(date(2030, 1, 1), "14:30")
+DAY = 24 * 60 * 60
+
+
+def _interview(**columns):
+    values = {
+        "guild_id": 1,
+        "user_id": 1,
+        "user_name": "user1",
+        "scheduled_at": WHEN,
+        "has_time": True,
+        "timezone": "Europe/Paris",
+        "interview_type": "Technical",
+        "description": "System design",
+        "created_at": datetime.now().isoformat(),
+    }
+    values.update(columns)
+    return values
+
+
+# (method, args, kwargs), in order, covering every branch of every method's
+# SQL. The rows added first give the later calls something to find.
+CALLS = [
+    ("add_interview", (_interview(),), {}),
+    ("add_interviews", ([_interview(), _interview(guild_id=0)],), {}),
+    ("add_interview_batch", ([_interview(scheduled_at=WHEN - DAY)],), {}),
+    ("get_interview", (1, 1), {}),
+    ("update_interview", (1, 1, 1, {"interview_type": "HR"}), {}),
+    ("update_interview", (1, 1, 1, {}), {"new_date": date(2030, 1, 2)}),
+    ("update_interview", (1, 1, 1, {}), {"new_time": "09:00"}),
+    ("delete_interview", (1, 2, 1), {}),
+    ("get_user_interviews", (1, 1), {}),
+    ("get_user_interviews", (1, 1, WHEN), {}),
+    ("get_interviews_between", (1, WHEN), {}),
+    ("get_interviews_between", (1, WHEN, WHEN + DAY), {}),
+    ("get_future_interviews_page", (1, WHEN), {}),
+    ("get_future_interviews_page", (1, WHEN), {"after": (WHEN, 1)}),
+    ("get_interviews_page", (1, False), {}),
+    ("get_interviews_page", (1, False), {"after": 1}),
+    ("get_interviews_page", (1, True), {}),
+    ("get_interviews_page", (1, True), {"after": 1}),
+    ("get_user_history_page", (1, 1), {}),
+    ("get_user_history_page", (1, 1), {"after": (WHEN, 1)}),
+    ("search_interviews", (1, "syst"), {}),
+    ("search_interviews", (1, "syst des", 1), {"after": (-1.0, 1)}),
+    ("get_interview_counts", (1, "lifetime", "2030-W01", "2030-01"), {}),
+    ("get_interview_counts", (1, "weekly", "2030-W01", "2030-01"), {}),
+    ("get_interview_counts", (1, "monthly", "2030-W01", "2030-01"), {}),
+    ("get_user_total_count", (1, 1), {}),
+    ("archive_interviews_chunk", (1, WHEN, 500), {}),
+    ("adopt_legacy_interviews", (1,), {}),
+    ("get_upcoming_reminders", (WHEN - 2 * DAY,), {}),
+    (
+        "save_guild_config",
+        ({"guild_id": 1, "channel_id": 1, "timezone": "UTC", "reminder_hour": 9},),
+        {},
+    ),
+    ("load_guild_configs", (), {}),
+    ("acquire_lease", ("tasks", "a", 30), {}),
+    ("release_lease", ("tasks", "a"), {}),
+    ("latest_change", (), {}),
+    ("read_changes", (0, 500), {}),
+    ("ack_changes", ("reader", 1), {}),
+    ("ack_changes", ("reader", 2), {}),
+    ("prune_changes", (60,), {}),
+]
+
+
+def capture_statements(conn):
+    """Run every call in CALLS, returns [(method, statement)] as run
+
+    Must be called on the thread that owns `conn`, the methods run their
+    blocking versions (`.sync`) here instead of on the DB worker thread.
+    """
+    statements = []
+    current = None
+
+    def trace(statement):
+        # Statements run by triggers come through as "-- TRIGGER ..."
+        if PLANNED.match(statement):
+            statements.append((current, statement))
+
+    conn.set_trace_callback(trace)
+    try:
+        for current, args, kwargs in CALLS:
+            getattr(SQLiteStorage, current).sync(*args, **kwargs)
+    finally:
+        conn.set_trace_callback(None)
+    return list(dict.fromkeys(statements))
+
+
+def explain(conn, statement):
+    """The steps of a statement's query plan"""
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {statement}")]
+
+
+def table_scans(plan):
+    """Steps of a plan that read a whole big table"""
+    return [step for step in plan if TABLE_SCAN.match(step)]
+
+
+def check_plans(conn):
+    """Print each plan and return the methods whose queries scan a big table"""
+    failures = []
+    for method, statement in capture_statements(conn):
+        plan = explain(conn, statement)
+        print(f"{method}: {' '.join(statement.split())[:100]}")
+        for step in plan:
+            print(f"    {step}")
+        if table_scans(plan) and method not in failures:
+            failures.append(method)
+    return failures
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        manager.DB_FILE = os.path.join(tmp, "plans.db")
+        manager.init_db()
+        try:
+            failures = check_plans(manager.get_db())
+        finally:
+            manager.close_db()
+
+    if failures:
+        print(f"❌ Queries scanning {' or '.join(BIG_TABLES)}: {', '.join(failures)}")
+        sys.exit(1)
+    print("✅ Every query is served by an index")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,499 @@
+"""
+Benchmark suite.
+Times every InterviewManager method, the formatters, validators and the
+!update_interview parser, and the cog commands end to end through a fake
+Context, against synthetic datasets of increasing size. Results are written
+to JSON so runs from different commits can be compared.
+
+Usage:
+    python -m benchmarks.suite --sizes 1000 10000 100000 --output after.json
+    python -m benchmarks.suite --compare before.json after.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+from bot.db import manager
+from bot.db.cache import query_cache
+from bot.db.guilds import GuildConfigManager
+from bot.db.models import ARCHIVE_CHUNK_SIZE, InterviewManager
+from bot.db.sqlite import SQLiteStorage
+from bot.cogs.admin import AdminCog
+from bot.cogs.interviews import InterviewCog
+from bot.db.index import interview_index
+from bot.utils.dates import (
+    day_bounds,
+    day_start,
+    local_now,
+    period_keys,
+    to_timestamp,
+)
+from bot.utils.formatters import (
+    format_interview_list,
+    iter_interview_pages,
+)
+from bot.utils.parser import parse_schedule, parse_updates
+from bot.utils.validators import validate_date, validate_time
+from benchmarks.fakes import FakeContext
+from benchmarks.synthetic import generate
+
+# Each benchmark runs for at least MIN_TIME seconds, and at most MAX_CALLS times
+MIN_TIME = 0.2
+MAX_CALLS = 2000
+
+# A p50 this much slower than the baseline counts as a regression
+REGRESSION_THRESHOLD = 0.20
+
+
+def summarize(group, name, rows, durations):
+    """Turn raw per-call durations into one result entry"""
+    durations = sorted(durations)
+
+    def percentile(p):
+        return durations[min(len(durations) - 1, int(len(durations) * p))] * 1000
+
+    total = sum(durations)
+    return {
+        "group": group,
+        "name": name,
+        "rows": rows,
+        "calls": len(durations),
+        "mean_ms": total / len(durations) * 1000,
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "ops_per_sec": len(durations) / total if total else None,
+    }
+
+
+def measure(func, max_calls=MAX_CALLS):
+    """Call `func()` repeatedly and return the duration of every call"""
+    durations = []
+    deadline = time.perf_counter() + MIN_TIME
+    while len(durations) < max_calls:
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+        if start > deadline:
+            break
+    return durations
+
+
+async def measure_async(func, max_calls=MAX_CALLS):
+    """Like measure(), for a coroutine function"""
+    durations = []
+    deadline = time.perf_counter() + MIN_TIME
+    while len(durations) < max_calls:
+        start = time.perf_counter()
+        await func()
+        durations.append(time.perf_counter() - start)
+        if start > deadline:
+            break
+    return durations
+
+
+def sample_ids(conn):
+    """A guild, one of its users and one of that user's interviews"""
+    row = conn.execute(
+        "SELECT guild_id, user_id, id FROM interviews WHERE guild_id = 1 LIMIT 1"
+    ).fetchone()
+    return row["guild_id"], row["user_id"], row["id"]
+
+
+def bench_data_layer(rows, results):
+    """Every storage query, through SQLiteStorage's .sync so the cache stays out of it"""
+    conn = manager.get_db()
+    guild_id, user_id, interview_id = sample_ids(conn)
+    db = SQLiteStorage
+    tz_name = GuildConfigManager.timezone(guild_id)
+    today = local_now(tz_name).date()
+    since = day_start(today, tz_name)
+    week, month = period_keys(local_now(tz_name))
+    now = time.time()
+
+    def interview(description):
+        return {
+            "guild_id": guild_id,
+            "user_id": user_id,
+            "user_name": "bench",
+            "scheduled_at": to_timestamp(date(2030, 1, 1), "09:00", tz_name),
+            "has_time": True,
+            "timezone": tz_name,
+            "interview_type": "Technical",
+            "description": description,
+            "created_at": datetime.now().isoformat(),
+        }
+
+    # Interviews for delete_interview to remove one per call
+    for _ in range(200):
+        db.add_interview.sync(interview("Doomed"))
+    doomed = [
+        row["id"]
+        for row in conn.execute(
+            "SELECT id FROM interviews WHERE description = 'Doomed' ORDER BY id"
+        )
+    ]
+
+    benchmarks = [
+        (
+            "add_interview",
+            lambda: db.add_interview.sync(interview("Bench")),
+            MAX_CALLS,
+        ),
+        (
+            "update_interview",
+            lambda: db.update_interview.sync(
+                guild_id, interview_id, user_id, {"description": "Updated"}
+            ),
+            MAX_CALLS,
+        ),
+        (
+            "delete_interview",
+            lambda: db.delete_interview.sync(guild_id, doomed.pop(), user_id),
+            len(doomed),
+        ),
+        (
+            "get_user_interviews",
+            lambda: db.get_user_interviews.sync(guild_id, user_id, since),
+            MAX_CALLS,
+        ),
+        (
+            "get_user_interviews(include_past)",
+            lambda: db.get_user_interviews.sync(guild_id, user_id),
+            MAX_CALLS,
+        ),
+        (
+            "get_today_interviews",
+            lambda: db.get_interviews_between.sync(
+                guild_id, *day_bounds(today, tz_name)
+            ),
+            MAX_CALLS,
+        ),
+        (
+            "get_all_future_interviews",
+            lambda: db.get_interviews_between.sync(guild_id, since),
+            50,
+        ),
+        (
+            "get_future_interviews_page",
+            lambda: db.get_future_interviews_page.sync(guild_id, since),
+            MAX_CALLS,
+        ),
+        (
+            "get_all_interviews_count",
+            lambda: db.get_interview_counts.sync(guild_id, "weekly", week, month),
+            MAX_CALLS,
+        ),
+        (
+            "get_user_total_count",
+            lambda: db.get_user_total_count.sync(guild_id, user_id),
+            MAX_CALLS,
+        ),
+        (
+            "get_interview",
+            lambda: db.get_interview.sync(guild_id, interview_id),
+            MAX_CALLS,
+        ),
+        (
+            "get_user_history_page",
+            lambda: db.get_user_history_page.sync(guild_id, user_id),
+            MAX_CALLS,
+        ),
+        (
+            "search_interviews",
+            lambda: db.search_interviews.sync(guild_id, "python"),
+            MAX_CALLS,
+        ),
+        (
+            "get_upcoming_reminders",
+            lambda: db.get_upcoming_reminders.sync(now),
+            20,
+        ),
+        # Last, since it moves past interviews out of the hot table
+        (
+            "archive_interviews_chunk",
+            lambda: db.archive_interviews_chunk.sync(guild_id, now, ARCHIVE_CHUNK_SIZE),
+            20,
+        ),
+    ]
+
+    for name, func, max_calls in benchmarks:
+        results.append(summarize("db", name, rows, measure(func, max_calls)))
+
+
+def bench_pure(rows, results):
+    """Formatters, validators and the update parser"""
+    interviews = (
+        manager.get_db()
+        .execute("SELECT * FROM interviews ORDER BY scheduled_at LIMIT 2000")
+        .fetchall()
+    )
+
+    today = date.today()
+    benchmarks = [
+        (
+            "format_interview_list(20)",
+            lambda: format_interview_list(interviews[:20], "Bench"),
+        ),
+        (
+            "format_interview_list(200)",
+            lambda: format_interview_list(interviews[:200], "Bench"),
+        ),
+        (
+            "iter_interview_pages(2000)",
+            lambda: list(iter_interview_pages(interviews[:2000], "Bench")),
+        ),
+        ("validate_date", lambda: validate_date("2024-03-01")),
+        ("validate_date(invalid)", lambda: validate_date("2024-13-45")),
+        ("validate_time", lambda: validate_time("14:30")),
+        ("validate_time(invalid)", lambda: validate_time("25:99")),
+        (
+            "parse_updates",
+            lambda: parse_updates(
+                'date=2024-03-01 time=15:30 type=Technical desc="System Design round"',
+                today,
+            ),
+        ),
+        (
+            "parse_schedule",
+            lambda: parse_schedule('next fri 2:30pm Technical "System Design"', today),
+        ),
+    ]
+
+    for name, func in benchmarks:
+        results.append(summarize("pure", name, rows, measure(func)))
+
+
+async def bench_commands(rows, results):
+    """Cog callbacks end to end, with a warm cache like a running bot"""
+    guild_id, user_id, interview_id = sample_ids(manager.get_db())
+    interviews = InterviewCog(None)
+    admin = AdminCog(None)
+
+    def ctx(administrator=False):
+        return FakeContext(user_id, guild_id, administrator)
+
+    for _ in range(200):
+        await InterviewManager.add_interview(
+            guild_id, user_id, "bench", date(2030, 1, 2), None, "HR", "Doomed"
+        )
+    doomed = [
+        row["id"]
+        for row in manager.get_db().execute(
+            "SELECT id FROM interviews WHERE description = 'Doomed' ORDER BY id"
+        )
+    ]
+
+    commands = [
+        (
+            "!schedule",
+            lambda: InterviewCog.schedule.callback(
+                interviews, ctx(), text="2030-01-01 14:30 Technical Bench"
+            ),
+            MAX_CALLS,
+        ),
+        (
+            "!my_interviews",
+            lambda: InterviewCog.my_interviews.callback(interviews, ctx()),
+            MAX_CALLS,
+        ),
+        ("!total", lambda: InterviewCog.total.callback(interviews, ctx()), MAX_CALLS),
+        (
+            "!history",
+            lambda: InterviewCog.history.callback(interviews, ctx()),
+            MAX_CALLS,
+        ),
+        (
+            "!search",
+            lambda: InterviewCog.search.callback(
+                interviews, ctx(), query="python backend"
+            ),
+            MAX_CALLS,
+        ),
+        (
+            "!update_interview",
+            lambda: InterviewCog.update_interview.callback(
+                interviews,
+                ctx(),
+                interview_id,
+                updates='time=15:30 desc="Rescheduled"',
+            ),
+            MAX_CALLS,
+        ),
+        (
+            "!delete_interview",
+            lambda: InterviewCog.delete_interview.callback(
+                interviews, ctx(), doomed.pop()
+            ),
+            len(doomed),
+        ),
+        (
+            "autocomplete",
+            lambda: interview_index.search(guild_id, user_id, "tech"),
+            MAX_CALLS,
+        ),
+        (
+            "!all_interviews",
+            lambda: AdminCog.all_interviews.callback(admin, ctx(administrator=True)),
+            MAX_CALLS,
+        ),
+    ]
+
+    # Autocomplete is answered from the index, kept fresh by the events
+    interview_index.start()
+    try:
+        for name, func, max_calls in commands:
+            durations = await measure_async(func, max_calls)
+            results.append(summarize("command", name, rows, durations))
+    finally:
+        interview_index.stop()
+
+
+def run_size(rows, seed):
+    """Build a dataset of `rows` interviews and run every benchmark on it"""
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        manager.DB_FILE = os.path.join(tmp, "bench.db")
+        manager.init_db()
+
+        elapsed = generate(manager.get_db(), rows, seed=seed)
+        print(f"📦 Generated {rows} interviews in {elapsed:.1f}s")
+        results.append(summarize("setup", "generate", rows, [elapsed]))
+
+        bench_pure(rows, results)
+        asyncio.run(bench_commands(rows, results))
+        query_cache.clear()
+        bench_data_layer(rows, results)
+
+        manager.close_db()
+    return results
+
+
+def metadata():
+    """Where and on what code the numbers were measured"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+    }
+
+
+def print_results(results):
+    print(
+        f"{'group':<8} {'benchmark':<36} {'rows':>8} {'calls':>6} "
+        f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+    )
+    for r in results:
+        print(
+            f"{r['group']:<8} {r['name']:<36} {r['rows']:>8} {r['calls']:>6} "
+            f"{r['p50_ms']:>9.3f} {r['p95_ms']:>9.3f} {r['p99_ms']:>9.3f}"
+        )
+
+
+def compare(before_path, after_path, threshold=REGRESSION_THRESHOLD):
+    """Print p50 changes between two result files
+
+    Returns:
+        Number of benchmarks that got slower than the threshold allows
+    """
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+
+    baseline = {(r["group"], r["name"], r["rows"]): r for r in before["results"]}
+    print(f"Comparing {before['meta']['commit']} -> {after['meta']['commit']}")
+
+    regressions = 0
+    for r in after["results"]:
+        old = baseline.get((r["group"], r["name"], r["rows"]))
+        if old is None or not old["p50_ms"] or r["group"] == "setup":
+            continue
+
+        change = r["p50_ms"] / old["p50_ms"] - 1
+        flag = ""
+        if change > threshold:
+            flag = "⚠️ slower"
+            regressions += 1
+        elif change < -threshold:
+            flag = "🚀 faster"
+        print(
+            f"{r['group']:<8} {r['name']:<36} {r['rows']:>8} "
+            f"{old['p50_ms']:>9.3f} -> {r['p50_ms']:>9.3f} ms {change:>+7.0%} {flag}"
+        )
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000]
+    )
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, threshold=args.threshold) else 0)
+
+    if len(args.sizes) == 1:
+        results = run_size(args.sizes[0], args.seed)
+    else:
+        # One process per size, so every run starts from a clean slate
+        results = []
+        with tempfile.TemporaryDirectory() as tmp:
+            for rows in args.sizes:
+                output = os.path.join(tmp, f"{rows}.json")
+                subprocess.run(
+                    [
+                        sys.executable,
+                        "-m",
+                        "benchmarks.suite",
+                        "--sizes",
+                        str(rows),
+                        "--seed",
+                        str(args.seed),
+                        "--output",
+                        output,
+                    ],
+                    check=True,
+                )
+                with open(output) as f:
+                    results.extend(json.load(f)["results"])
+
+    with open(args.output, "w") as f:
+        json.dump({"meta": metadata(), "results": results}, f, indent=2)
+
+    if len(args.sizes) == 1:
+        print_results(results)
+    print(f"✅ Wrote {len(results)} results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Synthetic interview datasets.
+Fills a database with realistic-looking interviews spread over many guilds,
+users and dates, for benchmarks that need a big table.
+
+Usage: python -m benchmarks.synthetic --rows 100000 --db bench.db
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime
+from bot.utils.dates import period_keys
+
+TYPES = ["Technical", "HR", "Behavioral", "Onsite", "Phone Screen", "System Design"]
+WORDS = (
+    "backend frontend fullstack platform data ml infra mobile security "
+    "python golang rust java react kubernetes postgres kafka "
+    "google meta amazon stripe netflix shopify datadog startup "
+    "recruiter manager founder panel take-home pairing whiteboard final"
+).split()
+TIMEZONES = ["Europe/Paris", "Europe/London", "America/New_York", "Asia/Tokyo"]
+
+
+def generate(conn, rows, users=None, guilds=None, days=365, seed=42):
+    """Insert `rows` synthetic interviews and matching user_stats counters
+
+    Interviews are spread uniformly over `days` days before and after now,
+    so roughly half of them are in the past.
+
+    Args:
+        conn: Open connection to a migrated database
+        rows: Number of interviews to create
+        users: Distinct users, defaults to one per 20 interviews
+        guilds: Distinct guilds (IDs 1..guilds), defaults to one per 50 users
+        days: How far into the past and future interviews go
+        seed: Random seed, the same arguments always give the same data
+
+    Returns:
+        Seconds it took
+    """
+    rng = random.Random(seed)
+    users = users or max(1, rows // 20)
+    guilds = guilds or max(1, users // 50)
+    now = int(time.time())
+    span = days * 86400
+    created = datetime.now().isoformat()
+
+    def make_rows(count):
+        for _ in range(count):
+            user_id = rng.randint(1, users)
+            has_time = rng.random() < 0.7
+            scheduled_at = now + rng.randint(-span, span)
+            if has_time:
+                scheduled_at -= scheduled_at % 900  # Quarter-hour slots
+            else:
+                scheduled_at -= scheduled_at % 86400
+            yield (
+                1 + user_id % guilds,  # A user stays in one guild
+                user_id,
+                f"user{user_id}",
+                scheduled_at,
+                has_time,
+                TIMEZONES[user_id % len(TIMEZONES)],
+                rng.choice(TYPES),
+                " ".join(rng.sample(WORDS, rng.randint(2, 6))),
+                created,
+            )
+
+    start = time.perf_counter()
+    remaining = rows
+    while remaining:
+        batch = min(remaining, 50_000)
+        with conn:
+            conn.executemany(
+                """INSERT INTO interviews
+                (guild_id, user_id, user_name, scheduled_at, has_time, timezone, interview_type, description, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                make_rows(batch),
+            )
+        remaining -= batch
+
+    # Bulk inserts skip InterviewManager, so rebuild the counters in one go.
+    # Every interview above was created just now, hence this week and month
+    week, month = period_keys(datetime.now())
+    with conn:
+        conn.execute("DELETE FROM user_stats")
+        conn.execute(
+            """INSERT INTO user_stats
+            (guild_id, user_id, user_name, lifetime, weekly, week, monthly, month)
+            SELECT guild_id, user_id, max(user_name), COUNT(*), COUNT(*), ?, COUNT(*), ?
+            FROM interviews GROUP BY guild_id, user_id""",
+            (week, month),
+        )
+
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=None)
+    parser.add_argument("--guilds", type=int, default=None)
+    parser.add_argument("--db", default="bench.db")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    from bot.db import manager
+
+    manager.DB_FILE = args.db
+    manager.init_db()
+    elapsed = generate(
+        manager.get_db(), args.rows, args.users, args.guilds, seed=args.seed
+    )
+    print(f"✅ Generated {args.rows} interviews in {args.db} ({elapsed:.1f}s)")
+    manager.close_db()
+
+
+if __name__ == "__main__":
+    main()
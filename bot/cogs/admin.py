@@ -3,10 +3,57 @@ Admin commands cog.
 Handles administrative commands that require special permissions.
 """
 
+import asyncio
+import csv
+import functools
+import io
+import tempfile
 import discord
+import pytz
 from discord.ext import commands
+from bot.cogs.interviews import send_feed_link
+from bot.db.guilds import GuildConfigManager
+from bot.db.cache import query_cache
 from bot.db.models import InterviewManager
-from bot.utils.formatters import format_interview_list
+from bot.feeds import feed_url
+from bot.metrics import COMMAND_ERRORS, COMMAND_LATENCY, DB_LATENCY
+from bot.reload import EXTENSIONS, reload_extensions, resolve_extension
+from bot.reload import reload_config as reread_config
+from bot.utils.pagination import InterviewPaginator
+from bot.utils.transfer import EXTENSIONS as FILE_EXTENSIONS
+from bot.utils.transfer import FORMATS, format_of, iter_export, parse_interviews
+
+# Most invalid rows listed after an import
+IMPORT_ERRORS_SHOWN = 10
+
+
+def _latency_table(histogram, extra=None, limit=12):
+    """Text table of p50/p95/p99 per label value, busiest first"""
+    keys = sorted(histogram.label_values(), key=lambda key: -histogram.count(*key))
+    header = f"{'':<22}{'calls':>7}{'p50':>9}{'p95':>9}{'p99':>9}"
+    if extra:
+        header += f"{extra[0]:>8}"
+
+    lines = [header]
+    for key in keys[:limit]:
+        line = f"{key[0][:21]:<22}{histogram.count(*key):>7}"
+        for q in (0.5, 0.95, 0.99):
+            line += f"{histogram.quantile(q, *key) * 1000:>7.1f}ms"
+        if extra:
+            line += f"{extra[1](key[0]):>8}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+async def _download(url, fp):
+    """Stream a file from Discord's CDN into `fp`, without holding it in memory"""
+    import aiohttp
+
+    async with aiohttp.ClientSession() as session:
+        async with session.get(url) as response:
+            response.raise_for_status()
+            async for chunk in response.content.iter_chunked(64 * 1024):
+                fp.write(chunk)
 
 
 class AdminCog(commands.Cog):
@@ -15,6 +62,12 @@ class AdminCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
+    async def cog_check(self, ctx):
+        """Settings are per server, so these commands don't work in DMs"""
+        if ctx.guild is None:
+            raise commands.NoPrivateMessage()
+        return True
+
     @commands.command()
     @commands.has_permissions(administrator=True)
     async def all_interviews(self, ctx):
@@ -22,20 +75,82 @@ class AdminCog(commands.Cog):
 
         This command requires administrator permissions.
         """
-        interviews = InterviewManager.get_all_future_interviews()
+        # Pages are fetched one at a time as the buttons get clicked
+        paginator = InterviewPaginator(
+            functools.partial(
+                InterviewManager.get_future_interviews_page, ctx.guild.id
+            ),
+            "All Scheduled Interviews",
+            ctx.author.id,
+            include_username=True,
+        )
+        message = await paginator.render()
 
-        if not interviews:
+        if message is None:
             await ctx.send("No interviews scheduled yet! 📭")
             return
 
-        # Format the interviews into a nice message
-        message = format_interview_list(
-            interviews, "All Scheduled Interviews", include_username=True
+        # No need for buttons if everything fits on one page
+        if paginator.next_cursor is None:
+            await ctx.send(message)
+        else:
+            paginator.message = await ctx.send(message, view=paginator)
+
+    @commands.command()
+    @commands.has_permissions(administrator=True)
+    async def config(self, ctx):
+        """Show this server's bot settings (Admin only)"""
+        config = GuildConfigManager.get(ctx.guild.id)
+        channel = f"<#{config['channel_id']}>" if config["channel_id"] else "Not set ⚠️"
+
+        embed = discord.Embed(title="⚙️ Server Settings", color=0x7289DA)
+        embed.add_field(name="Reminder channel", value=channel, inline=False)
+        embed.add_field(name="Timezone", value=config["timezone"], inline=True)
+        embed.add_field(
+            name="Daily reminder", value=f"{config['reminder_hour']}:00", inline=True
         )
-        await ctx.send(message)
+        await ctx.send(embed=embed)
+
+    @commands.command()
+    @commands.has_permissions(administrator=True)
+    async def set_channel(self, ctx, channel: discord.TextChannel = None):
+        """Set the channel for reminders, rankings and announcements
 
-    # You could add more admin commands here
-    # For example, manual task triggering or configuration commands
+        Usage: !set_channel #interviews (defaults to the current channel)
+        """
+        channel = channel or ctx.channel
+        await GuildConfigManager.update(ctx.guild.id, channel_id=channel.id)
+        await ctx.send(f"✅ Reminders will be posted in {channel.mention}!")
+
+    @commands.command()
+    @commands.has_permissions(administrator=True)
+    async def set_timezone(self, ctx, timezone: str):
+        """Set the timezone used for dates, times and reminders
+
+        Usage: !set_timezone Europe/Paris
+        """
+        if timezone not in pytz.all_timezones_set:
+            await ctx.send(
+                "❌ Unknown timezone! Use an Area/City name like `Europe/Paris`"
+            )
+            return
+
+        await GuildConfigManager.update(ctx.guild.id, timezone=timezone)
+        await ctx.send(f"✅ Timezone set to {timezone}!")
+
+    @commands.command()
+    @commands.has_permissions(administrator=True)
+    async def set_reminder_hour(self, ctx, hour: int):
+        """Set the hour (0-23, local time) of the daily reminder
+
+        Usage: !set_reminder_hour 8
+        """
+        if not 0 <= hour <= 23:
+            await ctx.send("❌ The hour must be between 0 and 23!")
+            return
+
+        await GuildConfigManager.update(ctx.guild.id, reminder_hour=hour)
+        await ctx.send(f"✅ Daily reminders will go out at {hour}:00!")
 
     @commands.command()
     @commands.has_permissions(administrator=True)
@@ -44,9 +159,12 @@ class AdminCog(commands.Cog):
 
         Usage: !announce Hello everyone! This is an important message.
         """
-        channel = self.bot.get_channel(int(self.bot.CHANNEL_ID))
+        channel_id = GuildConfigManager.get(ctx.guild.id)["channel_id"]
+        channel = self.bot.get_channel(channel_id) if channel_id else None
         if not channel:
-            await ctx.send("⚠️ Could not find the configured announcement channel!")
+            await ctx.send(
+                "⚠️ Could not find the configured announcement channel! Use `!set_channel` first"
+            )
             return
 
         # Create a nice embed for the announcement
@@ -55,17 +173,237 @@ class AdminCog(commands.Cog):
         )
         embed.set_footer(text=f"From: {ctx.author.name}")
 
-        await channel.send(embed=embed)
+        # Goes through the rate-limited queue like every other broadcast
+        await self.bot.dispatcher.send(channel.id, embed=embed)
         await ctx.send("✅ Announcement sent!")
 
+    @commands.command()
+    @commands.has_permissions(administrator=True)
+    async def server_calendar(self, ctx):
+        """DM you a calendar link with everyone's upcoming interviews (Admin only)"""
+        await send_feed_link(
+            ctx, feed_url(ctx.guild.id), f"every upcoming interview in {ctx.guild.name}"
+        )
+
+    @commands.command()
+    @commands.has_permissions(administrator=True)
+    async def stats(self, ctx):
+        """Show command and database latencies (Admin only)"""
+        if not COMMAND_LATENCY.label_values():
+            await ctx.send("No commands timed yet! 📭")
+            return
+
+        errors = {}
+        for (command, _), count in COMMAND_ERRORS.items():
+            errors[command] = errors.get(command, 0) + count
+
+        cache = query_cache.stats()
+        dispatch = self.bot.dispatcher.stats()
+        message = [
+            "**📊 Bot Stats**",
+            "Commands:",
+            "```",
+            _latency_table(
+                COMMAND_LATENCY, ("errors", lambda name: errors.get(name, 0))
+            ),
+            "```",
+            "Database queries:",
+            "```",
+            _latency_table(DB_LATENCY, limit=8),
+            "```",
+            f"Cache: {cache['hit_rate']:.0%} hit rate, {cache['size']} entries",
+            f"Send queue: {dispatch['queue_depth']} waiting, "
+            f"{dispatch['latency_p95_ms']:.0f}ms p95 delivery",
+        ]
+        await ctx.send("\n".join(message))
+
+    @commands.command(name="import")
+    @commands.has_permissions(administrator=True)
+    async def import_file(self, ctx):
+        """Import interviews from an attached CSV, JSON Lines or iCalendar file
+
+        Usage: !import (with the file attached)
+        Columns: user_id, user_name, date, time, type, description, timezone.
+        Rows without a user_id are added for you.
+        """
+        if not ctx.message.attachments:
+            await ctx.send("❌ Attach a .csv, .jsonl or .ics file to import!")
+            return
+
+        attachment = ctx.message.attachments[0]
+        fmt = format_of(attachment.filename)
+        if fmt is None:
+            await ctx.send("❌ Unsupported file! Use .csv, .jsonl or .ics")
+            return
+
+        guild = ctx.guild
+        errors = []
+        skipped = 0
+
+        def name_of(user_id):
+            member = guild.get_member(user_id)
+            return member.display_name if member else None
+
+        def rows(fp):
+            """Parse the spooled file from the start"""
+            fp.seek(0)
+            lines = io.TextIOWrapper(fp, encoding="utf-8-sig", newline="")
+            try:
+                yield from parse_interviews(
+                    lines,
+                    fmt,
+                    GuildConfigManager.timezone(guild.id),
+                    (ctx.author.id, ctx.author.display_name),
+                    name_of,
+                )
+            finally:
+                # Leave the file open for the next pass
+                lines.detach()
+
+        def check(fp):
+            """Read the whole file once, collecting invalid rows"""
+            nonlocal skipped
+            for number, fields, error in rows(fp):
+                if error is None:
+                    continue
+                skipped += 1
+                if len(errors) < IMPORT_ERRORS_SHOWN:
+                    errors.append(f"Line {number}: {error}")
+
+        async with ctx.typing():
+            # Spooled to disk and parsed a chunk at a time on a worker thread,
+            # so a big file never sits in memory nor holds up the event loop
+            with tempfile.TemporaryFile() as fp:
+                await _download(attachment.url, fp)
+
+                # Imports are committed a chunk at a time, so a file that
+                # can't be read to the end must fail before the first one
+                try:
+                    await asyncio.to_thread(check, fp)
+                except UnicodeDecodeError:
+                    await ctx.send("❌ The file isn't UTF-8 text! Nothing was imported")
+                    return
+                except csv.Error as e:
+                    await ctx.send(
+                        f"❌ Could not read the file: {e}. Nothing was imported"
+                    )
+                    return
+
+                count = await InterviewManager.import_interviews(
+                    guild.id,
+                    (fields for _, fields, error in rows(fp) if error is None),
+                )
+
+        message = [f"✅ Imported {count} interview(s)!"]
+        if skipped:
+            message.append(f"⚠️ Skipped {skipped} invalid row(s):")
+            message += errors
+            if skipped > len(errors):
+                message.append(f"...and {skipped - len(errors)} more")
+        await ctx.send("\n".join(message)[:2000])
+
+    @commands.command(name="export")
+    @commands.has_permissions(administrator=True)
+    async def export_file(self, ctx, fmt: str = "csv"):
+        """Export every interview of this server, archived ones included
+
+        Usage: !export [csv|jsonl|ics]
+        """
+        fmt = FORMATS.get(fmt.lower().lstrip("."))
+        if fmt is None:
+            await ctx.send("❌ Pick one of: csv, jsonl, ics")
+            return
+
+        count = 0
+
+        async def pages():
+            nonlocal count
+            async for page in InterviewManager.iter_interviews(ctx.guild.id):
+                count += len(page)
+                yield page
+
+        async with ctx.typing():
+            # Written a page at a time, the upload then streams from disk
+            with tempfile.TemporaryFile() as fp:
+                async for text in iter_export(pages(), fmt):
+                    fp.write(text.encode())
+
+                if count == 0:
+                    await ctx.send("No interviews to export yet! 📭")
+                    return
+                if fp.tell() > ctx.guild.filesize_limit:
+                    await ctx.send(
+                        "❌ The export is bigger than this server's upload limit!"
+                    )
+                    return
+
+                fp.seek(0)
+                filename = f"interviews-{ctx.guild.id}.{FILE_EXTENSIONS[fmt]}"
+                await ctx.send(
+                    f"📦 Exported {count} interview(s)",
+                    file=discord.File(fp, filename=filename),
+                )
+
+    @commands.command()
+    @commands.is_owner()
+    async def reload(self, ctx, name: str = "all"):
+        """Reload a cog without restarting the bot (Bot owner only)
+
+        Usage: !reload interviews (or admin, tasks, all)
+        """
+        if name == "all":
+            extensions = EXTENSIONS
+        else:
+            extension = resolve_extension(name)
+            if extension is None:
+                names = ", ".join(e.rsplit(".", 1)[-1] for e in EXTENSIONS)
+                await ctx.send(f"❌ Unknown cog! Pick one of: {names}, all")
+                return
+            extensions = [extension]
+
+        results = await reload_extensions(self.bot, extensions, exclude=ctx)
+        message = []
+        for extension, error in results.items():
+            short = extension.rsplit(".", 1)[-1]
+            if error is None:
+                message.append(f"✅ Reloaded `{short}`")
+            elif isinstance(error, commands.ExtensionNotLoaded):
+                message.append(f"⏭️ `{short}` isn't running in this process")
+            else:
+                message.append(f"❌ `{short}` kept its old version: {error}")
+        await ctx.send("\n".join(message))
+
+    @commands.command()
+    @commands.is_owner()
+    async def reload_config(self, ctx):
+        """Re-read .env and every server's settings (Bot owner only)"""
+        count = await reread_config(self.bot)
+        await ctx.send(f"✅ Reloaded settings for {count} server(s)!")
+
     # Error handler for admin commands
     @all_interviews.error
+    @config.error
+    @set_channel.error
+    @set_timezone.error
+    @set_reminder_hour.error
     @announce.error
+    @stats.error
+    @import_file.error
+    @export_file.error
+    @reload.error
+    @reload_config.error
     async def admin_error(self, ctx, error):
         """Handle errors in admin commands"""
         if isinstance(error, commands.MissingPermissions):
             await ctx.send(
                 "❌ Sorry, you need administrator permissions to use this command!"
             )
+        elif isinstance(error, commands.NotOwner):
+            await ctx.send("❌ Sorry, only the bot's owner can use this command!")
         else:
             await ctx.send(f"❌ An error occurred: {str(error)}")
+
+
+async def setup(bot):
+    """Entry point for bot.load_extension()"""
+    await bot.add_cog(AdminCog(bot))
@@ -0,0 +1,42 @@
+"""
+Feeds cog.
+Runs the calendar feed server (see bot.feeds). Only the leader loads it, so
+there's a single server, and it moves with the lease when the leader
+changes. Every worker's writes reach it through the change tailer.
+"""
+
+import logging
+from discord.ext import commands
+from bot.feeds import start_feed_server
+
+log = logging.getLogger(__name__)
+
+
+class FeedsCog(commands.Cog):
+    """Serves the iCalendar feeds while this process leads"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.runner = None
+
+    async def cog_load(self):
+        # Feeds are a nice-to-have, don't give up leading over a busy port
+        try:
+            self.runner = await start_feed_server(self.guild_name)
+        except OSError:
+            log.exception("⚠️ Could not start the calendar feed server")
+
+    async def cog_unload(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+            log.info("❌ Calendar feeds stopped")
+
+    def guild_name(self, guild_id):
+        guild = self.bot.get_guild(guild_id)
+        return guild.name if guild else None
+
+
+async def setup(bot):
+    """Entry point for bot.load_extension()"""
+    await bot.add_cog(FeedsCog(bot))
@@ -1,9 +1,37 @@
-import re
+import functools
 import discord
 from discord.ext import commands
+from bot.db.guilds import GuildConfigManager
 from bot.db.models import InterviewManager
-from bot.utils.formatters import format_interview_list
-from bot.utils.validators import validate_date, validate_time
+from bot.feeds import feed_url, feeds_enabled
+from bot.utils.formatters import iter_interview_pages
+from bot.utils.pagination import InterviewPaginator
+from bot.utils.dates import local_now
+from bot.utils.parser import ParseError, parse_schedule, parse_updates
+
+# Most interviews a multi-line !schedule takes
+MAX_BATCH = 25
+
+
+def guild_today(guild_id):
+    """The guild's current date, relative dates count from it"""
+    return local_now(GuildConfigManager.timezone(guild_id)).date()
+
+
+async def send_feed_link(ctx, url, what):
+    """DM a calendar feed link, it's as good as a password so never post it"""
+    if not feeds_enabled():
+        await ctx.send("❌ Calendar feeds aren't enabled on this bot!")
+        return
+    try:
+        await ctx.author.send(
+            f"📅 Subscribe to this link in your calendar app to see {what}:\n"
+            f"{url}\nKeep it to yourself, anyone with it can see them."
+        )
+    except discord.Forbidden:
+        await ctx.send("❌ I couldn't DM you, allow messages from server members!")
+        return
+    await ctx.send("📬 Sent you your calendar link!")
 
 
 class InterviewCog(commands.Cog):
@@ -12,83 +40,149 @@ class InterviewCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
+    async def cog_check(self, ctx):
+        """Interviews belong to a server, so these commands don't work in DMs"""
+        if ctx.guild is None:
+            raise commands.NoPrivateMessage()
+        return True
+
     @commands.command()
-    async def schedule(
-        self, ctx: commands.Context, date_str: str, time_or_type: str, *args
-    ):
-        """Schedule a new interview
+    async def schedule(self, ctx: commands.Context, *, text: str):
+        """Schedule a new interview, or several with one per line
 
         Usage: !schedule 2024-03-01 14:30 Technical "System Design"
-        Or: !schedule 2024-03-01 Technical "System Design" (no time)
+        Or: !schedule tomorrow Technical "System Design" (no time)
+        Or: !schedule
+            next fri 10:00 HR "Recruiter call"
+            next fri 2:30pm Technical "System Design"
         """
-        # Check if time_or_type looks like a time (HH:MM format)
-        time_pattern = r"^\d{1,2}:\d{2}$"
-        is_time = re.match(time_pattern, time_or_type)
-
-        # Initialize variables
-        time_str = "No time specified"
-        interview_type = "Interview"  # Default
-        description = ""
-
-        if is_time:
-            # If it looks like a time, use it as the time
-            time_str = time_or_type
-
-            # The next arg is the interview type (if provided)
-            if args:
-                interview_type = args[0]
-                # The rest are the description
-                if len(args) > 1:
-                    description = " ".join(args[1:])
-        else:
-            # If it doesn't look like a time, it's the interview type
-            interview_type = time_or_type
-            # All remaining args are the description
-            if args:
-                description = " ".join(args)
-
-        # Validate date
-        interview_date = validate_date(date_str)
-        if not interview_date:
-            await ctx.send("❌ Invalid date format! Please use YYYY-MM-DD")
+        lines = [line for line in text.splitlines() if line.strip()]
+        if len(lines) > 1:
+            await self.schedule_batch(ctx, lines)
             return
 
-        # Validate time if specified
-        if time_str != "No time specified":
-            if not validate_time(time_str):
-                await ctx.send(
-                    "❌ Invalid time format! Please use HH:MM (24-hour format)"
-                )
-                return
+        try:
+            entry = parse_schedule(text, guild_today(ctx.guild.id))
+        except ParseError as e:
+            await ctx.send(f"❌ {e}")
+            return
 
         # Add the interview to the database
-        InterviewManager.add_interview(
-            ctx.author.id,
-            ctx.author.name,
-            interview_date,
-            time_str,
-            interview_type,
-            description,
+        await InterviewManager.add_interview(
+            ctx.guild.id, ctx.author.id, ctx.author.name, *entry
         )
 
         # Confirm with user
-        time_message = f" at {time_str}" if time_str != "No time specified" else ""
-        await ctx.send(f"✅ Interview scheduled for {interview_date}{time_message}!")
+        time_message = f" at {entry.interview_time}" if entry.interview_time else ""
+        await ctx.send(
+            f"✅ Interview scheduled for {entry.interview_date}{time_message}!"
+        )
+
+    async def schedule_batch(self, ctx, lines):
+        """Schedule one interview per line, all of them or none"""
+        if len(lines) > MAX_BATCH:
+            await ctx.send(f"❌ At most {MAX_BATCH} interviews per message!")
+            return
+
+        # Everything is validated before anything is written
+        today = guild_today(ctx.guild.id)
+        entries, errors = [], []
+        for number, line in enumerate(lines, start=1):
+            try:
+                entries.append(parse_schedule(line, today))
+            except ParseError as e:
+                errors.append(f"Line {number}: {e}")
+
+        if errors:
+            message = ["❌ Nothing was scheduled, fix these lines first:", *errors]
+            await ctx.send("\n".join(message)[:2000])
+            return
+
+        rows = await InterviewManager.add_interview_batch(
+            ctx.guild.id, ctx.author.id, ctx.author.name, entries
+        )
+
+        message = [f"✅ Scheduled {len(rows)} interviews!"]
+        for entry, row in zip(entries, rows):
+            time_message = f" at {entry.interview_time}" if entry.interview_time else ""
+            message.append(
+                f"• {entry.interview_date}{time_message}: {entry.interview_type}"
+                f" (ID: {row['id']})"
+            )
+        await ctx.send("\n".join(message)[:2000])
 
     @commands.command()
     async def my_interviews(self, ctx):
         """List all your upcoming interviews"""
-        interviews = InterviewManager.get_user_interviews(ctx.author.id)
+        interviews = await InterviewManager.get_user_interviews(
+            ctx.guild.id, ctx.author.id
+        )
 
         if not interviews:
             await ctx.send("You have no scheduled interviews! 🎉")
             return
 
-        # Format the interviews into a nice message
-        message = format_interview_list(
+        # Format the interviews into nice messages, split to fit Discord's limit
+        for message, _ in iter_interview_pages(
             interviews, "Your Scheduled Interviews", include_username=False
+        ):
+            await ctx.send(message)
+
+    @commands.command()
+    async def history(self, ctx):
+        """List all your interviews, past ones included, newest first"""
+        # Past interviews may be archived, the history query covers both
+        paginator = InterviewPaginator(
+            functools.partial(
+                InterviewManager.get_user_history_page, ctx.guild.id, ctx.author.id
+            ),
+            "Your Interview History",
+            ctx.author.id,
+            include_username=False,
+        )
+        message = await paginator.render()
+
+        if message is None:
+            await ctx.send("You haven't scheduled any interviews yet! 📭")
+            return
+
+        # No need for buttons if everything fits on one page
+        if paginator.next_cursor is None:
+            await ctx.send(message)
+        else:
+            paginator.message = await ctx.send(message, view=paginator)
+
+    @commands.command()
+    async def search(self, ctx, *, query: str):
+        """Search interviews by type, description or name, best matches first
+
+        Usage: !search system design
+        Admins search the whole server, everyone else their own interviews.
+        """
+        admin = ctx.author.guild_permissions.administrator
+        paginator = InterviewPaginator(
+            functools.partial(
+                InterviewManager.search_interviews,
+                ctx.guild.id,
+                query,
+                None if admin else ctx.author.id,
+            ),
+            f"Results for {query!r}",
+            ctx.author.id,
+            include_username=admin,
+            cursor_of=lambda row: (row["rank"], row["id"]),
         )
-        await ctx.send(message)
+        message = await paginator.render()
+
+        if message is None:
+            await ctx.send("🔍 No interviews match your search!")
+            return
+
+        # No need for buttons if everything fits on one page
+        if paginator.next_cursor is None:
+            await ctx.send(message)
+        else:
+            paginator.message = await ctx.send(message, view=paginator)
 
     @commands.command()
     async def update_interview(
@@ -98,69 +192,26 @@ class InterviewCog(commands.Cog):
 
         Usage: !update_interview 3 date=2024-03-01 time=15:30 type=Technical desc="System Design"
         """
-        valid_keys = {
-            "date": "interview_date",
-            "time": "interview_time",
-            "type": "interview_type",
-            "desc": "description",
-        }
-
-        update_dict = {}
-
-        # Parse the updates from the command
-        # First, try to extract quoted values like desc="My description with spaces"
-        quoted_parts = re.findall(r'(\w+)=("(?:[^"\\]|\\.)*")', updates)
-        for key, value in quoted_parts:
-            key = key.lower()
-            if key in valid_keys:
-                # Remove quotes from the value
-                update_dict[valid_keys[key]] = value[1:-1]  # Strip the quotes
-
-        # Next, handle non-quoted simple values like date=2024-03-01
-        for part in updates.split():
-            if "=" in part and not any(
-                part.startswith(f"{k}=") for k, _ in quoted_parts
-            ):
-                key, value = part.split("=", 1)
-                key = key.lower()
-                if key in valid_keys and valid_keys[key] not in update_dict:
-                    update_dict[valid_keys[key]] = value
+        try:
+            update_dict = parse_updates(updates, guild_today(ctx.guild.id))
+        except ParseError as e:
+            await ctx.send(f"❌ {e}")
+            return
 
         if not update_dict:
             await ctx.send("❌ Valid keys: date=YYYY-MM-DD, time=HH:MM, type=, desc=")
             return
 
-        # Validate date and time if provided
-        if "interview_date" in update_dict:
-            new_date = validate_date(update_dict["interview_date"])
-            if not new_date:
-                await ctx.send("❌ Invalid date format! Use YYYY-MM-DD")
-                return
-            update_dict["interview_date"] = new_date.isoformat()
-
-        if "interview_time" in update_dict:
-            if not validate_time(update_dict["interview_time"]):
-                await ctx.send("❌ Invalid time format! Use HH:MM (24-hour format)")
-                return
-
-        # Get current interview to check additional validation rules
-        current = InterviewManager.get_interview(interview_id)
+        # Make sure the interview exists and belongs to the caller
+        current = await InterviewManager.get_interview(ctx.guild.id, interview_id)
         if not current or current["user_id"] != ctx.author.id:
             await ctx.send("❌ Interview not found or you don't have permission!")
             return
 
-        # Check if we need to fix the interview_type if it looks like a time
-        is_type_time_format = re.match(r"^\d{1,2}:\d{2}$", current["interview_type"])
-        if (
-            "interview_time" in update_dict
-            and is_type_time_format
-            and "interview_type" not in update_dict
-        ):
-            # If updating time and interview_type looks like a time, reset interview_type to default
-            update_dict["interview_type"] = "Interview"  # Default value
-
         # Update the interview in the database
-        if InterviewManager.update_interview(interview_id, ctx.author.id, update_dict):
+        if await InterviewManager.update_interview(
+            ctx.guild.id, interview_id, ctx.author.id, update_dict
+        ):
             await ctx.send("✅ Interview updated successfully!")
         else:
             await ctx.send("❌ No changes made!")
@@ -171,7 +222,9 @@ class InterviewCog(commands.Cog):
 
         Usage: !delete_interview 5
         """
-        if InterviewManager.delete_interview(interview_id, ctx.author.id):
+        if await InterviewManager.delete_interview(
+            ctx.guild.id, interview_id, ctx.author.id
+        ):
             await ctx.send("✅ Interview deleted successfully!")
         else:
             await ctx.send("❌ Interview not found or you don't have permission!")
@@ -179,12 +232,22 @@ class InterviewCog(commands.Cog):
     @commands.command()
     async def total(self, ctx):
         """Show your all-time interview count"""
-        count = InterviewManager.get_user_total_count(ctx.author.id)
+        count = await InterviewManager.get_user_total_count(ctx.guild.id, ctx.author.id)
         await ctx.send(f"🎉 You've scheduled {count} interviews in total!")
 
+    @commands.command()
+    async def calendar(self, ctx):
+        """DM you a link to follow your interviews from a calendar app"""
+        await send_feed_link(
+            ctx,
+            feed_url(ctx.guild.id, ctx.author.id),
+            f"your interviews in {ctx.guild.name}",
+        )
+
     @commands.command()
     async def help(self, ctx):
         """Show help about available commands"""
+        config = GuildConfigManager.get(ctx.guild.id)
         embed = discord.Embed(
             title="pweaseHiredMe 🍩",
             description="Here's everything I can do!",
@@ -197,8 +260,12 @@ class InterviewCog(commands.Cog):
             value=(
                 "`!schedule <date> [time] <type> <description>` - Schedule interview\n"
                 '  Example: `!schedule 2024-03-01 14:30 Technical "System Design"`\n'
+                "  One interview per line to schedule several at once\n"
                 "`!my_interviews` - List your upcoming interviews\n"
+                "`!history` - List all your interviews, past ones included\n"
+                "`!search <words>` - Find interviews by type or description\n"
                 "`!total` - Show your all-time interview count\n"
+                "`!calendar` - Get your interviews in your calendar app\n"
                 "`!update_interview <ID> <key=value>` - Modify interview\n"
                 "  Valid keys: date=, time=, type=, desc=\n"
                 "`!delete_interview <ID>` - Remove interview"
@@ -210,7 +277,15 @@ class InterviewCog(commands.Cog):
         if ctx.author.guild_permissions.administrator:
             embed.add_field(
                 name="👑 Admin Commands",
-                value="`!all_interviews` - View all scheduled interviews",
+                value=(
+                    "`!all_interviews` - View all scheduled interviews\n"
+                    "`!config` - Show this server's bot settings\n"
+                    "`!set_channel [#channel]` - Channel for reminders and rankings\n"
+                    "`!set_timezone <Area/City>` - Timezone for dates and reminders\n"
+                    "`!set_reminder_hour <0-23>` - Hour of the daily reminder\n"
+                    "`!server_calendar` - Calendar link with everyone's interviews\n"
+                    "`!stats` - Command and database latencies"
+                ),
                 inline=False,
             )
 
@@ -218,9 +293,10 @@ class InterviewCog(commands.Cog):
         embed.add_field(
             name="⏰ Automatic Features",
             value=(
-                "• Daily reminders at 8AM Paris time\n"
+                f"• Daily reminders at {config['reminder_hour']}:00 {config['timezone']} time\n"
+                "• Heads-up 1 hour before each timed interview\n"
                 "• Weekly rankings every Sunday\n"
-                "• Auto-cleanup of old interviews"
+                "• Auto-archiving of past interviews"
             ),
             inline=False,
         )
@@ -229,11 +305,11 @@ class InterviewCog(commands.Cog):
         embed.add_field(
             name="💡 Pro Tips",
             value=(
-                "• Date format: `YYYY-MM-DD`\n"
-                "• Time format: `HH:MM` (24-hour)\n"
+                "• Date format: `YYYY-MM-DD`, or `tomorrow`, `next fri`, `in 3 days`\n"
+                "• Time format: `HH:MM` (24-hour) or `2:30pm`\n"
                 "• Use quotes for multi-word descriptions\n"
-                "• Find IDs with `!my_interviews`\n"
-                "• Times are in Paris/CET timezone"
+                "• Find IDs with `!my_interviews`, slash commands suggest them\n"
+                f"• Times are in {config['timezone']} timezone"
             ),
             inline=False,
         )
@@ -241,3 +317,8 @@ class InterviewCog(commands.Cog):
         embed.set_footer(text="Made with 💖 by WST-T '文森特'")
 
         await ctx.send(embed=embed)
+
+
+async def setup(bot):
+    """Entry point for bot.load_extension()"""
+    await bot.add_cog(InterviewCog(bot))
@@ -0,0 +1,293 @@
+"""
+Slash commands cog.
+The interview commands again as application commands. Interview IDs
+autocomplete from the in-memory index (see bot.db.index), so picking one
+never waits on the database.
+"""
+
+import functools
+import time
+import discord
+from discord import app_commands
+from discord.ext import commands
+from bot.cogs.interviews import guild_today
+from bot.db.index import interview_index
+from bot.db.models import InterviewManager
+from bot.feeds import feed_url, feeds_enabled
+from bot.metrics import COMMAND_LATENCY
+from bot.utils.formatters import iter_interview_pages
+from bot.utils.pagination import InterviewPaginator
+from bot.utils.parser import ParseError, parse_date_text, parse_time_text
+
+
+class SlashCog(commands.Cog):
+    """Slash command versions of the interview commands"""
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    async def cog_load(self):
+        interview_index.start()
+
+    def cog_unload(self):
+        interview_index.stop()
+
+    async def interaction_check(self, interaction):
+        """Hold slash commands until the database is up and reloads are done"""
+        await self.bot.db_ready.wait()
+        await self.bot.accepting_commands.wait()
+        interaction.extras["metrics_start"] = time.perf_counter()
+        return True
+
+    @commands.Cog.listener()
+    async def on_app_command_completion(self, interaction, command):
+        start = interaction.extras.get("metrics_start")
+        if start is not None:
+            COMMAND_LATENCY.observe(
+                time.perf_counter() - start, command=f"/{command.qualified_name}"
+            )
+
+    async def cog_app_command_error(self, interaction, error):
+        """Tell the user something went wrong, without leaving them hanging"""
+        message = f"❌ An error occurred: {getattr(error, 'original', error)}"
+        if interaction.response.is_done():
+            await interaction.followup.send(message, ephemeral=True)
+        else:
+            await interaction.response.send_message(message, ephemeral=True)
+
+    async def interview_id_autocomplete(self, interaction, current: str):
+        """The caller's upcoming interviews matching what they typed so far"""
+        start = time.perf_counter()
+        matches = await interview_index.search(
+            interaction.guild_id, interaction.user.id, current
+        )
+        COMMAND_LATENCY.observe(time.perf_counter() - start, command="autocomplete")
+        return [
+            app_commands.Choice(name=label, value=interview_id)
+            for interview_id, label in matches
+        ]
+
+    @app_commands.guild_only()
+    @app_commands.command(name="schedule", description="Schedule a new interview")
+    @app_commands.rename(interview_type="type", time_str="time")
+    @app_commands.describe(
+        date="Date, YYYY-MM-DD or e.g. tomorrow, next fri",
+        interview_type="Kind of interview, e.g. Technical",
+        time_str="Time, HH:MM (24-hour) or e.g. 2:30pm, leave out for date-only interviews",
+        description="Anything worth remembering",
+    )
+    async def schedule(
+        self,
+        interaction: discord.Interaction,
+        date: str,
+        interview_type: str,
+        time_str: str = None,
+        description: str = "",
+    ):
+        try:
+            interview_date = parse_date_text(date, guild_today(interaction.guild_id))
+            if time_str is not None:
+                time_str = parse_time_text(time_str)
+        except ParseError as e:
+            await interaction.response.send_message(f"❌ {e}", ephemeral=True)
+            return
+
+        await InterviewManager.add_interview(
+            interaction.guild_id,
+            interaction.user.id,
+            interaction.user.name,
+            interview_date,
+            time_str,
+            interview_type,
+            description,
+        )
+
+        time_message = f" at {time_str}" if time_str else ""
+        await interaction.response.send_message(
+            f"✅ Interview scheduled for {interview_date}{time_message}!"
+        )
+
+    @app_commands.guild_only()
+    @app_commands.command(
+        name="my_interviews", description="List your upcoming interviews"
+    )
+    async def my_interviews(self, interaction: discord.Interaction):
+        interviews = await InterviewManager.get_user_interviews(
+            interaction.guild_id, interaction.user.id
+        )
+
+        if not interviews:
+            await interaction.response.send_message(
+                "You have no scheduled interviews! 🎉"
+            )
+            return
+
+        for message, _ in iter_interview_pages(
+            interviews, "Your Scheduled Interviews", include_username=False
+        ):
+            if interaction.response.is_done():
+                await interaction.followup.send(message)
+            else:
+                await interaction.response.send_message(message)
+
+    @app_commands.guild_only()
+    @app_commands.command(
+        name="history", description="List all your interviews, newest first"
+    )
+    async def history(self, interaction: discord.Interaction):
+        paginator = InterviewPaginator(
+            functools.partial(
+                InterviewManager.get_user_history_page,
+                interaction.guild_id,
+                interaction.user.id,
+            ),
+            "Your Interview History",
+            interaction.user.id,
+            include_username=False,
+        )
+        await self.send_paginated(
+            interaction, paginator, "You haven't scheduled any interviews yet! 📭"
+        )
+
+    @app_commands.guild_only()
+    @app_commands.command(
+        name="search", description="Find interviews by type, description or name"
+    )
+    @app_commands.describe(query="Words to look for, admins search the whole server")
+    async def search(self, interaction: discord.Interaction, query: str):
+        admin = interaction.user.guild_permissions.administrator
+        paginator = InterviewPaginator(
+            functools.partial(
+                InterviewManager.search_interviews,
+                interaction.guild_id,
+                query,
+                None if admin else interaction.user.id,
+            ),
+            f"Results for {query!r}",
+            interaction.user.id,
+            include_username=admin,
+            cursor_of=lambda row: (row["rank"], row["id"]),
+        )
+        await self.send_paginated(
+            interaction, paginator, "🔍 No interviews match your search!"
+        )
+
+    async def send_paginated(self, interaction, paginator, empty_message):
+        """Send the first page, with buttons if there are more"""
+        message = await paginator.render()
+        if message is None:
+            await interaction.response.send_message(empty_message)
+        elif paginator.next_cursor is None:
+            await interaction.response.send_message(message)
+        else:
+            await interaction.response.send_message(message, view=paginator)
+            paginator.message = await interaction.original_response()
+
+    @app_commands.guild_only()
+    @app_commands.command(
+        name="update_interview", description="Change one of your interviews"
+    )
+    @app_commands.rename(interview_type="type", time_str="time")
+    @app_commands.describe(
+        interview_id="Interview to change, start typing to search",
+        date="New date, YYYY-MM-DD or e.g. tomorrow, next fri",
+        time_str="New time, HH:MM (24-hour) or e.g. 2:30pm",
+        interview_type="New kind of interview",
+        description="New description",
+    )
+    @app_commands.autocomplete(interview_id=interview_id_autocomplete)
+    async def update_interview(
+        self,
+        interaction: discord.Interaction,
+        interview_id: int,
+        date: str = None,
+        time_str: str = None,
+        interview_type: str = None,
+        description: str = None,
+    ):
+        updates = {}
+        try:
+            if date is not None:
+                updates["interview_date"] = parse_date_text(
+                    date, guild_today(interaction.guild_id)
+                )
+            if time_str is not None:
+                updates["interview_time"] = parse_time_text(time_str)
+        except ParseError as e:
+            await interaction.response.send_message(f"❌ {e}", ephemeral=True)
+            return
+        if interview_type is not None:
+            updates["interview_type"] = interview_type
+        if description is not None:
+            updates["description"] = description
+
+        if not updates:
+            await interaction.response.send_message(
+                "❌ Give at least one of date, time, type or description!",
+                ephemeral=True,
+            )
+            return
+
+        if await InterviewManager.update_interview(
+            interaction.guild_id, interview_id, interaction.user.id, updates
+        ):
+            await interaction.response.send_message(
+                "✅ Interview updated successfully!"
+            )
+        else:
+            await interaction.response.send_message(
+                "❌ Interview not found or you don't have permission!", ephemeral=True
+            )
+
+    @app_commands.guild_only()
+    @app_commands.command(
+        name="delete_interview", description="Remove one of your interviews"
+    )
+    @app_commands.describe(interview_id="Interview to remove, start typing to search")
+    @app_commands.autocomplete(interview_id=interview_id_autocomplete)
+    async def delete_interview(
+        self, interaction: discord.Interaction, interview_id: int
+    ):
+        if await InterviewManager.delete_interview(
+            interaction.guild_id, interview_id, interaction.user.id
+        ):
+            await interaction.response.send_message(
+                "✅ Interview deleted successfully!"
+            )
+        else:
+            await interaction.response.send_message(
+                "❌ Interview not found or you don't have permission!", ephemeral=True
+            )
+
+    @app_commands.guild_only()
+    @app_commands.command(name="total", description="Your all-time interview count")
+    async def total(self, interaction: discord.Interaction):
+        count = await InterviewManager.get_user_total_count(
+            interaction.guild_id, interaction.user.id
+        )
+        await interaction.response.send_message(
+            f"🎉 You've scheduled {count} interviews in total!"
+        )
+
+    @app_commands.guild_only()
+    @app_commands.command(
+        name="calendar", description="Get your interviews in your calendar app"
+    )
+    async def calendar(self, interaction: discord.Interaction):
+        if not feeds_enabled():
+            await interaction.response.send_message(
+                "❌ Calendar feeds aren't enabled on this bot!", ephemeral=True
+            )
+            return
+        # Only the caller sees it, the link is as good as a password
+        await interaction.response.send_message(
+            "📅 Subscribe to this link in your calendar app to see your "
+            f"interviews:\n{feed_url(interaction.guild_id, interaction.user.id)}\n"
+            "Keep it to yourself, anyone with it can see them.",
+            ephemeral=True,
+        )
+
+
+async def setup(bot):
+    """Entry point for bot.load_extension()"""
+    await bot.add_cog(SlashCog(bot))
@@ -1,12 +1,31 @@
 """
 Tasks cog.
-Handles scheduled tasks like daily reminders and weekly rankings.
+Handles scheduled tasks like daily reminders, per-interview heads-ups and
+weekly rankings. Everything runs off the bot's event-driven Scheduler, which
+sleeps until the next deadline instead of polling.
 """
 
-from discord.ext import commands, tasks
-from datetime import time, datetime
+import asyncio
+import logging
+import time
+from discord.ext import commands
+from bot.db import events
+from bot.db.changes import ChangeLog
+from bot.db.guilds import GuildConfigManager
 from bot.db.models import InterviewManager
-from bot.core import CHANNEL_ID, paris_tz
+from bot.utils.dates import interview_time, local_now, next_local_time
+
+log = logging.getLogger(__name__)
+
+# Hour (local time) of the weekly ranking, posted on Sundays
+RANKING_HOUR = 20
+RANKING_WEEKDAY = 6  # Sunday
+
+# How long before a timed interview its owner gets a heads-up
+REMINDER_LEAD = 60 * 60
+
+# Seconds between trims of the change log, see bot.db.changes
+PRUNE_INTERVAL = 60
 
 
 class TasksCog(commands.Cog):
@@ -14,48 +33,197 @@ class TasksCog(commands.Cog):
 
     def __init__(self, bot):
         self.bot = bot
+        self.scheduler = bot.scheduler
 
         # We'll start the tasks in cog_load instead
         self.tasks_started = False
+        self._start_task = None
 
     async def cog_load(self):
         """Set up the tasks when the cog is loaded"""
-        # Start the scheduled tasks after the bot is ready
-        # This avoids the "no running event loop" error
-        self.check_interviews.start()
-        self.weekly_ranking.start()
+        # Keep the schedule in sync with every write from here on
+        events.subscribe(events.INTERVIEW_ADDED, self.schedule_reminder)
+        events.subscribe(events.INTERVIEW_UPDATED, self.schedule_reminder)
+        events.subscribe(events.INTERVIEW_DELETED, self.cancel_reminder)
+        events.subscribe(events.INTERVIEWS_RELOADED, self.on_interviews_reloaded)
+        events.subscribe(events.GUILD_CONFIG_UPDATED, self.schedule_guild_jobs)
+
+        if len(self.scheduler):
+            # Reloaded: the previous version of this cog left its schedule
+            # behind, take it over instead of rebuilding it from the DB
+            self.scheduler.replace_callbacks(self._take_over)
+            for config in GuildConfigManager.all():
+                self.schedule_guild_jobs(config)  # In case the times changed
+            self.scheduler.start()
+            log.info("🔄 Took over %d scheduled jobs", len(self.scheduler))
+        else:
+            # Start the scheduler after the bot is ready, so channels are cached
+            self._start_task = asyncio.create_task(self.start_scheduler())
         self.tasks_started = True
-        print("✅ Scheduled tasks started")
 
     def cog_unload(self):
-        """Clean up when the cog is unloaded"""
+        """Clean up when the cog is unloaded
+
+        Pending jobs stay in the bot's scheduler so a reloaded TasksCog can
+        pick them up, and jobs already firing are left to finish.
+        """
+        events.unsubscribe(events.INTERVIEW_ADDED, self.schedule_reminder)
+        events.unsubscribe(events.INTERVIEW_UPDATED, self.schedule_reminder)
+        events.unsubscribe(events.INTERVIEW_DELETED, self.cancel_reminder)
+        events.unsubscribe(events.INTERVIEWS_RELOADED, self.on_interviews_reloaded)
+        events.unsubscribe(events.GUILD_CONFIG_UPDATED, self.schedule_guild_jobs)
+
         if self.tasks_started:
-            self.check_interviews.cancel()
-            self.weekly_ranking.cancel()
-            print("❌ Scheduled tasks stopped")
-
-    @tasks.loop(time=time(hour=8, tzinfo=paris_tz))
-    async def check_interviews(self):
-        """Daily task to remind about today's interviews"""
-        print(
-            f"📅 Running daily interview check at {datetime.now(paris_tz).strftime('%Y-%m-%d %H:%M:%S')}"
+            self.scheduler.stop()
+            if self._start_task and not self._start_task.done():
+                # Half-built schedule, let the next load start from scratch
+                self._start_task.cancel()
+                self.scheduler.cancel_where(lambda key: True)
+            log.info("❌ Scheduled tasks stopped")
+
+    def _take_over(self, callback):
+        """Point a job booked by a previous TasksCog at this one"""
+        owner = getattr(callback, "__self__", None)
+        if (
+            isinstance(owner, commands.Cog)
+            and owner.qualified_name == self.qualified_name
+        ):
+            return getattr(self, callback.__name__)
+        return callback
+
+    async def start_scheduler(self):
+        """Build the whole schedule from the DB and start running it"""
+        await self.bot.wait_until_ready()
+        await self.bot.db_ready.wait()
+
+        # Once for every worker, it may set a guild's channel
+        try:
+            await self.bot.adopt_legacy_channel()
+        except Exception:
+            log.exception("⚠️ Could not adopt the CHANNEL_ID setup")
+
+        # Other workers' writes reach us as events from here on (see
+        # ChangeTailer), but settings may have changed since we loaded them
+        await GuildConfigManager.load_all()
+        for config in GuildConfigManager.all():
+            self.schedule_guild_jobs(config)
+        await self.rebuild_reminders()
+
+        self.schedule_prune()
+        self.scheduler.start()
+        log.info("✅ Scheduled tasks started (%d jobs pending)", len(self.scheduler))
+
+    async def rebuild_reminders(self):
+        """Reload every upcoming interview heads-up in one indexed query"""
+        rows = await InterviewManager.get_upcoming_reminders(
+            time.time() + REMINDER_LEAD
+        )
+
+        self.scheduler.cancel_where(lambda key: key[0] == "reminder")
+        for row in rows:
+            self.schedule_reminder(row)
+
+    def schedule_prune(self):
+        self.scheduler.schedule(
+            ("prune",), time.time() + PRUNE_INTERVAL, self.prune_changes
+        )
+
+    async def prune_changes(self):
+        """Trim the change log up to what every worker has applied"""
+        try:
+            await ChangeLog.prune()
+        except Exception:
+            log.exception("⚠️ Could not prune the change log")
+        finally:
+            self.schedule_prune()
+
+    def on_interviews_reloaded(self):
+        """Lots of interviews changed at once, re-read them all"""
+        asyncio.create_task(self.rebuild_reminders())
+
+    def schedule_reminder(self, interview):
+        """(Re)schedule the heads-up for one interview"""
+        key = ("reminder", interview["id"])
+        when = interview["scheduled_at"] - REMINDER_LEAD
+
+        # Date-only interviews have no start time to warn about
+        if not interview["has_time"] or when <= time.time():
+            self.scheduler.cancel(key)
+            return
+
+        self.scheduler.schedule(key, when, self.send_interview_reminder, interview)
+
+    def cancel_reminder(self, interview):
+        """Drop the heads-up of a deleted interview"""
+        self.scheduler.cancel(("reminder", interview["id"]))
+
+    def schedule_guild_jobs(self, config):
+        """(Re)schedule a guild's daily digest and weekly ranking"""
+        guild_id = config["guild_id"]
+        self.scheduler.schedule(
+            ("digest", guild_id),
+            next_local_time(config["reminder_hour"], config["timezone"]),
+            self.run_daily_digest,
+            guild_id,
+        )
+        self.scheduler.schedule(
+            ("ranking", guild_id),
+            next_local_time(RANKING_HOUR, config["timezone"], RANKING_WEEKDAY),
+            self.run_weekly_ranking,
+            guild_id,
         )
 
-        channel = self.bot.get_channel(CHANNEL_ID)
-        if not channel:
-            print(f"⚠️ Could not find channel with ID {CHANNEL_ID}")
+    def _guild_channel(self, guild_id):
+        """Get the reminder channel ID of a guild, or None if it has none"""
+        return GuildConfigManager.get(guild_id)["channel_id"]
+
+    async def send_interview_reminder(self, interview):
+        """Warn the owner of an interview that it starts soon"""
+        channel_id = self._guild_channel(interview["guild_id"])
+        if not channel_id:
             return
 
-        # Clean up old interviews first
-        deleted = InterviewManager.delete_old_interviews()
-        if deleted > 0:
-            print(f"🧹 Cleaned up {deleted} old interviews")
+        desc = f" - {interview['description']}" if interview["description"] else ""
+        # Reminders due at the same minute get merged into one message
+        await self.bot.dispatcher.send(
+            channel_id,
+            f"⏰ <@{interview['user_id']}> your **{interview['interview_type']}** "
+            f"interview starts in 1 hour (at {interview_time(interview)}){desc}",
+        )
+
+    async def run_daily_digest(self, guild_id):
+        """Send a guild its daily reminder, then book the next one"""
+        log.info(
+            "📅 Running daily interview check for guild %s",
+            guild_id,
+            extra={"guild": guild_id},
+        )
+        try:
+            channel_id = self._guild_channel(guild_id)
+            if channel_id:
+                await self.send_daily_reminder(guild_id, channel_id)
+
+            # Archive after posting, so the reminder never waits on it
+            archived = await InterviewManager.archive_old_interviews(guild_id)
+            if archived > 0:
+                log.info(
+                    "🧹 Archived %d old interviews in guild %s",
+                    archived,
+                    guild_id,
+                    extra={"guild": guild_id},
+                )
+        finally:
+            self.schedule_guild_jobs(GuildConfigManager.get(guild_id))
 
+    async def send_daily_reminder(self, guild_id, channel_id):
+        """Post today's list for one guild"""
         # Get today's interviews
-        today_interviews = InterviewManager.get_today_interviews()
+        today_interviews = await InterviewManager.get_today_interviews(guild_id)
 
         if not today_interviews:
-            await channel.send("No interviews scheduled for today! 🎉")
+            await self.bot.dispatcher.send(
+                channel_id, "No interviews scheduled for today! 🎉"
+            )
             return
 
         # Format the message
@@ -63,54 +231,47 @@ class TasksCog(commands.Cog):
         for interview in today_interviews:
             user_name = interview["user_name"]
             int_type = interview["interview_type"]
-            int_time = (
-                interview["interview_time"]
-                if interview["interview_time"]
-                else "No time specified"
-            )
+            int_time = interview_time(interview) or "No time specified"
             desc = interview["description"]
             message.append(f"• **{user_name}** at **{int_time}**: {int_type} - {desc}")
 
-        await channel.send("\n".join(message))
+        await self.bot.dispatcher.send(channel_id, "\n".join(message))
 
-    @tasks.loop(time=time(hour=20, tzinfo=paris_tz))
-    async def weekly_ranking(self):
-        """Weekly task to show interview rankings (runs on Sunday)"""
-        print(
-            f"📊 Weekly ranking check triggered at {datetime.now(paris_tz).strftime('%Y-%m-%d %H:%M:%S')}"
+    async def run_weekly_ranking(self, guild_id):
+        """Send a guild its weekly ranking, then book next week's"""
+        log.info(
+            "📊 It's Sunday! Running weekly ranking for guild %s...",
+            guild_id,
+            extra={"guild": guild_id},
         )
+        try:
+            channel_id = self._guild_channel(guild_id)
+            if channel_id:
+                await self.send_weekly_ranking(guild_id, channel_id)
+        finally:
+            self.schedule_guild_jobs(GuildConfigManager.get(guild_id))
 
-        # Get current day of week (0 = Monday, 6 = Sunday)
-        current_day = datetime.now(paris_tz).weekday()
-
-        # Only run on Sunday (day 6)
-        if current_day != 6:
-            print(f"📊 Not Sunday (day: {current_day}), skipping weekly ranking")
-            return
-
-        print("📊 It's Sunday! Running weekly ranking...")
-        channel = self.bot.get_channel(CHANNEL_ID)
-        if not channel:
-            print(f"⚠️ Could not find channel with ID {CHANNEL_ID}")
-            return
-
-        # Get interview counts for all users
-        counts = InterviewManager.get_all_interviews_count()
+    async def send_weekly_ranking(self, guild_id, channel_id):
+        """Post the interview ranking for one guild"""
+        # Interviews added this week, whenever they're scheduled for, read
+        # from the per-user counters. Users who added none aren't listed
+        counts = await InterviewManager.get_all_interviews_count(guild_id, "weekly")
 
         if not counts:
-            await channel.send("No interviews tracked yet! 📭")
+            await self.bot.dispatcher.send(channel_id, "No interviews tracked yet! 📭")
             return
 
         # Format the message
         message = ["**Weekly Interview Ranking 🏆**"]
         for idx, row in enumerate(counts, 1):
-            message.append(f"{idx}. {row['user_name']}: {row['count']} interviews")
+            message.append(
+                f"{idx}. {row['user_name']}: {row['count']} interviews "
+                f"({row['lifetime']} all-time)"
+            )
 
-        await channel.send("\n".join(message))
+        await self.bot.dispatcher.send(channel_id, "\n".join(message))
 
-    # Wait until the bot is ready before starting tasks
-    @check_interviews.before_loop
-    @weekly_ranking.before_loop
-    async def before_tasks(self):
-        """Wait until the bot is ready before starting tasks"""
-        await self.bot.wait_until_ready()
+
+async def setup(bot):
+    """Entry point for bot.load_extension()"""
+    await bot.add_cog(TasksCog(bot))
@@ -1,58 +1,344 @@
 """
 Core bot setup and configuration.
 This is where all the important bot initialization happens!
+
+Nothing here reads the environment or touches the database at import time,
+so tools and benchmarks can import the bot without a token. The cogs are
+only imported when the bot is built and the database is migrated on its own
+thread while the bot logs in and connects to the gateway.
 """
 
+import asyncio
+import logging
 import os
+import signal
+import time
+from contextlib import asynccontextmanager, contextmanager
 import discord
 from discord.ext import commands
-import pytz
-from dotenv import load_dotenv
+from bot.dispatch import MessageDispatcher
+from bot.leader import LEADER_EXTENSIONS, LeaderElection
+from bot.metrics import instrument_bot, start_metrics_server
+from bot.reload import EXTENSIONS, ReloadWatcher
+from bot.scheduler import Scheduler
+
+log = logging.getLogger(__name__)
+
+__all__ = ["InterviewBot", "ShardedInterviewBot", "create_bot", "get_token", "run"]
+
+
+def get_token():
+    """Read the bot token, only needed to actually connect"""
+    token = os.getenv("BOT_TOKEN")
+    if token is None:
+        raise ValueError("BOT_TOKEN not found in .env file")
+    return token
+
+
+def shard_config():
+    """(shard IDs, shard count) this process runs, (None, None) if unsharded
+
+    Set by the supervisor for each worker, SHARD_COUNT alone runs every
+    shard in this one process.
+    """
+    shard_count = int(os.getenv("SHARD_COUNT", "0")) or None
+    shard_ids = os.getenv("SHARD_IDS")
+    if shard_ids:
+        return [int(shard_id) for shard_id in shard_ids.split(",")], shard_count
+    return None, shard_count
+
+
+def legacy_channel_id():
+    """The reminder channel from before per-guild settings existed (optional)
+
+    Its guild gets it as its default channel and inherits old interviews.
+    """
+    channel_id_str = os.getenv("CHANNEL_ID")
+    return int(channel_id_str) if channel_id_str else None
+
+
+class StartupTimer:
+    """Records how long each step of the startup took
+
+    Steps are durations. Marks are times since the start, for milestones
+    that depend on several overlapping steps.
+    """
+
+    def __init__(self, started=None):
+        self.started = started if started is not None else time.perf_counter()
+        self.steps = {}
+        self.marks = {}
+
+    @contextmanager
+    def step(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps[name] = time.perf_counter() - start
+
+    def mark(self, name):
+        self.marks[name] = time.perf_counter() - self.started
+
+    def summary(self):
+        parts = [f"{name} at {seconds:.2f}s" for name, seconds in self.marks.items()]
+        parts += [f"{name} took {seconds:.2f}s" for name, seconds in self.steps.items()]
+        return ", ".join(parts)
+
+
+class InterviewBot(commands.Bot):
+    """The bot, with its scheduler, send queue and startup sequence"""
+
+    def __init__(self, started=None, **options):
+        # Bot configuration
+        intents = discord.Intents.default()
+        intents.message_content = True
+
+        # We'll use our custom help command
+        super().__init__(
+            command_prefix="!", intents=intents, help_command=None, **options
+        )
+
+        # Reminders, digests and rankings all run off this one scheduler
+        self.scheduler = Scheduler()
+
+        # ...and post through this rate-limited send queue
+        self.dispatcher = MessageDispatcher(self)
 
-# Load environment variables
-load_dotenv()
-BOT_TOKEN = os.getenv("BOT_TOKEN")
-if BOT_TOKEN is None:
-    raise ValueError("BOT_TOKEN not found in .env file")
+        self.metrics_runner = None
+        self.reload_watcher = None
+        self.election = LeaderElection(self)
+        self.app_commands_synced = False
+        self.startup = StartupTimer(started)
+        self.db_ready = asyncio.Event()
+        self.change_tailer = None
 
-channel_id_str = os.getenv("CHANNEL_ID")
-if channel_id_str is None:
-    raise ValueError("CHANNEL_ID not found in .env file")
-CHANNEL_ID = int(channel_id_str)
+        # Cleared while cogs reload, new commands wait until it's set again
+        self.accepting_commands = asyncio.Event()
+        self.accepting_commands.set()
+        self._in_flight = set()  # Contexts of the commands running right now
+        self._in_flight_changed = asyncio.Condition()
 
-# Set up timezone
-paris_tz = pytz.timezone("Europe/Paris")
+        # Commands sent while the database is still migrating wait for it
+        self.add_check(self.wait_for_db)
 
-# Bot configuration
-intents = discord.Intents.default()
-intents.message_content = True
+    async def wait_for_db(self, ctx):
+        await self.db_ready.wait()
+        return True
 
-bot = commands.Bot(command_prefix="!", intents=intents)
-bot.help_command = None  # We'll use our custom help command
+    async def process_commands(self, message):
+        # Held here rather than failing, so a reload costs latency, not commands
+        if not self.accepting_commands.is_set():
+            await self.accepting_commands.wait()
+        await super().process_commands(message)
 
-# Export important variables for use in other modules
-__all__ = ["bot", "paris_tz", "CHANNEL_ID", "BOT_TOKEN"]
+    async def invoke(self, ctx):
+        self._in_flight.add(ctx)
+        try:
+            await super().invoke(ctx)
+        finally:
+            self._in_flight.discard(ctx)
+            async with self._in_flight_changed:
+                self._in_flight_changed.notify_all()
 
+    @asynccontextmanager
+    async def commands_paused(self, exclude=None, timeout=30):
+        """Hold new commands and wait for running ones to finish
 
-async def setup_bot():
-    """Load all cogs and perform any other setup needed"""
-    # Import here to avoid circular imports
-    from bot.cogs import interviews, admin, tasks
+        Args:
+            exclude: Context of the command asking for the pause, which
+                would otherwise wait for itself
+            timeout: Seconds to wait for running commands before going
+                ahead anyway
+        """
+        self.accepting_commands.clear()
+        try:
+            async with self._in_flight_changed:
+                try:
+                    await asyncio.wait_for(
+                        self._in_flight_changed.wait_for(
+                            lambda: not self._in_flight - {exclude}
+                        ),
+                        timeout,
+                    )
+                except asyncio.TimeoutError:
+                    log.warning(
+                        "⚠️ %d commands still running after %ss, going ahead",
+                        len(self._in_flight - {exclude}),
+                        timeout,
+                    )
+            yield
+        finally:
+            self.accepting_commands.set()
 
-    # Register all cogs (need to await these since they're coroutines)
-    await bot.add_cog(interviews.InterviewCog(bot))
-    await bot.add_cog(admin.AdminCog(bot))
-    await bot.add_cog(tasks.TasksCog(bot))
+    async def prepare_db(self):
+        """Migrate the database and load per-guild settings"""
+        # Import here so importing bot.core stays cheap
+        from bot.db import open_storage
+        from bot.db.changes import ChangeTailer
+        from bot.db.guilds import GuildConfigManager
 
-    @bot.event
-    async def on_ready():
+        try:
+            with self.startup.step("database"):
+                await open_storage()
+                # Follow the other workers' writes, from before we load anything
+                self.change_tailer = ChangeTailer()
+                await self.change_tailer.start()
+                # Per-guild settings live in memory from here on
+                count = await GuildConfigManager.load_all()
+        except Exception:
+            # Better to stop than to run half-up without a database
+            log.exception("❌ Database setup failed, shutting down")
+            await self.close()
+            raise
+        log.info("⚙️ Loaded settings for %d guild(s)", count)
+        self.db_ready.set()
+
+    async def setup_hook(self):
+        """Called by discord.py once logged in, before connecting"""
+        self.dispatcher.start()
+
+        # Time commands and queries, and serve the numbers to Prometheus
+        instrument_bot(self)
+        self.metrics_runner = await start_metrics_server()
+
+        with self.startup.step("extensions"):
+            for name in EXTENSIONS:
+                if name not in LEADER_EXTENSIONS:
+                    await self.load_extension(name)
+
+        # The scheduled tasks only run in whichever process holds the lease
+        self.election.start()
+
+        # Reload cogs and settings when their files change, if enabled
+        self.reload_watcher = ReloadWatcher(self)
+        self.reload_watcher.start()
+
+    async def sync_app_commands(self):
+        """Register the slash commands with Discord, once per process
+
+        Best effort: the prefix commands keep working if this fails, and the
+        next leader tries again.
+        """
+        if self.app_commands_synced:
+            return
+        try:
+            synced = await self.tree.sync()
+        except Exception:
+            log.exception("⚠️ Could not sync slash commands")
+            return
+        self.app_commands_synced = True
+        log.info("🔁 Synced %d slash command(s)", len(synced))
+
+    async def on_ready(self):
         """Called when the bot is ready to start receiving events"""
-        print(f"🤖 Logged in as {bot.user} (ID: {bot.user.id})")
-        print(f"🌍 Using CHANNEL_ID: {CHANNEL_ID}")
-        print("✨ Bot is ready to receive commands!")
+        log.info("🤖 Logged in as %s (ID: %s)", self.user, self.user.id)
+        log.info("🌍 Serving %d guild(s)", len(self.guilds))
+
+        await self.db_ready.wait()
+
+        # on_ready fires again after a reconnect, only time the first one
+        if "ready" not in self.startup.marks:
+            self.startup.mark("ready")
+            log.info("🚀 Startup: %s", self.startup.summary())
+        log.info("✨ Bot is ready to receive commands!")
+
+    async def adopt_legacy_channel(self):
+        """Carry the old single-server CHANNEL_ID setup over to its guild
+
+        Only the leader runs it (see TasksCog). The channel may be on a shard
+        another worker runs, so it's looked up through the API if it isn't
+        cached here.
+        """
+        from bot.db.guilds import GuildConfigManager
+        from bot.db.models import InterviewManager
 
+        channel_id = legacy_channel_id()
+        if channel_id is None:
+            return
 
-async def run():
+        channel = self.get_channel(channel_id)
+        if channel is None:
+            try:
+                channel = await self.fetch_channel(channel_id)
+            except (discord.NotFound, discord.Forbidden):
+                log.warning("⚠️ Could not find channel with ID %s", channel_id)
+                return
+        if getattr(channel, "guild", None) is None:
+            log.warning("⚠️ CHANNEL_ID %s isn't a server channel", channel_id)
+            return
+
+        guild_id = channel.guild.id
+        if GuildConfigManager.get(guild_id)["channel_id"] is None:
+            await GuildConfigManager.update(guild_id, channel_id=channel_id)
+            log.info(
+                "🌍 Using CHANNEL_ID %s as the channel for guild %s",
+                channel_id,
+                guild_id,
+            )
+
+        moved = await InterviewManager.adopt_legacy_interviews(guild_id)
+        if moved:
+            log.info("📦 Moved %d interviews from before multi-guild support", moved)
+
+
+class ShardedInterviewBot(InterviewBot, commands.AutoShardedBot):
+    """Same bot, running several shards over their own gateway connections"""
+
+
+def create_bot(started=None, shard_ids=None, shard_count=None):
+    """Build a bot ready to log in
+
+    Args:
+        started: perf_counter() value startup timings are measured from,
+            defaults to now
+        shard_ids: Shards to run in this process, all of them if None
+        shard_count: Total shards across every process, None to not shard
+    """
+    if shard_count:
+        bot = ShardedInterviewBot(started, shard_ids=shard_ids, shard_count=shard_count)
+    else:
+        bot = InterviewBot(started)
+    bot.startup.mark("imports")
+    return bot
+
+
+async def run(started=None):
     """Start the bot with the token from environment"""
-    await setup_bot()
-    await bot.start(BOT_TOKEN)  # Using bot.start instead of bot.run
+    from bot.db import close_storage
+
+    token = get_token()
+    shard_ids, shard_count = shard_config()
+    bot = create_bot(started, shard_ids, shard_count)
+    if shard_count:
+        log.info("🧩 Running shards %s of %d", shard_ids or "all", shard_count)
+
+    # The supervisor stops workers with SIGTERM, so does docker
+    asyncio.get_running_loop().add_signal_handler(
+        signal.SIGTERM, lambda: asyncio.create_task(bot.close())
+    )
+
+    # Migrate while we log in and connect, both mostly wait on the network
+    db_task = asyncio.create_task(bot.prepare_db())
+    try:
+        async with bot:
+            await bot.login(token)
+            bot.startup.mark("logged in")
+            await bot.connect()
+        # Report a failed migration, which is what closed the bot
+        if db_task.done() and not db_task.cancelled():
+            db_task.result()
+    finally:
+        db_task.cancel()
+        if bot.reload_watcher:
+            bot.reload_watcher.stop()
+        # Hand the scheduled tasks over to another worker right away
+        await bot.election.stop()
+        # Give queued messages a chance to go out
+        await bot.dispatcher.stop()
+        if bot.metrics_runner:
+            await bot.metrics_runner.cleanup()
+        if bot.change_tailer:
+            await bot.change_tailer.stop()
+        # Flush pending queries and close pooled DB connections
+        await close_storage()
@@ -1,4 +1,33 @@
-from bot.db.manager import get_db, init_db
+from bot.db.cache import query_cache
+from bot.db.manager import (
+    close_db,
+    get_db,
+    init_db,
+    init_db_async,
+    run_in_db_thread,
+)
 from bot.db.models import InterviewManager
+from bot.db.storage import (
+    Record,
+    Storage,
+    close_storage,
+    get_storage,
+    open_storage,
+    set_storage,
+)
 
-__all__ = ["get_db", "init_db", "InterviewManager"]
+__all__ = [
+    "close_db",
+    "get_db",
+    "init_db",
+    "init_db_async",
+    "run_in_db_thread",
+    "InterviewManager",
+    "query_cache",
+    "Record",
+    "Storage",
+    "close_storage",
+    "get_storage",
+    "open_storage",
+    "set_storage",
+]
@@ -0,0 +1,186 @@
+"""
+In-process read-through cache for InterviewManager queries.
+Results are tagged by the guild and the user, day or guild-wide scope they
+depend on, and the write paths invalidate exactly the tags they touch.
+"""
+
+import functools
+import os
+import threading
+import time
+from collections import OrderedDict
+from bot.utils.dates import local_now
+from .guilds import GuildConfigManager
+
+CACHE_SIZE = int(os.getenv("CACHE_SIZE", "1024"))  # Max cached query results
+CACHE_TTL = float(os.getenv("CACHE_TTL", "300"))  # Seconds before an entry expires
+
+
+class QueryCache:
+    """Bounded LRU cache with a TTL, tag-based invalidation and hit/miss counters
+
+    Writes may happen on the DB worker thread while reads happen on the event
+    loop, so everything is guarded by a lock. A result fetched before an
+    invalidation of its tag is never stored, which keeps slow reads from
+    putting stale data back into the cache.
+
+    Only the last `max_tags` invalidations are remembered. Older ones are
+    folded into `_cleared_at`, as if everything had been cleared then: a
+    fetch that old is refused whatever its tag, and tag versions never go
+    back.
+    """
+
+    def __init__(self, maxsize=CACHE_SIZE, ttl=CACHE_TTL, max_tags=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_tags = max_tags or 4 * maxsize
+        self.hits = 0
+        self.misses = 0
+        self.version = 0  # Bumped on every invalidation
+
+        self._entries = OrderedDict()  # key -> (expires_at, tag, value)
+        self._keys_by_tag = {}  # tag -> set of keys
+        # tag -> version of its last invalidation, oldest first. Tags not in
+        # it were last invalidated at _cleared_at or before
+        self._invalidated_at = OrderedDict()
+        self._cleared_at = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Look up a key
+
+        Returns:
+            (True, value) on a hit, (False, None) on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return False, None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[2]
+
+    def set(self, key, value, tag, version):
+        """Store a result that was fetched when the cache was at `version`"""
+        with self._lock:
+            # The data changed while we were fetching it, don't cache it
+            if self._invalidated_at.get(tag, self._cleared_at) > version:
+                return
+
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, tag, value)
+            self._keys_by_tag.setdefault(tag, set()).add(key)
+
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, *tags):
+        """Drop every entry carrying one of the given tags"""
+        with self._lock:
+            self.version += 1
+            for tag in tags:
+                self._invalidated_at[tag] = self.version
+                self._invalidated_at.move_to_end(tag)
+                for key in self._keys_by_tag.pop(tag, ()):
+                    self._entries.pop(key, None)
+
+            while len(self._invalidated_at) > self.max_tags:
+                _, self._cleared_at = self._invalidated_at.popitem(last=False)
+
+    def tag_version(self, tag):
+        """Version of the last write to `tag`, it only ever goes up
+
+        Lets callers keeping their own copy of some data (like the calendar
+        feeds) see whether it changed, without asking the database.
+        """
+        with self._lock:
+            return self._invalidated_at.get(tag, self._cleared_at)
+
+    def clear(self):
+        """Drop everything (used after bulk writes that touch many users)"""
+        with self._lock:
+            self.version += 1
+            self._cleared_at = self.version
+            self._entries.clear()
+            self._keys_by_tag.clear()
+            self._invalidated_at.clear()
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "size": len(self._entries),
+            }
+
+    def _remove(self, key):
+        _, tag, _ = self._entries.pop(key)
+        keys = self._keys_by_tag.get(tag)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_tag[tag]
+
+
+query_cache = QueryCache()
+
+
+def user_tag(guild_id, user_id):
+    return ("user", guild_id, user_id)
+
+
+def day_tag(guild_id, day):
+    return ("day", guild_id, day)
+
+
+def guild_tag(guild_id):
+    return ("guild", guild_id)
+
+
+def cached(scope):
+    """Serve an InterviewManager read from the cache when possible
+
+    The first argument of the wrapped method must be the guild ID.
+
+    Args:
+        scope: "user" (second argument is a user ID), "day" (results for
+            today) or "guild" (results spanning every user in the guild)
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            # Results depend on what "today" is and where the guild's days
+            # start, so both are part of every key
+            guild_id = args[0]
+            tz_name = GuildConfigManager.timezone(guild_id)
+            today = local_now(tz_name).date()
+            key = (func.__name__, args, tuple(sorted(kwargs.items())), today, tz_name)
+
+            hit, value = query_cache.get(key)
+            if hit:
+                return value
+
+            if scope == "user":
+                tag = user_tag(guild_id, args[1])
+            elif scope == "day":
+                tag = day_tag(guild_id, today)
+            else:
+                tag = guild_tag(guild_id)
+
+            version = query_cache.version
+            value = await func(*args, **kwargs)
+            query_cache.set(key, value, tag, version)
+            return value
+
+        return wrapper
+
+    return decorator
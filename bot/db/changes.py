@@ -0,0 +1,170 @@
+"""
+Change log reader.
+Triggers log every write to interviews and guild_config, whichever bot
+process made it. Every process tails the log (see ChangeTailer) to drop
+cached results and refresh settings the other workers' writes touched, and
+republishes them as events so the schedule and search index follow too.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from bot.utils.dates import local_now
+from . import events
+from .cache import day_tag, guild_tag, query_cache, user_tag
+from .guilds import GuildConfigManager
+from .storage import get_storage
+
+log = logging.getLogger(__name__)
+
+# Changes applied per read, interview IDs go into one IN (...) list
+CHANGE_BATCH = 500
+
+# Seconds between checks for writes made by other bot processes
+SYNC_INTERVAL = float(os.getenv("SYNC_INTERVAL", "5"))
+
+# Seconds after which a reader that stopped acknowledging is given up on,
+# and the log is pruned without waiting for it
+CHANGE_READER_TIMEOUT = float(os.getenv("CHANGE_READER_TIMEOUT", "300"))
+
+
+class ChangeLog:
+    """Reads and trims the change_log table
+
+    Positions in the log are opaque cursors, see Storage.
+    """
+
+    @staticmethod
+    async def latest():
+        """Cursor after every change committed so far"""
+        return await get_storage().latest_change()
+
+    @staticmethod
+    async def read(after, limit=CHANGE_BATCH):
+        """Changes newer than `after`, with the current state of what they touched
+
+        Args:
+            after: Cursor after the last change already applied
+            limit: Most changes to return
+
+        Returns:
+            Changes (see bot.db.storage), with `after` as its cursor if
+            there were none
+        """
+        return await get_storage().read_changes(after, limit)
+
+    @staticmethod
+    async def ack(reader, cursor):
+        """Record that `reader` applied every change up to `cursor`
+
+        Returns:
+            False if `reader` wasn't registered, changes it hadn't read may
+            have been pruned since
+        """
+        return await get_storage().ack_changes(reader, cursor)
+
+    @staticmethod
+    async def prune(stale_after=CHANGE_READER_TIMEOUT):
+        """Forget every change all live readers have applied"""
+        await get_storage().prune_changes(stale_after)
+
+
+class ChangeTailer:
+    """Applies every process's writes to this process's in-memory state
+
+    Changed interviews drop the cached results of their user, guild and the
+    guild's current day, and are republished as INTERVIEW_UPDATED or
+    INTERVIEW_DELETED. Changed settings are reloaded and republished as
+    GUILD_CONFIG_UPDATED. Our own writes come back too, applying them twice
+    is harmless.
+    """
+
+    def __init__(self, interval=SYNC_INTERVAL, timeout=CHANGE_READER_TIMEOUT):
+        self.interval = interval
+        self.timeout = timeout
+        self.name = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.cursor = None
+        self._acked_at = 0.0
+        self._task = None
+
+    async def start(self):
+        """Register as a reader from the current end of the log, then follow it
+
+        Call before loading anything the log keeps up to date, so nothing
+        written in between is missed.
+        """
+        self.cursor = await ChangeLog.latest()
+        await ChangeLog.ack(self.name, self.cursor)
+        self._acked_at = time.monotonic()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.poll()
+            except Exception:
+                log.exception("⚠️ Could not sync changes from other workers")
+
+    async def poll(self):
+        """Apply every change since the last poll"""
+        cursor = self.cursor
+        while True:
+            changes = await ChangeLog.read(cursor)
+            if changes.cursor == cursor:
+                break
+            await self.apply(changes)
+            cursor = changes.cursor
+
+        # Acknowledge progress, and stay registered while idle
+        moved = cursor != self.cursor
+        self.cursor = cursor
+        if moved or time.monotonic() - self._acked_at > self.timeout / 3:
+            known = await ChangeLog.ack(self.name, cursor)
+            self._acked_at = time.monotonic()
+            if not known:
+                await self.resync()
+
+    async def apply(self, changes):
+        """Bring the cache, settings and subscribers up to date with Changes"""
+        if changes.configs:
+            await GuildConfigManager.load_all()
+
+        rows = [*changes.interviews.values(), *changes.deleted.values()]
+        tags = set()
+        for guild_id in {row["guild_id"] for row in rows}:
+            today = local_now(GuildConfigManager.timezone(guild_id)).date()
+            tags.update((guild_tag(guild_id), day_tag(guild_id, today)))
+        tags.update(user_tag(row["guild_id"], row["user_id"]) for row in rows)
+        if tags:
+            query_cache.invalidate(*tags)
+
+        for guild_id in changes.configs:
+            events.publish(
+                events.GUILD_CONFIG_UPDATED, GuildConfigManager.get(guild_id)
+            )
+        for row in changes.interviews.values():
+            events.publish(events.INTERVIEW_UPDATED, row)
+        for row in changes.deleted.values():
+            events.publish(events.INTERVIEW_DELETED, row)
+
+    async def resync(self):
+        """We were given up on and may have missed changes, reload everything"""
+        log.warning("⚠️ Fell behind on the change log, reloading everything")
+        await GuildConfigManager.load_all()
+        query_cache.clear()
+        for config in GuildConfigManager.all():
+            events.publish(events.GUILD_CONFIG_UPDATED, config)
+        events.publish(events.INTERVIEWS_RELOADED)
@@ -0,0 +1,54 @@
+"""
+Change notifications for the data layer.
+Writes publish an event after they commit, and subscribers (the reminder
+scheduler, for instance) get called on the event loop they subscribed from,
+even though the write itself ran on the DB worker thread.
+"""
+
+import asyncio
+import threading
+
+# Event names published by InterviewManager and GuildConfigManager
+INTERVIEW_ADDED = "interview_added"
+INTERVIEW_UPDATED = "interview_updated"
+INTERVIEW_DELETED = "interview_deleted"
+INTERVIEWS_RELOADED = "interviews_reloaded"  # Bulk change, re-read everything
+GUILD_CONFIG_UPDATED = "guild_config_updated"
+
+_subscribers = {}  # event name -> list of (loop or None, callback)
+_lock = threading.Lock()
+
+
+def subscribe(event, callback):
+    """Call `callback(*args)` every time `event` is published
+
+    If called from inside an event loop, the callback always runs on that
+    loop. Otherwise it runs directly in whichever thread published.
+    """
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+
+    with _lock:
+        _subscribers.setdefault(event, []).append((loop, callback))
+
+
+def unsubscribe(event, callback):
+    """Stop calling `callback` for `event`"""
+    with _lock:
+        _subscribers[event] = [
+            (loop, cb) for loop, cb in _subscribers.get(event, []) if cb != callback
+        ]
+
+
+def publish(event, *args):
+    """Notify every subscriber of `event` (safe to call from any thread)"""
+    with _lock:
+        subscribers = list(_subscribers.get(event, []))
+
+    for loop, callback in subscribers:
+        if loop is None:
+            callback(*args)
+        elif not loop.is_closed():
+            loop.call_soon_threadsafe(callback, *args)
@@ -0,0 +1,73 @@
+"""
+Per-guild configuration.
+Each server gets its own reminder channel, timezone and reminder hour. The
+whole table is loaded into memory at startup, so looking up a guild's
+settings never touches the database.
+"""
+
+from bot.utils.dates import DEFAULT_TIMEZONE
+from . import events
+from .storage import get_storage
+
+# Hour (local time) at which the daily reminder goes out by default
+DEFAULT_REMINDER_HOUR = 8
+
+# guild_id -> config dict, filled by GuildConfigManager.load_all()
+_configs = {}
+
+
+def _default_config(guild_id):
+    return {
+        "guild_id": guild_id,
+        "channel_id": None,
+        "timezone": DEFAULT_TIMEZONE,
+        "reminder_hour": DEFAULT_REMINDER_HOUR,
+    }
+
+
+class GuildConfigManager:
+    """Handles per-guild settings, served from an in-memory copy"""
+
+    @staticmethod
+    def get(guild_id):
+        """Get a guild's config (defaults if it was never configured)"""
+        return _configs.get(guild_id) or _default_config(guild_id)
+
+    @staticmethod
+    def timezone(guild_id):
+        """Get the timezone name a guild schedules interviews in"""
+        return GuildConfigManager.get(guild_id)["timezone"]
+
+    @staticmethod
+    def all():
+        """Get the configs of every guild that has been configured"""
+        return list(_configs.values())
+
+    @staticmethod
+    async def load_all():
+        """Load every guild config from the database into memory"""
+        rows = await get_storage().load_guild_configs()
+
+        _configs.clear()
+        for row in rows:
+            _configs[row["guild_id"]] = dict(row)
+        return len(rows)
+
+    @staticmethod
+    async def update(guild_id, **changes):
+        """Change some of a guild's settings
+
+        Args:
+            guild_id: Guild to configure
+            **changes: New values for channel_id, timezone and/or reminder_hour
+
+        Returns:
+            The guild's full config after the change
+        """
+        config = {**GuildConfigManager.get(guild_id), **changes}
+
+        await get_storage().save_guild_config(config)
+
+        _configs[guild_id] = config
+        events.publish(events.GUILD_CONFIG_UPDATED, config)
+        return config
@@ -0,0 +1,205 @@
+"""
+In-memory index of each user's upcoming interviews.
+Slash command autocomplete has to answer within Discord's 3 second
+deadline, so it's served from here rather than the database. A user's
+interviews are loaded once, the first time they're looked up, and then
+kept up to date by the InterviewManager events.
+
+Each process only indexes the guilds of its own shards, but any worker
+may write to them (web feeds, imports, leader-only jobs). Those writes
+reach the index through the ChangeTailer, which republishes every
+change in the log as the same events.
+"""
+
+import asyncio
+import os
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from bot.utils.dates import day_start, interview_datetime, local_now
+from . import events
+from .guilds import GuildConfigManager
+
+# Users whose interviews are kept in memory, least recently used go first
+INDEX_SIZE = int(os.getenv("INDEX_SIZE", "10000"))
+
+# Discord shows at most 25 choices, each name at most 100 characters
+MAX_CHOICES = 25
+LABEL_LIMIT = 100
+
+
+def _label(row, when):
+    """What autocomplete shows for an interview"""
+    time_str = when.strftime(" %H:%M") if row["has_time"] else ""
+    label = f"#{row['id']} · {when:%Y-%m-%d}{time_str} · {row['interview_type']}"
+    if row["description"]:
+        label += f" · {row['description']}"
+    if len(label) > LABEL_LIMIT:
+        label = label[: LABEL_LIMIT - 1] + "…"
+    return label
+
+
+def _words(row, when):
+    """Lowercase words an interview can be found by, as typed prefixes"""
+    words = {str(row["id"]), f"#{row['id']}", f"{when:%Y-%m-%d}"}
+    if row["has_time"]:
+        words.add(f"{when:%H:%M}")
+    words.update(str(row["interview_type"] or "").lower().split())
+    words.update(str(row["description"] or "").lower().split())
+    return words
+
+
+class UserInterviews:
+    """One user's interviews, searchable by word prefix
+
+    `words` is a sorted list of (word, interview ID), so every interview
+    with a word starting with some prefix is one bisect away.
+    """
+
+    __slots__ = ("entries", "words")
+
+    def __init__(self, rows=()):
+        self.entries = {}  # ID -> (scheduled_at, label, words)
+        self.words = []
+        for row in rows:
+            self.add(row)
+
+    def add(self, row):
+        self.remove(row["id"])
+        when = interview_datetime(row)
+        words = _words(row, when)
+        self.entries[row["id"]] = (row["scheduled_at"], _label(row, when), words)
+        for word in words:
+            insort(self.words, (word, row["id"]))
+
+    def remove(self, interview_id):
+        entry = self.entries.pop(interview_id, None)
+        if entry is None:
+            return
+        for word in entry[2]:
+            i = bisect_left(self.words, (word, interview_id))
+            del self.words[i]
+
+    def _prefixed(self, prefix):
+        """IDs of the interviews with a word starting with `prefix`"""
+        found = set()
+        i = bisect_left(self.words, (prefix,))
+        while i < len(self.words) and self.words[i][0].startswith(prefix):
+            found.add(self.words[i][1])
+            i += 1
+        return found
+
+    def search(self, text, since, limit):
+        """(ID, label) of interviews matching every word of `text`, soonest first"""
+        ids = None
+        for prefix in text.lower().split():
+            found = self._prefixed(prefix)
+            ids = found if ids is None else ids & found
+            if not ids:
+                return []
+        if ids is None:
+            ids = self.entries
+
+        matches = sorted(
+            (self.entries[i][0], i)
+            for i in ids
+            if since is None or self.entries[i][0] >= since
+        )
+        return [(i, self.entries[i][1]) for _, i in matches[:limit]]
+
+
+class InterviewIndex:
+    """Per-user interview indexes, loaded on demand and updated by events
+
+    Events and lookups both run on the event loop, so nothing needs a lock.
+    A user whose interviews change while they're being loaded gets loaded
+    again, rather than indexing a result from before the change.
+    """
+
+    def __init__(self, maxsize=INDEX_SIZE):
+        self.maxsize = maxsize
+        self._users = OrderedDict()  # (guild_id, user_id) -> UserInterviews
+        self._loading = {}  # (guild_id, user_id) -> Task loading them
+        self._stale = set()  # Keys written to while loading
+
+    def __len__(self):
+        return len(self._users)
+
+    def start(self):
+        """Follow writes from now on (call from the event loop)"""
+        events.subscribe(events.INTERVIEW_ADDED, self.on_interview_changed)
+        events.subscribe(events.INTERVIEW_UPDATED, self.on_interview_changed)
+        events.subscribe(events.INTERVIEW_DELETED, self.on_interview_deleted)
+        events.subscribe(events.INTERVIEWS_RELOADED, self.clear)
+
+    def stop(self):
+        """Stop following writes, and forget everything since it'd go stale"""
+        events.unsubscribe(events.INTERVIEW_ADDED, self.on_interview_changed)
+        events.unsubscribe(events.INTERVIEW_UPDATED, self.on_interview_changed)
+        events.unsubscribe(events.INTERVIEW_DELETED, self.on_interview_deleted)
+        events.unsubscribe(events.INTERVIEWS_RELOADED, self.clear)
+        self.clear()
+
+    def clear(self):
+        self._users.clear()
+        self._stale.update(self._loading)
+
+    def on_interview_changed(self, row):
+        key = (row["guild_id"], row["user_id"])
+        if key in self._users:
+            self._users[key].add(row)
+        elif key in self._loading:
+            self._stale.add(key)
+
+    def on_interview_deleted(self, row):
+        key = (row["guild_id"], row["user_id"])
+        if key in self._users:
+            self._users[key].remove(row["id"])
+        elif key in self._loading:
+            self._stale.add(key)
+
+    async def _load(self, key):
+        from .models import InterviewManager
+
+        while True:
+            self._stale.discard(key)
+            rows = await InterviewManager.get_user_interviews(*key)
+            if key not in self._stale:
+                break
+
+        self._users[key] = UserInterviews(rows)
+        while len(self._users) > self.maxsize:
+            self._users.popitem(last=False)
+        return self._users[key]
+
+    async def user(self, guild_id, user_id):
+        """A user's index, loading it from the database the first time"""
+        key = (guild_id, user_id)
+        index = self._users.get(key)
+        if index is not None:
+            self._users.move_to_end(key)
+            return index
+
+        # Concurrent lookups for the same user share one query
+        task = self._loading.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key))
+            self._loading[key] = task
+            task.add_done_callback(lambda _: self._loading.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def search(self, guild_id, user_id, text="", limit=MAX_CHOICES):
+        """A user's upcoming interviews matching `text`, for autocomplete
+
+        Every word of `text` must start one of the interview's words: its
+        ID, date, time, type or description.
+
+        Returns:
+            List of (interview ID, label), soonest first
+        """
+        index = await self.user(guild_id, user_id)
+        tz_name = GuildConfigManager.timezone(guild_id)
+        since = day_start(local_now(tz_name).date(), tz_name)
+        return index.search(text, since, limit)
+
+
+interview_index = InterviewIndex()
@@ -0,0 +1,31 @@
+"""
+Leases in the shared database.
+A lease gives one process a role (running the scheduled tasks, say) until
+it expires. The holder keeps renewing it, and if it dies the lease runs out
+and another process takes over.
+"""
+
+from .storage import get_storage
+
+
+class LeaseManager:
+    """Acquire, renew and release named leases"""
+
+    @staticmethod
+    async def acquire(name, holder, ttl):
+        """Take or renew a lease, if it's free, expired or already ours
+
+        Args:
+            name: Role the lease stands for
+            holder: Unique ID of the calling process
+            ttl: Seconds the lease lasts unless renewed
+
+        Returns:
+            (whether `holder` has the lease now, current holder, expiry epoch)
+        """
+        return await get_storage().acquire_lease(name, holder, ttl)
+
+    @staticmethod
+    async def release(name, holder):
+        """Give up a lease so the next process doesn't wait for it to expire"""
+        await get_storage().release_lease(name, holder)
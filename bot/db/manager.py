@@ -1,52 +1,143 @@
+import asyncio
+import functools
+import logging
 import sqlite3
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+from bot.metrics import DB_ERRORS, DB_LATENCY, DB_ROWS, DB_WAIT
+from .migrations import get_version, migrate
+
+log = logging.getLogger(__name__)
+
 # Database file path - use a constant for easier configuration
-DB_FILE = "interviews.db"
+DB_FILE = os.getenv("DB_FILE", "interviews.db")
 
+# Connection tuning, overridable from the environment
+DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL").upper()
+DB_CACHE_SIZE = int(os.getenv("DB_CACHE_SIZE", "-16000"))  # negative = KiB
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(64 * 1024 * 1024)))
+DB_BUSY_TIMEOUT = int(os.getenv("DB_BUSY_TIMEOUT", "5000"))  # milliseconds
 
-def get_db():
-    """Create a database connection and return it with row factory enabled"""
-    conn = sqlite3.connect(DB_FILE)
+if DB_SYNCHRONOUS not in ("OFF", "NORMAL", "FULL", "EXTRA"):
+    raise ValueError(f"Invalid DB_SYNCHRONOUS value: {DB_SYNCHRONOUS}")
+
+# Every query runs on this single worker thread, so sqlite3 I/O never blocks
+# the discord.py event loop. The executor's internal queue serializes requests.
+_db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-worker")
+
+
+# Each thread keeps one open connection for its whole lifetime. We also track
+# them all here so close_db() can shut everything down cleanly.
+_local = threading.local()
+_connections = []
+_connections_lock = threading.Lock()
+_generation = 0  # Bumped by close_db() so threads reconnect afterwards
+
+
+def _connect():
+    """Open a new connection in WAL mode with our pragmas applied"""
+    conn = sqlite3.connect(DB_FILE, check_same_thread=False)
     conn.row_factory = sqlite3.Row  # Enable column access by name
+
+    # WAL lets readers and the writer work at the same time
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA synchronous={DB_SYNCHRONOUS}")
+    conn.execute(f"PRAGMA cache_size={DB_CACHE_SIZE}")
+    conn.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+    conn.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT}")
+    return conn
+
+
+def get_db():
+    """Return this thread's database connection, opening it on first use
+
+    The connection stays open between calls, so use it as a context manager
+    (`with get_db() as conn:`) for transactions but never close it yourself.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.generation != _generation:
+        conn = _connect()
+        _local.conn = conn
+        _local.generation = _generation
+        with _connections_lock:
+            _connections.append(conn)
     return conn
 
 
+def close_db():
+    """Close every pooled connection (call this once on shutdown)
+
+    Queued queries on the DB worker thread are allowed to finish first. The
+    database can be opened again afterwards, on a new worker thread.
+    """
+    global _db_executor, _generation
+
+    _db_executor.shutdown(wait=True)
+    with _connections_lock:
+        for conn in _connections:
+            conn.close()
+        _connections.clear()
+        _generation += 1
+    _db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-worker")
+
+
+def run_in_db_thread(func):
+    """Turn a blocking database function into a coroutine
+
+    The wrapped coroutine hands the call to the DB worker thread and awaits the
+    result. The original blocking function stays available as `.sync` for
+    startup code and scripts that don't run inside an event loop.
+
+    Calls through the coroutine are timed and counted in bot.metrics.
+    """
+    name = func.__name__
+
+    def timed(queued_at, args, kwargs):
+        start = time.perf_counter()
+        DB_WAIT.observe(start - queued_at)
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            DB_ERRORS.inc(query=name)
+            raise
+        finally:
+            DB_LATENCY.observe(time.perf_counter() - start, query=name)
+
+        if isinstance(result, list):
+            DB_ROWS.inc(len(result), query=name)
+        return result
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            _db_executor, timed, time.perf_counter(), args, kwargs
+        )
+
+    wrapper.sync = func
+    return wrapper
+
+
 def init_db():
-    """Initialize the database, creating tables if they don't exist"""
+    """Initialize the database and bring its schema up to date"""
     # Make sure the database file exists
     if not os.path.exists(DB_FILE):
         Path(DB_FILE).touch()
 
-    with get_db() as conn:
-        # Check if the table already exists
-        cursor = conn.execute(
-            "SELECT name FROM sqlite_master WHERE type='table' AND name='interviews'"
-        )
-        table_exists = cursor.fetchone() is not None
-
-        if not table_exists:
-            # Create interviews table
-            conn.execute(
-                """CREATE TABLE interviews (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER, 
-                    user_name TEXT, 
-                    interview_date DATE, 
-                    interview_time TEXT,
-                    interview_type TEXT, 
-                    description TEXT, 
-                    created_at TIMESTAMP
-                )"""
-            )
-            print(f"✅ Created new interviews table in {DB_FILE}")
-        else:
-            # Check if interview_time column exists
-            cursor = conn.execute("PRAGMA table_info(interviews)")
-            columns = [info[1] for info in cursor.fetchall()]
-
-            # Add interview_time column if it doesn't exist
-            if "interview_time" not in columns:
-                conn.execute("ALTER TABLE interviews ADD COLUMN interview_time TEXT")
-                print("✅ Added interview_time column to existing table")
+    conn = get_db()
+    if migrate(conn):
+        log.info("✅ Database %s is at schema version %d", DB_FILE, get_version(conn))
+
+
+async def init_db_async():
+    """Run init_db() on the DB worker thread without blocking the event loop
+
+    Queries sent in the meantime queue up behind it on the same thread, so
+    they never see a half-migrated schema.
+    """
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(_db_executor, init_db)
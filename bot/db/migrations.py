@@ -0,0 +1,452 @@
+"""
+Versioned schema migrations.
+Each migration runs once, in order, inside its own transaction. The number of
+the last applied migration is stored in `PRAGMA user_version`.
+"""
+
+import logging
+import re
+from datetime import datetime
+import pytz
+from bot.utils.dates import DEFAULT_TIMEZONE, period_keys, to_timestamp
+
+log = logging.getLogger(__name__)
+
+MIGRATIONS = []
+
+
+def migration(version):
+    """Register a function as schema migration number `version`"""
+
+    def register(func):
+        MIGRATIONS.append((version, func))
+        MIGRATIONS.sort(key=lambda item: item[0])
+        return func
+
+    return register
+
+
+def get_version(conn):
+    """Return the schema version the database is currently at"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """Apply every migration newer than the database's current version
+
+    Args:
+        conn: Open sqlite3 connection
+
+    Returns:
+        Number of migrations applied
+    """
+    current = get_version(conn)
+    applied = 0
+
+    for version, func in MIGRATIONS:
+        if version <= current:
+            continue
+
+        # DDL is transactional in SQLite, so a failed migration leaves
+        # the schema (and user_version) exactly as it was. IMMEDIATE takes
+        # the write lock up front, so when several processes start at once
+        # only one applies each migration and the others see it done.
+        conn.execute("BEGIN IMMEDIATE")
+        if get_version(conn) >= version:
+            conn.rollback()
+            continue
+        try:
+            func(conn)
+            conn.execute(f"PRAGMA user_version = {version}")
+        except Exception:
+            conn.rollback()
+            raise
+        conn.commit()
+
+        applied += 1
+        log.info("✅ Applied migration %d: %s", version, func.__doc__)
+
+    return applied
+
+
+@migration(1)
+def create_interviews_table(conn):
+    """Create the interviews table"""
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS interviews (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            user_name TEXT,
+            interview_date DATE,
+            interview_time TEXT,
+            interview_type TEXT,
+            description TEXT,
+            created_at TIMESTAMP
+        )"""
+    )
+
+    # Databases from before interview_time existed need the column added
+    columns = [info[1] for info in conn.execute("PRAGMA table_info(interviews)")]
+    if "interview_time" not in columns:
+        conn.execute("ALTER TABLE interviews ADD COLUMN interview_time TEXT")
+
+
+@migration(2)
+def add_interview_indexes(conn):
+    """Index interviews by user and by date"""
+    # Serves per-user listings and counts, already sorted
+    conn.execute(
+        """CREATE INDEX IF NOT EXISTS idx_interviews_user_date
+        ON interviews (user_id, interview_date, interview_time)"""
+    )
+    # Serves today's reminders, the admin list and the daily cleanup
+    conn.execute(
+        """CREATE INDEX IF NOT EXISTS idx_interviews_date
+        ON interviews (interview_date, interview_time)"""
+    )
+
+
+@migration(3)
+def convert_to_scheduled_at(conn):
+    """Store interview date and time as a single scheduled_at epoch"""
+    conn.execute(
+        """CREATE TABLE interviews_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            user_name TEXT,
+            scheduled_at INTEGER NOT NULL,
+            has_time INTEGER NOT NULL DEFAULT 0,
+            timezone TEXT NOT NULL DEFAULT 'Europe/Paris',
+            interview_type TEXT,
+            description TEXT,
+            created_at TIMESTAMP
+        )"""
+    )
+
+    time_pattern = re.compile(r"^\d{1,2}:\d{2}$")
+
+    def parse_time(value):
+        # Only accept real HH:MM values, "No time specified" and junk are dropped
+        if value and time_pattern.match(value):
+            try:
+                return datetime.strptime(value, "%H:%M").strftime("%H:%M")
+            except ValueError:
+                pass
+        return None
+
+    rows = []
+    for row in conn.execute("SELECT * FROM interviews"):
+        try:
+            day = datetime.strptime(row["interview_date"], "%Y-%m-%d").date()
+        except (TypeError, ValueError):
+            log.warning(
+                "⚠️ Dropping interview %s with bad date %r",
+                row["id"],
+                row["interview_date"],
+            )
+            continue
+
+        time_str = parse_time(row["interview_time"])
+        interview_type = row["interview_type"] or "Interview"
+
+        # Old versions of !schedule could put the time in interview_type
+        leaked_time = parse_time(interview_type)
+        if leaked_time:
+            time_str = time_str or leaked_time
+            interview_type = "Interview"
+
+        rows.append(
+            (
+                row["id"],
+                row["user_id"],
+                row["user_name"],
+                to_timestamp(day, time_str, DEFAULT_TIMEZONE),
+                time_str is not None,
+                DEFAULT_TIMEZONE,
+                interview_type,
+                row["description"],
+                row["created_at"],
+            )
+        )
+
+    conn.executemany(
+        """INSERT INTO interviews_new
+        (id, user_id, user_name, scheduled_at, has_time, timezone, interview_type, description, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        rows,
+    )
+
+    # Keep AUTOINCREMENT from handing out IDs of interviews that were deleted
+    old_seq = conn.execute(
+        "SELECT seq FROM sqlite_sequence WHERE name = 'interviews'"
+    ).fetchone()
+
+    conn.execute("DROP TABLE interviews")
+    conn.execute("ALTER TABLE interviews_new RENAME TO interviews")
+    if old_seq:
+        conn.execute(
+            "UPDATE sqlite_sequence SET seq = max(seq, ?) WHERE name = 'interviews'",
+            (old_seq[0],),
+        )
+
+    conn.execute(
+        "CREATE INDEX idx_interviews_user_scheduled ON interviews (user_id, scheduled_at)"
+    )
+    conn.execute("CREATE INDEX idx_interviews_scheduled ON interviews (scheduled_at)")
+
+
+@migration(4)
+def add_guilds(conn):
+    """Scope interviews by guild and add per-guild settings"""
+    # Existing interviews get guild 0 until the bot works out which guild
+    # they came from (see InterviewManager.adopt_legacy_interviews)
+    conn.execute(
+        "ALTER TABLE interviews ADD COLUMN guild_id INTEGER NOT NULL DEFAULT 0"
+    )
+
+    conn.execute("DROP INDEX IF EXISTS idx_interviews_user_scheduled")
+    conn.execute(
+        """CREATE INDEX idx_interviews_guild_user_scheduled
+        ON interviews (guild_id, user_id, scheduled_at)"""
+    )
+    conn.execute(
+        """CREATE INDEX idx_interviews_guild_scheduled
+        ON interviews (guild_id, scheduled_at)"""
+    )
+
+    conn.execute(
+        """CREATE TABLE guild_config (
+            guild_id INTEGER PRIMARY KEY,
+            channel_id INTEGER,
+            timezone TEXT NOT NULL DEFAULT 'Europe/Paris',
+            reminder_hour INTEGER NOT NULL DEFAULT 8
+        )"""
+    )
+
+
+@migration(5)
+def add_user_stats(conn):
+    """Keep per-user interview counters in a user_stats table"""
+    # `week` and `month` are the periods `weekly` and `monthly` were counted
+    # in, a counter from an older period reads as 0
+    conn.execute(
+        """CREATE TABLE user_stats (
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            user_name TEXT,
+            lifetime INTEGER NOT NULL DEFAULT 0,
+            weekly INTEGER NOT NULL DEFAULT 0,
+            week TEXT NOT NULL DEFAULT '',
+            monthly INTEGER NOT NULL DEFAULT 0,
+            month TEXT NOT NULL DEFAULT '',
+            PRIMARY KEY (guild_id, user_id)
+        )"""
+    )
+
+    # Backfill from what's left of the history, counting periods by the
+    # day each interview was created, in the timezone it was scheduled in
+    stats = {}
+    for row in conn.execute(
+        "SELECT guild_id, user_id, user_name, timezone, created_at FROM interviews ORDER BY id"
+    ):
+        key = (row["guild_id"], row["user_id"])
+        entry = stats.setdefault(key, [row["user_name"], 0, 0, "", 0, ""])
+        entry[0] = row["user_name"]
+        entry[1] += 1
+
+        try:
+            created = datetime.fromisoformat(row["created_at"])
+        except (TypeError, ValueError):
+            continue
+        week, month = period_keys(
+            created.astimezone(pytz.timezone(row["timezone"] or DEFAULT_TIMEZONE))
+        )
+        for count, period, value in ((2, 3, week), (4, 5, month)):
+            if value > entry[period]:
+                entry[count], entry[period] = 1, value
+            elif value == entry[period]:
+                entry[count] += 1
+
+    conn.executemany(
+        """INSERT INTO user_stats
+        (guild_id, user_id, user_name, lifetime, weekly, week, monthly, month)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+        [key + tuple(entry) for key, entry in stats.items()],
+    )
+
+
+@migration(6)
+def add_interviews_archive(conn):
+    """Move past interviews to an interviews_archive table instead of deleting them"""
+    conn.execute(
+        """CREATE TABLE interviews_archive (
+            id INTEGER PRIMARY KEY,
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER,
+            user_name TEXT,
+            scheduled_at INTEGER NOT NULL,
+            has_time INTEGER NOT NULL DEFAULT 0,
+            timezone TEXT NOT NULL DEFAULT 'Europe/Paris',
+            interview_type TEXT,
+            description TEXT,
+            created_at TIMESTAMP,
+            archived_at INTEGER NOT NULL
+        )"""
+    )
+    conn.execute(
+        """CREATE INDEX idx_interviews_archive_guild_user_scheduled
+        ON interviews_archive (guild_id, user_id, scheduled_at)"""
+    )
+
+    # Both tiers as one table, for queries over the whole history
+    conn.execute(
+        """CREATE VIEW interview_history AS
+        SELECT id, guild_id, user_id, user_name, scheduled_at, has_time, timezone,
+            interview_type, description, created_at
+        FROM interviews
+        UNION ALL
+        SELECT id, guild_id, user_id, user_name, scheduled_at, has_time, timezone,
+            interview_type, description, created_at
+        FROM interviews_archive"""
+    )
+
+
+@migration(7)
+def add_interview_search(conn):
+    """Full-text search over interview types, descriptions and user names"""
+    # The rowid of every entry is the interview ID, in either tier. Guild
+    # and user IDs are indexed as tokens so MATCH can filter on them, which
+    # is much faster than filtering the matches afterwards
+    conn.execute(
+        """CREATE VIRTUAL TABLE interview_search USING fts5(
+            interview_type,
+            description,
+            user_name,
+            guild_id,
+            user_id,
+            tokenize = 'unicode61 remove_diacritics 2'
+        )"""
+    )
+    # ...but they shouldn't count towards relevance
+    conn.execute(
+        """INSERT INTO interview_search (interview_search, rank)
+        VALUES ('rank', 'bm25(1.0, 1.0, 1.0, 0.0, 0.0)')"""
+    )
+
+    # Keep it in sync with both tables. Archiving deletes from interviews
+    # before inserting into interviews_archive, so the entry is re-added
+    for table in ("interviews", "interviews_archive"):
+        conn.execute(
+            f"""CREATE TRIGGER {table}_search_insert AFTER INSERT ON {table} BEGIN
+                INSERT INTO interview_search
+                (rowid, interview_type, description, user_name, guild_id, user_id)
+                VALUES (new.id, new.interview_type, new.description, new.user_name, new.guild_id, new.user_id);
+            END"""
+        )
+        conn.execute(
+            f"""CREATE TRIGGER {table}_search_delete AFTER DELETE ON {table} BEGIN
+                DELETE FROM interview_search WHERE rowid = old.id;
+            END"""
+        )
+
+    conn.execute(
+        """CREATE TRIGGER interviews_search_update
+        AFTER UPDATE OF interview_type, description, user_name, guild_id, user_id ON interviews
+        BEGIN
+            DELETE FROM interview_search WHERE rowid = old.id;
+            INSERT INTO interview_search
+            (rowid, interview_type, description, user_name, guild_id, user_id)
+            VALUES (new.id, new.interview_type, new.description, new.user_name, new.guild_id, new.user_id);
+        END"""
+    )
+
+    conn.execute(
+        """INSERT INTO interview_search
+        (rowid, interview_type, description, user_name, guild_id, user_id)
+        SELECT id, interview_type, description, user_name, guild_id, user_id
+        FROM interview_history"""
+    )
+
+
+@migration(8)
+def add_worker_coordination(conn):
+    """Leases and a change log, for several bot processes sharing the database"""
+    # Lets one process at a time take on a role, like running the scheduler
+    conn.execute(
+        """CREATE TABLE leases (
+            name TEXT PRIMARY KEY,
+            holder TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )"""
+    )
+
+    # Every write to interviews and guild_config, whichever process made it,
+    # so the scheduler can follow changes made by the others. AUTOINCREMENT
+    # keeps seq growing even after the log is emptied.
+    conn.execute(
+        """CREATE TABLE change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            guild_id INTEGER NOT NULL
+        )"""
+    )
+    for action in ("INSERT", "UPDATE", "DELETE"):
+        row = "old" if action == "DELETE" else "new"
+        conn.execute(
+            f"""CREATE TRIGGER interviews_log_{action.lower()} AFTER {action} ON interviews
+            BEGIN
+                INSERT INTO change_log (kind, row_id, guild_id)
+                VALUES ('interview', {row}.id, {row}.guild_id);
+            END"""
+        )
+        conn.execute(
+            f"""CREATE TRIGGER guild_config_log_{action.lower()} AFTER {action} ON guild_config
+            BEGIN
+                INSERT INTO change_log (kind, row_id, guild_id)
+                VALUES ('guild', {row}.guild_id, {row}.guild_id);
+            END"""
+        )
+
+
+@migration(9)
+def add_change_readers(conn):
+    """Whose interviews changed, and how far each process has read the log"""
+    # Every worker tails the log to invalidate its cache, deleted rows are
+    # gone by then so their user has to be logged with the change
+    conn.execute("ALTER TABLE change_log ADD COLUMN user_id INTEGER")
+    for action in ("INSERT", "UPDATE", "DELETE"):
+        row = "old" if action == "DELETE" else "new"
+        conn.execute(f"DROP TRIGGER interviews_log_{action.lower()}")
+        conn.execute(
+            f"""CREATE TRIGGER interviews_log_{action.lower()} AFTER {action} ON interviews
+            BEGIN
+                INSERT INTO change_log (kind, row_id, guild_id, user_id)
+                VALUES ('interview', {row}.id, {row}.guild_id, {row}.user_id);
+            END"""
+        )
+
+    # The log is only pruned up to what every reader has applied
+    conn.execute(
+        """CREATE TABLE change_readers (
+            name TEXT PRIMARY KEY,
+            seq INTEGER NOT NULL,
+            seen_at REAL NOT NULL
+        )"""
+    )
+
+
+@migration(10)
+def add_archive_search_update(conn):
+    """Keep archived interviews' search entries in sync when they're updated"""
+    # Adopting legacy interviews moves archived ones into a guild too
+    conn.execute(
+        """CREATE TRIGGER interviews_archive_search_update
+        AFTER UPDATE OF interview_type, description, user_name, guild_id, user_id ON interviews_archive
+        BEGIN
+            DELETE FROM interview_search WHERE rowid = old.id;
+            INSERT INTO interview_search
+            (rowid, interview_type, description, user_name, guild_id, user_id)
+            VALUES (new.id, new.interview_type, new.description, new.user_name, new.guild_id, new.user_id);
+        END"""
+    )
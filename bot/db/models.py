@@ -1,143 +1,457 @@
+import asyncio
+import itertools
+import os
 from datetime import datetime, timedelta
-import pytz
-from .manager import get_db
+from bot.utils.dates import (
+    day_bounds,
+    day_start,
+    from_timestamp,
+    local_now,
+    period_keys,
+    to_timestamp,
+)
+from . import events
+from .cache import cached, day_tag, guild_tag, query_cache, user_tag
+from .guilds import GuildConfigManager
+from .storage import get_storage
+
+# Past interviews stay in the hot table for this many days, then move to
+# interviews_archive
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "1"))
+# Rows moved per transaction, so other queries can run in between
+ARCHIVE_CHUNK_SIZE = int(os.getenv("ARCHIVE_CHUNK_SIZE", "500"))
+# Rows inserted per transaction by bulk imports
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "500"))
+# Rows read per query by exports
+EXPORT_PAGE_SIZE = 1000
+
+
+def _today(guild_id):
+    """Today's date in the guild's timezone"""
+    return local_now(GuildConfigManager.timezone(guild_id)).date()
+
+
+def _invalidate(guild_id, user_id, *timestamps):
+    """Drop cached results touched by a write for this user on these epochs
+
+    Days are the guild's, like the cached reads', not the interview's own
+    timezone, which is whatever the guild's was when it was scheduled.
+    """
+    tz_name = GuildConfigManager.timezone(guild_id)
+    days = {day_tag(guild_id, from_timestamp(ts, tz_name).date()) for ts in timestamps}
+    query_cache.invalidate(user_tag(guild_id, user_id), guild_tag(guild_id), *days)
+
+
+def _import_chunk(interviews, guild_id, guild_tz, created_at, size):
+    """Next `size` interviews of an import as rows, with the cache tags they touch"""
+    rows = []
+    tags = set()
+    for interview in itertools.islice(interviews, size):
+        tz_name = interview.get("timezone") or guild_tz
+        scheduled_at = to_timestamp(
+            interview["interview_date"], interview["interview_time"], tz_name
+        )
+        rows.append(
+            {
+                "guild_id": guild_id,
+                "user_id": interview["user_id"],
+                "user_name": interview["user_name"],
+                "scheduled_at": scheduled_at,
+                "has_time": interview["interview_time"] is not None,
+                "timezone": tz_name,
+                "interview_type": interview["interview_type"],
+                "description": interview["description"],
+                "created_at": created_at,
+            }
+        )
+        tags.add(user_tag(guild_id, interview["user_id"]))
+        tags.add(day_tag(guild_id, from_timestamp(scheduled_at, guild_tz).date()))
+    return rows, tags
 
 
 class InterviewManager:
-    """Handles all operations related to interview data"""
+    """Handles all operations related to interview data
+
+    Every method is a coroutine, so callers must `await` it. The queries
+    themselves are left to the storage backend (see bot.db.storage), this
+    class turns local dates into UTC epochs and keeps the cache and events
+    in step with the writes.
+
+    Interviews are stored with a `scheduled_at` UTC epoch, a `has_time` flag
+    for date-only interviews and the `timezone` they were scheduled in. Every
+    interview belongs to a guild, and every method is scoped to one.
+
+    Interviews older than ARCHIVE_AFTER_DAYS are moved to the
+    `interviews_archive` table. The `interview_history` view spans both, for
+    queries over everything that ever happened.
+
+    Per-user counts live in the `user_stats` table, which the write methods
+    keep up to date in the same transaction. Counting never has to scan the
+    interviews, and counts survive old interviews being cleaned up.
+
+    Reads are served from `query_cache` when possible and every write
+    invalidates the user, day and guild results it affects. Writes also
+    publish an event (see bot.db.events) with the affected row.
+    """
 
     @staticmethod
-    def add_interview(
-        user_id, user_name, interview_date, interview_time, interview_type, description
+    async def add_interview(
+        guild_id,
+        user_id,
+        user_name,
+        interview_date,
+        interview_time,
+        interview_type,
+        description,
     ):
-        """Add a new interview to the database"""
-        with get_db() as conn:
-            conn.execute(
-                """INSERT INTO interviews 
-                (user_id, user_name, interview_date, interview_time, interview_type, description, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?)""",
-                (
-                    user_id,
-                    user_name,
-                    interview_date.isoformat(),  # Store dates as ISO strings
-                    interview_time,
-                    interview_type,
-                    description,
-                    datetime.now().isoformat(),
-                ),
-            )
-            return True
+        """Add a new interview to the database
+
+        `interview_date` is a datetime.date, `interview_time` an "HH:MM"
+        string or None when no time was given. Both are in the guild's
+        timezone.
+        """
+        tz_name = GuildConfigManager.timezone(guild_id)
+        scheduled_at = to_timestamp(interview_date, interview_time, tz_name)
+
+        row = await get_storage().add_interview(
+            {
+                "guild_id": guild_id,
+                "user_id": user_id,
+                "user_name": user_name,
+                "scheduled_at": scheduled_at,
+                "has_time": interview_time is not None,
+                "timezone": tz_name,
+                "interview_type": interview_type,
+                "description": description,
+                "created_at": datetime.now().isoformat(),
+            }
+        )
+
+        _invalidate(guild_id, user_id, scheduled_at)
+        events.publish(events.INTERVIEW_ADDED, row)
+        return True
 
     @staticmethod
-    def get_user_interviews(user_id, include_past=False):
-        """Get all interviews for a specific user"""
-        today = datetime.now(pytz.timezone("Europe/Paris")).date().isoformat()
+    async def add_interview_batch(guild_id, user_id, user_name, interviews):
+        """Add several interviews for one user in a single transaction
 
-        query = "SELECT * FROM interviews WHERE user_id = ?"
-        params = [user_id]
+        Either every interview is added or, if the transaction fails, none
+        of them are. Each one is still published as INTERVIEW_ADDED.
 
-        if not include_past:
-            query += " AND interview_date >= ?"
-            params.append(today)
+        Args:
+            interviews: List of (interview_date, interview_time,
+                interview_type, description) tuples, like add_interview()
+                takes them
 
-        query += " ORDER BY interview_date, interview_time"
+        Returns:
+            List of the new rows, in the order given
+        """
+        tz_name = GuildConfigManager.timezone(guild_id)
+        created_at = datetime.now().isoformat()
 
-        with get_db() as conn:
-            cursor = conn.execute(query, params)
-            return cursor.fetchall()
+        batch = []
+        for interview_date, interview_time, interview_type, description in interviews:
+            batch.append(
+                {
+                    "guild_id": guild_id,
+                    "user_id": user_id,
+                    "user_name": user_name,
+                    "scheduled_at": to_timestamp(
+                        interview_date, interview_time, tz_name
+                    ),
+                    "has_time": interview_time is not None,
+                    "timezone": tz_name,
+                    "interview_type": interview_type,
+                    "description": description,
+                    "created_at": created_at,
+                }
+            )
+        rows = await get_storage().add_interview_batch(batch)
+
+        _invalidate(guild_id, user_id, *(row["scheduled_at"] for row in rows))
+        for row in rows:
+            events.publish(events.INTERVIEW_ADDED, row)
+        return rows
 
     @staticmethod
-    def get_today_interviews():
-        """Get all interviews scheduled for today"""
-        today = datetime.now(pytz.timezone("Europe/Paris")).date().isoformat()
+    async def import_interviews(guild_id, interviews, chunk_size=IMPORT_CHUNK_SIZE):
+        """Add many interviews, `chunk_size` per transaction
+
+        Rows are pulled from `interviews` one chunk at a time on a worker
+        thread, so a lazy iterable (a file being parsed, say) is never read
+        into memory all at once nor parsed on the event loop. It should only
+        read shared state. No per-interview events are published,
+        subscribers get a single INTERVIEWS_RELOADED at the end instead.
+
+        Args:
+            guild_id: Guild the interviews belong to
+            interviews: Iterable of dicts with user_id, user_name,
+                interview_date, interview_time, interview_type and
+                description like add_interview() takes, plus an optional
+                timezone (defaults to the guild's)
+            chunk_size: Interviews per transaction
 
-        with get_db() as conn:
-            cursor = conn.execute(
-                "SELECT * FROM interviews WHERE interview_date = ? ORDER BY interview_time",
-                (today,),
+        Returns:
+            Number of interviews added
+        """
+        guild_tz = GuildConfigManager.timezone(guild_id)
+        created_at = datetime.now().isoformat()
+        interviews = iter(interviews)
+        tags = {guild_tag(guild_id)}
+        total = 0
+
+        while True:
+            # Pulling rows may mean parsing a file, keep it off the event loop
+            chunk, chunk_tags = await asyncio.to_thread(
+                _import_chunk, interviews, guild_id, guild_tz, created_at, chunk_size
             )
-            return cursor.fetchall()
+            if not chunk:
+                break
+            total += await get_storage().add_interviews(chunk)
+            tags |= chunk_tags
+
+        if total:
+            query_cache.invalidate(*tags)
+            events.publish(events.INTERVIEWS_RELOADED)
+        return total
+
+    @staticmethod
+    async def iter_interviews(guild_id, page_size=EXPORT_PAGE_SIZE):
+        """Every interview of a guild, archived ones first, a page at a time
+
+        An async generator of lists of rows. Each tier is read in ID order
+        with a keyset, so memory stays at one page however big the guild.
+        """
+        for archived in (True, False):
+            after = None
+            while True:
+                page = await get_storage().get_interviews_page(
+                    guild_id, archived, after, page_size
+                )
+                if page:
+                    yield page
+                if len(page) < page_size:
+                    break
+                after = page[-1]["id"]
 
     @staticmethod
-    def get_all_future_interviews():
+    @cached("user")
+    async def get_user_interviews(guild_id, user_id, include_past=False):
+        """Get all interviews for a specific user
+
+        With `include_past`, archived interviews are included too.
+        """
+        since = None
+        if not include_past:
+            since = day_start(_today(guild_id), GuildConfigManager.timezone(guild_id))
+        return await get_storage().get_user_interviews(guild_id, user_id, since)
+
+    @staticmethod
+    @cached("day")
+    async def get_today_interviews(guild_id):
+        """Get all interviews scheduled for today"""
+        start, end = day_bounds(_today(guild_id), GuildConfigManager.timezone(guild_id))
+        return await get_storage().get_interviews_between(guild_id, start, end)
+
+    @staticmethod
+    @cached("guild")
+    async def get_all_future_interviews(guild_id):
         """Get all future interviews for all users"""
-        today = datetime.now(pytz.timezone("Europe/Paris")).date().isoformat()
+        start = day_start(_today(guild_id), GuildConfigManager.timezone(guild_id))
+        return await get_storage().get_interviews_between(guild_id, start)
 
-        with get_db() as conn:
-            cursor = conn.execute(
-                "SELECT * FROM interviews WHERE interview_date >= ? ORDER BY interview_date, interview_time",
-                (today,),
-            )
-            return cursor.fetchall()
+    @staticmethod
+    async def get_feed_interviews(guild_id, user_id=None):
+        """Interviews for a calendar feed (see bot.feeds)
+
+        A user's whole history, archived interviews included, or every
+        upcoming interview of the guild when no user is given. Not cached,
+        the feeds keep their own rendered copy per data version.
+        """
+        if user_id is not None:
+            return await get_storage().get_user_interviews(guild_id, user_id)
+        start = day_start(_today(guild_id), GuildConfigManager.timezone(guild_id))
+        return await get_storage().get_interviews_between(guild_id, start)
 
     @staticmethod
-    def get_all_interviews_count():
-        """Get count of interviews by user"""
-        with get_db() as conn:
-            cursor = conn.execute(
-                "SELECT user_name, COUNT(*) as count FROM interviews GROUP BY user_id ORDER BY count DESC"
-            )
-            return cursor.fetchall()
+    async def get_future_interviews_page(guild_id, after=None, limit=20):
+        """Get one page of future interviews for all users
+
+        Uses keyset pagination, so only `limit` rows are ever read.
+
+        Args:
+            guild_id: Guild to list interviews for
+            after: (scheduled_at, id) of the last row on the previous page,
+                or None for the first page
+            limit: Maximum number of rows to return
+        """
+        since = day_start(_today(guild_id), GuildConfigManager.timezone(guild_id))
+        return await get_storage().get_future_interviews_page(
+            guild_id, since, after, limit
+        )
+
+    @staticmethod
+    @cached("guild")
+    async def get_all_interviews_count(guild_id, period="lifetime"):
+        """Get count of interviews added by each user, highest first
+
+        Users who added none in the period are left out.
+
+        Args:
+            guild_id: Guild to rank users in
+            period: "lifetime", "weekly" (added this week) or "monthly"
+                (added this month), in the guild's timezone
+        """
+        week, month = period_keys(local_now(GuildConfigManager.timezone(guild_id)))
+        return await get_storage().get_interview_counts(guild_id, period, week, month)
 
     @staticmethod
-    def get_user_total_count(user_id):
+    @cached("user")
+    async def get_user_total_count(guild_id, user_id):
         """Get total count of interviews for a specific user"""
-        with get_db() as conn:
-            cursor = conn.execute(
-                "SELECT COUNT(*) FROM interviews WHERE user_id = ?", (user_id,)
-            )
-            return cursor.fetchone()[0]
+        return await get_storage().get_user_total_count(guild_id, user_id)
 
     @staticmethod
-    def update_interview(interview_id, user_id, updates):
-        """Update an existing interview"""
-        # Build SQL for updates
-        sql_updates = []
-        params = []
+    async def update_interview(guild_id, interview_id, user_id, updates):
+        """Update an existing interview
 
-        for key, value in updates.items():
-            sql_updates.append(f"{key} = ?")
-            params.append(value)
+        `updates` maps column names to new values. The `interview_date`
+        (datetime.date) and `interview_time` ("HH:MM") keys are merged with
+        the stored schedule and written back as `scheduled_at`.
+        """
+        updates = dict(updates)
+        new_date = updates.pop("interview_date", None)
+        new_time = updates.pop("interview_time", None)
 
-        # Add WHERE clause parameters
-        params.extend([interview_id, user_id])
+        result = await get_storage().update_interview(
+            guild_id, interview_id, user_id, updates, new_date, new_time
+        )
+        if result is None:
+            return False
 
-        with get_db() as conn:
-            cursor = conn.execute(
-                f"UPDATE interviews SET {', '.join(sql_updates)} WHERE id = ? AND user_id = ?",
-                params,
-            )
-            return cursor.rowcount > 0
+        current, updated = result
+        _invalidate(guild_id, user_id, current["scheduled_at"], updated["scheduled_at"])
+        events.publish(events.INTERVIEW_UPDATED, updated)
+        return True
 
     @staticmethod
-    def delete_interview(interview_id, user_id):
+    async def delete_interview(guild_id, interview_id, user_id):
         """Delete an interview by ID (only if it belongs to the user)"""
-        with get_db() as conn:
-            cursor = conn.execute(
-                "DELETE FROM interviews WHERE id = ? AND user_id = ?",
-                (interview_id, user_id),
-            )
-            return cursor.rowcount > 0
+        deleted = await get_storage().delete_interview(guild_id, interview_id, user_id)
+        if deleted is None:
+            return False
+
+        _invalidate(guild_id, user_id, deleted["scheduled_at"])
+        events.publish(events.INTERVIEW_DELETED, deleted)
+        return True
+
+    @staticmethod
+    async def get_user_history_page(guild_id, user_id, after=None, limit=20):
+        """Get one page of a user's interviews, newest first, archive included
+
+        Uses keyset pagination like get_future_interviews_page.
+
+        Args:
+            guild_id: Guild the interviews belong to
+            user_id: User whose history to list
+            after: (scheduled_at, id) of the last row on the previous page,
+                or None for the first page
+            limit: Maximum number of rows to return
+        """
+        return await get_storage().get_user_history_page(
+            guild_id, user_id, after, limit
+        )
 
     @staticmethod
-    def delete_old_interviews():
-        """Delete interviews from before today"""
-        yesterday = datetime.now(pytz.timezone("Europe/Paris")).date() - timedelta(
-            days=1
+    async def search_interviews(guild_id, text, user_id=None, after=None, limit=20):
+        """Full-text search over interview types, descriptions and user names
+
+        Archived interviews are searched too. Results are ranked best first
+        and paginated with a keyset on (rank, id).
+
+        Args:
+            guild_id: Guild to search in
+            text: Words to look for (prefixes match too)
+            user_id: Only return this user's interviews, or None for everyone's
+            after: (rank, id) of the last row on the previous page, or None
+            limit: Maximum number of rows to return
+
+        Returns:
+            Interview rows with an extra `rank` key (lower is better)
+        """
+        return await get_storage().search_interviews(
+            guild_id, text, user_id, after, limit
         )
 
-        with get_db() as conn:
-            cursor = conn.execute(
-                "DELETE FROM interviews WHERE interview_date < ?",
-                (yesterday.isoformat(),),
+    @staticmethod
+    async def archive_interviews_chunk(guild_id, before, limit=ARCHIVE_CHUNK_SIZE):
+        """Move up to `limit` interviews scheduled before `before` to the archive
+
+        Runs as one short transaction.
+
+        Returns:
+            Number of interviews moved
+        """
+        moved = await get_storage().archive_interviews_chunk(guild_id, before, limit)
+
+        # user_stats is left alone, archived interviews still count
+        if moved:
+            query_cache.invalidate(
+                guild_tag(guild_id),
+                *{user_tag(guild_id, row["user_id"]) for row in moved},
             )
-            return cursor.rowcount  # Number of deleted interviews
+        return len(moved)
+
+    @staticmethod
+    async def archive_old_interviews(guild_id):
+        """Move interviews older than ARCHIVE_AFTER_DAYS to the archive
+
+        Works in chunks of ARCHIVE_CHUNK_SIZE, each in its own transaction,
+        so reminders and commands never wait long behind it.
+
+        Returns:
+            Number of interviews moved
+        """
+        tz_name = GuildConfigManager.timezone(guild_id)
+        cutoff = day_start(
+            _today(guild_id) - timedelta(days=ARCHIVE_AFTER_DAYS), tz_name
+        )
+
+        total = 0
+        while True:
+            moved = await InterviewManager.archive_interviews_chunk(guild_id, cutoff)
+            total += moved
+            if moved < ARCHIVE_CHUNK_SIZE:
+                return total
+            await asyncio.sleep(0)  # Let anything queued up run first
 
     @staticmethod
-    def get_interview(interview_id):
+    async def get_interview(guild_id, interview_id):
         """Get a single interview by ID"""
-        with get_db() as conn:
-            cursor = conn.execute(
-                "SELECT * FROM interviews WHERE id = ?", (interview_id,)
-            )
-            return cursor.fetchone()
+        return await get_storage().get_interview(guild_id, interview_id)
+
+    @staticmethod
+    async def adopt_legacy_interviews(guild_id):
+        """Move interviews from before multi-guild support into a guild
+
+        Interviews created before guilds existed are stored with guild_id 0.
+
+        Returns:
+            Number of interviews moved
+        """
+        moved = await get_storage().adopt_legacy_interviews(guild_id)
+        if moved > 0:
+            query_cache.clear()
+            events.publish(events.INTERVIEWS_RELOADED)
+        return moved
+
+    @staticmethod
+    async def get_upcoming_reminders(after):
+        """Get timed interviews starting after `after` in every guild
+
+        Used to rebuild the reminder schedule at startup, in one indexed query.
+
+        Args:
+            after: UTC epoch, only interviews scheduled later are returned
+        """
+        return await get_storage().get_upcoming_reminders(after)
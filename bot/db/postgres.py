@@ -0,0 +1,797 @@
+"""
+PostgreSQL storage backend.
+Used when DATABASE_URL points at a postgres:// server. Queries run on a pool
+of asyncpg connections, straight from the event loop, so workers and shards
+write concurrently instead of queueing behind SQLite's single writer.
+The schema mirrors the SQLite one (at its migration 8) and is versioned the
+same way, in a schema_version table.
+"""
+
+import contextlib
+import functools
+import logging
+import os
+import re
+import time
+from bot.metrics import DB_ERRORS, DB_LATENCY, DB_ROWS, DB_WAIT
+from .storage import (
+    Changes,
+    Record,
+    added_counts,
+    collect_changes,
+    merge_schedule,
+    removed_periods,
+)
+
+log = logging.getLogger(__name__)
+
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+
+# Held while migrating, so workers starting together migrate one at a time
+MIGRATION_LOCK = 0x1E7E5
+
+# The document full-text search matches against. Queries must use the exact
+# expression the GIN indexes were built on for the indexes to be used.
+SEARCH_DOCUMENT = """to_tsvector('simple',
+    coalesce(interview_type, '') || ' ' || coalesce(description, '') || ' ' ||
+    coalesce(user_name, ''))"""
+
+COLUMNS = (
+    "id, guild_id, user_id, user_name, scheduled_at, has_time, timezone, "
+    "interview_type, description, created_at"
+)
+
+# (version, description, statements)
+MIGRATIONS = [
+    (
+        1,
+        "Create the schema",
+        [
+            """CREATE TABLE interviews (
+                id BIGSERIAL PRIMARY KEY,
+                guild_id BIGINT NOT NULL DEFAULT 0,
+                user_id BIGINT,
+                user_name TEXT,
+                scheduled_at BIGINT NOT NULL,
+                has_time BOOLEAN NOT NULL DEFAULT FALSE,
+                timezone TEXT NOT NULL DEFAULT 'Europe/Paris',
+                interview_type TEXT,
+                description TEXT,
+                created_at TEXT
+            )""",
+            """CREATE INDEX idx_interviews_guild_user_scheduled
+            ON interviews (guild_id, user_id, scheduled_at)""",
+            """CREATE INDEX idx_interviews_guild_scheduled
+            ON interviews (guild_id, scheduled_at)""",
+            """CREATE INDEX idx_interviews_reminders
+            ON interviews (scheduled_at) WHERE has_time""",
+            f"CREATE INDEX idx_interviews_search ON interviews USING GIN ({SEARCH_DOCUMENT})",
+            """CREATE TABLE interviews_archive (
+                id BIGINT PRIMARY KEY,
+                guild_id BIGINT NOT NULL,
+                user_id BIGINT,
+                user_name TEXT,
+                scheduled_at BIGINT NOT NULL,
+                has_time BOOLEAN NOT NULL DEFAULT FALSE,
+                timezone TEXT NOT NULL DEFAULT 'Europe/Paris',
+                interview_type TEXT,
+                description TEXT,
+                created_at TEXT,
+                archived_at BIGINT NOT NULL
+            )""",
+            """CREATE INDEX idx_interviews_archive_guild_user_scheduled
+            ON interviews_archive (guild_id, user_id, scheduled_at)""",
+            f"""CREATE INDEX idx_interviews_archive_search
+            ON interviews_archive USING GIN ({SEARCH_DOCUMENT})""",
+            f"""CREATE VIEW interview_history AS
+            SELECT {COLUMNS} FROM interviews
+            UNION ALL
+            SELECT {COLUMNS} FROM interviews_archive""",
+            """CREATE TABLE user_stats (
+                guild_id BIGINT NOT NULL,
+                user_id BIGINT NOT NULL,
+                user_name TEXT,
+                lifetime INTEGER NOT NULL DEFAULT 0,
+                weekly INTEGER NOT NULL DEFAULT 0,
+                week TEXT NOT NULL DEFAULT '',
+                monthly INTEGER NOT NULL DEFAULT 0,
+                month TEXT NOT NULL DEFAULT '',
+                PRIMARY KEY (guild_id, user_id)
+            )""",
+            """CREATE TABLE guild_config (
+                guild_id BIGINT PRIMARY KEY,
+                channel_id BIGINT,
+                timezone TEXT NOT NULL DEFAULT 'Europe/Paris',
+                reminder_hour INTEGER NOT NULL DEFAULT 8
+            )""",
+            """CREATE TABLE leases (
+                name TEXT PRIMARY KEY,
+                holder TEXT NOT NULL,
+                expires_at DOUBLE PRECISION NOT NULL
+            )""",
+            """CREATE TABLE change_log (
+                seq BIGSERIAL PRIMARY KEY,
+                kind TEXT NOT NULL,
+                row_id BIGINT NOT NULL,
+                guild_id BIGINT NOT NULL
+            )""",
+            # Same as the SQLite triggers, one function per table
+            """CREATE FUNCTION log_interview_change() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'DELETE' THEN
+                    INSERT INTO change_log (kind, row_id, guild_id)
+                    VALUES ('interview', OLD.id, OLD.guild_id);
+                ELSE
+                    INSERT INTO change_log (kind, row_id, guild_id)
+                    VALUES ('interview', NEW.id, NEW.guild_id);
+                END IF;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql""",
+            """CREATE TRIGGER interviews_log
+            AFTER INSERT OR UPDATE OR DELETE ON interviews
+            FOR EACH ROW EXECUTE FUNCTION log_interview_change()""",
+            """CREATE FUNCTION log_guild_config_change() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'DELETE' THEN
+                    INSERT INTO change_log (kind, row_id, guild_id)
+                    VALUES ('guild', OLD.guild_id, OLD.guild_id);
+                ELSE
+                    INSERT INTO change_log (kind, row_id, guild_id)
+                    VALUES ('guild', NEW.guild_id, NEW.guild_id);
+                END IF;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql""",
+            """CREATE TRIGGER guild_config_log
+            AFTER INSERT OR UPDATE OR DELETE ON guild_config
+            FOR EACH ROW EXECUTE FUNCTION log_guild_config_change()""",
+        ],
+    ),
+    (
+        2,
+        "Order the change log by writing transaction",
+        [
+            # seq is handed out at insert time, not at commit, so a reader
+            # tailing by seq alone skips changes whose transaction commits
+            # after a later one's. Readers stop at the oldest running
+            # transaction instead (see read_changes)
+            """ALTER TABLE change_log ADD COLUMN xid BIGINT NOT NULL
+            DEFAULT pg_current_xact_id()::text::bigint""",
+            "CREATE INDEX idx_change_log_xid ON change_log (xid, seq)",
+        ],
+    ),
+    (
+        3,
+        "Log whose interviews changed, and how far each process has read",
+        [
+            # Deleted rows are gone by the time the log is read, so their
+            # user has to be logged with the change
+            "ALTER TABLE change_log ADD COLUMN user_id BIGINT",
+            """CREATE OR REPLACE FUNCTION log_interview_change() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'DELETE' THEN
+                    INSERT INTO change_log (kind, row_id, guild_id, user_id)
+                    VALUES ('interview', OLD.id, OLD.guild_id, OLD.user_id);
+                ELSE
+                    INSERT INTO change_log (kind, row_id, guild_id, user_id)
+                    VALUES ('interview', NEW.id, NEW.guild_id, NEW.user_id);
+                END IF;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql""",
+            # The log is only pruned up to what every reader has applied
+            """CREATE TABLE change_readers (
+                name TEXT PRIMARY KEY,
+                xid BIGINT NOT NULL,
+                seq BIGINT NOT NULL,
+                seen_at DOUBLE PRECISION NOT NULL
+            )""",
+        ],
+    ),
+]
+
+# Transactions below it have all committed or rolled back, their changes
+# are final. Changes at or above it may still be joined by earlier ones.
+CHANGE_HORIZON = "pg_snapshot_xmin(pg_current_snapshot())::text::bigint"
+
+
+def _records(rows):
+    return [Record(row) for row in rows]
+
+
+def _record(row):
+    return None if row is None else Record(row)
+
+
+def _rowcount(status):
+    """Rows affected, from a command status like "UPDATE 3" """
+    return int(status.rsplit(" ", 1)[-1])
+
+
+def _match_query(text):
+    """Turn free text into a tsquery matching every word as a prefix
+
+    Returns None if there's nothing to search for. Only word characters are
+    kept, so tsquery operators typed by users are never interpreted.
+    """
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    return " & ".join(f"'{word}':*" for word in words)
+
+
+def timed(func):
+    """Record a query's latency, errors and row count in bot.metrics"""
+    name = func.__name__
+
+    @functools.wraps(func)
+    async def wrapper(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = await func(self, *args, **kwargs)
+        except Exception:
+            DB_ERRORS.inc(query=name)
+            raise
+        finally:
+            DB_LATENCY.observe(time.perf_counter() - start, query=name)
+
+        if isinstance(result, list):
+            DB_ROWS.inc(len(result), query=name)
+        return result
+
+    return wrapper
+
+
+def _interview_values(interview):
+    """Column values of a new interview, in INSERT order"""
+    return (
+        interview["guild_id"],
+        interview["user_id"],
+        interview["user_name"],
+        interview["scheduled_at"],
+        interview["has_time"],
+        interview["timezone"],
+        interview["interview_type"],
+        interview["description"],
+        interview["created_at"],
+    )
+
+
+async def _count_added(conn, interviews):
+    """Bump their owners' counters in user_stats for new interviews"""
+    await conn.executemany(
+        """INSERT INTO user_stats AS s
+        (guild_id, user_id, user_name, lifetime, weekly, week, monthly, month)
+        VALUES ($1, $2, $3, $4, $4, $5, $4, $6)
+        ON CONFLICT (guild_id, user_id) DO UPDATE SET
+            user_name = excluded.user_name,
+            lifetime = s.lifetime + excluded.lifetime,
+            weekly = CASE WHEN s.week = excluded.week THEN s.weekly + excluded.weekly
+                ELSE excluded.weekly END,
+            week = excluded.week,
+            monthly = CASE WHEN s.month = excluded.month THEN s.monthly + excluded.monthly
+                ELSE excluded.monthly END,
+            month = excluded.month""",
+        added_counts(interviews),
+    )
+
+
+async def _count_removed(conn, interview):
+    """Take a cancelled interview back out of its owner's counters"""
+    week, month = removed_periods(interview)
+    await conn.execute(
+        """UPDATE user_stats SET
+            lifetime = greatest(lifetime - 1, 0),
+            weekly = CASE WHEN week = $1 THEN greatest(weekly - 1, 0) ELSE weekly END,
+            monthly = CASE WHEN month = $2 THEN greatest(monthly - 1, 0) ELSE monthly END
+        WHERE guild_id = $3 AND user_id = $4""",
+        week,
+        month,
+        interview["guild_id"],
+        interview["user_id"],
+    )
+
+
+class PostgresStorage:
+    """Storage on a PostgreSQL server, through an asyncpg connection pool
+
+    Args:
+        dsn: postgres:// URL of the database
+        min_size: Connections kept open when idle
+        max_size: Most connections open at once
+    """
+
+    def __init__(self, dsn, min_size=DB_POOL_MIN_SIZE, max_size=DB_POOL_MAX_SIZE):
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.pool = None
+
+    async def open(self):
+        import asyncpg
+
+        if self.pool is None:
+            self.pool = await asyncpg.create_pool(
+                self.dsn, min_size=self.min_size, max_size=self.max_size
+            )
+        await self.migrate()
+
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    @contextlib.asynccontextmanager
+    async def connection(self):
+        """A pooled connection, timing how long we waited for it"""
+        queued_at = time.perf_counter()
+        async with self.pool.acquire() as conn:
+            DB_WAIT.observe(time.perf_counter() - queued_at)
+            yield conn
+
+    @contextlib.asynccontextmanager
+    async def transaction(self):
+        """A pooled connection inside a transaction"""
+        async with self.connection() as conn:
+            async with conn.transaction():
+                yield conn
+
+    async def migrate(self):
+        """Apply every migration newer than the database's schema_version
+
+        Returns:
+            Number of migrations applied
+        """
+        applied = 0
+        async with self.transaction() as conn:
+            await conn.execute("SELECT pg_advisory_xact_lock($1)", MIGRATION_LOCK)
+            await conn.execute(
+                "CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)"
+            )
+            current = await conn.fetchval("SELECT max(version) FROM schema_version")
+
+            for version, description, statements in MIGRATIONS:
+                if current is not None and version <= current:
+                    continue
+                for statement in statements:
+                    await conn.execute(statement)
+                await conn.execute(
+                    "INSERT INTO schema_version (version) VALUES ($1)", version
+                )
+                applied += 1
+                log.info("✅ Applied migration %d: %s", version, description)
+
+        if applied:
+            log.info("✅ Database is at schema version %d", MIGRATIONS[-1][0])
+        return applied
+
+    @timed
+    async def add_interview(self, interview):
+        async with self.transaction() as conn:
+            row = await conn.fetchrow(
+                """INSERT INTO interviews
+                (guild_id, user_id, user_name, scheduled_at, has_time, timezone, interview_type, description, created_at)
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
+                RETURNING *""",
+                *_interview_values(interview),
+            )
+            await _count_added(conn, [interview])
+        return Record(row)
+
+    @timed
+    async def add_interviews(self, interviews):
+        async with self.transaction() as conn:
+            await conn.executemany(
+                """INSERT INTO interviews
+                (guild_id, user_id, user_name, scheduled_at, has_time, timezone, interview_type, description, created_at)
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)""",
+                [_interview_values(interview) for interview in interviews],
+            )
+            await _count_added(conn, interviews)
+        return len(interviews)
+
+    @timed
+    async def add_interview_batch(self, interviews):
+        columns = list(zip(*(_interview_values(i) for i in interviews)))
+        async with self.transaction() as conn:
+            # One statement for the whole batch. IDs are handed out in
+            # ORDER BY n order, RETURNING doesn't promise any order though
+            rows = await conn.fetch(
+                """INSERT INTO interviews
+                (guild_id, user_id, user_name, scheduled_at, has_time, timezone, interview_type, description, created_at)
+                SELECT guild_id, user_id, user_name, scheduled_at, has_time,
+                    timezone, interview_type, description, created_at
+                FROM unnest(
+                    $1::bigint[], $2::bigint[], $3::text[], $4::bigint[],
+                    $5::boolean[], $6::text[], $7::text[], $8::text[], $9::text[]
+                ) WITH ORDINALITY AS batch(
+                    guild_id, user_id, user_name, scheduled_at, has_time,
+                    timezone, interview_type, description, created_at, n
+                ) ORDER BY n
+                RETURNING *""",
+                *columns,
+            )
+            await _count_added(conn, interviews)
+        return sorted((Record(row) for row in rows), key=lambda row: row["id"])
+
+    @timed
+    async def get_interview(self, guild_id, interview_id):
+        async with self.connection() as conn:
+            return _record(
+                await conn.fetchrow(
+                    "SELECT * FROM interviews WHERE id = $1 AND guild_id = $2",
+                    interview_id,
+                    guild_id,
+                )
+            )
+
+    @timed
+    async def update_interview(
+        self, guild_id, interview_id, user_id, updates, new_date=None, new_time=None
+    ):
+        updates = dict(updates)
+
+        async with self.transaction() as conn:
+            # Lock the row, so the merged schedule is based on what we update
+            current = await conn.fetchrow(
+                """SELECT * FROM interviews
+                WHERE id = $1 AND guild_id = $2 AND user_id = $3 FOR UPDATE""",
+                interview_id,
+                guild_id,
+                user_id,
+            )
+            if current is None:
+                return None
+
+            if new_date is not None or new_time is not None:
+                updates.update(merge_schedule(current, new_date, new_time))
+            if not updates:
+                return None
+
+            columns = list(updates)
+            assignments = ", ".join(
+                f"{column} = ${n}" for n, column in enumerate(columns, start=4)
+            )
+            updated = await conn.fetchrow(
+                f"""UPDATE interviews SET {assignments}
+                WHERE id = $1 AND guild_id = $2 AND user_id = $3 RETURNING *""",
+                interview_id,
+                guild_id,
+                user_id,
+                *(updates[column] for column in columns),
+            )
+
+        if updated is None:
+            return None
+        return Record(current), Record(updated)
+
+    @timed
+    async def delete_interview(self, guild_id, interview_id, user_id):
+        async with self.transaction() as conn:
+            deleted = await conn.fetchrow(
+                """DELETE FROM interviews
+                WHERE id = $1 AND guild_id = $2 AND user_id = $3 RETURNING *""",
+                interview_id,
+                guild_id,
+                user_id,
+            )
+            if deleted is not None:
+                await _count_removed(conn, deleted)
+
+        return _record(deleted)
+
+    @timed
+    async def get_user_interviews(self, guild_id, user_id, since=None):
+        if since is None:
+            query = (
+                "SELECT * FROM interview_history WHERE guild_id = $1 AND user_id = $2"
+            )
+            params = [guild_id, user_id]
+        else:
+            query = "SELECT * FROM interviews WHERE guild_id = $1 AND user_id = $2 AND scheduled_at >= $3"
+            params = [guild_id, user_id, since]
+
+        query += " ORDER BY scheduled_at"
+
+        async with self.connection() as conn:
+            return _records(await conn.fetch(query, *params))
+
+    @timed
+    async def get_interviews_between(self, guild_id, start, end=None):
+        query = "SELECT * FROM interviews WHERE guild_id = $1 AND scheduled_at >= $2"
+        params = [guild_id, start]
+        if end is not None:
+            query += " AND scheduled_at < $3"
+            params.append(end)
+
+        query += " ORDER BY scheduled_at"
+
+        async with self.connection() as conn:
+            return _records(await conn.fetch(query, *params))
+
+    @timed
+    async def get_future_interviews_page(self, guild_id, since, after=None, limit=20):
+        query = "SELECT * FROM interviews WHERE guild_id = $1 AND scheduled_at >= $2"
+        params = [guild_id, since]
+
+        if after is not None:
+            query += " AND (scheduled_at, id) > ($3, $4)"
+            params.extend(after)
+
+        query += f" ORDER BY scheduled_at, id LIMIT ${len(params) + 1}"
+        params.append(limit)
+
+        async with self.connection() as conn:
+            return _records(await conn.fetch(query, *params))
+
+    @timed
+    async def get_interviews_page(self, guild_id, archived, after=None, limit=500):
+        table = "interviews_archive" if archived else "interviews"
+        query = f"SELECT * FROM {table} WHERE guild_id = $1"
+        params = [guild_id]
+
+        if after is not None:
+            query += " AND id > $2"
+            params.append(after)
+
+        query += f" ORDER BY id LIMIT ${len(params) + 1}"
+        params.append(limit)
+
+        async with self.connection() as conn:
+            return _records(await conn.fetch(query, *params))
+
+    @timed
+    async def get_user_history_page(self, guild_id, user_id, after=None, limit=20):
+        query = "SELECT * FROM interview_history WHERE guild_id = $1 AND user_id = $2"
+        params = [guild_id, user_id]
+
+        if after is not None:
+            query += " AND (scheduled_at, id) < ($3, $4)"
+            params.extend(after)
+
+        query += f" ORDER BY scheduled_at DESC, id DESC LIMIT ${len(params) + 1}"
+        params.append(limit)
+
+        async with self.connection() as conn:
+            return _records(await conn.fetch(query, *params))
+
+    @timed
+    async def search_interviews(
+        self, guild_id, text, user_id=None, after=None, limit=20
+    ):
+        match = _match_query(text)
+        if match is None:
+            return []
+
+        # ts_rank is higher for better matches, negated to sort like bm25
+        query = f"""SELECT * FROM (
+            SELECT interview_history.*, -ts_rank({SEARCH_DOCUMENT}, query) AS rank
+            FROM interview_history, to_tsquery('simple', $2) AS query
+            WHERE guild_id = $1 AND {SEARCH_DOCUMENT} @@ query"""
+        params = [guild_id, match]
+        if user_id is not None:
+            params.append(user_id)
+            query += f" AND user_id = ${len(params)}"
+        query += ") AS hits"
+
+        if after is not None:
+            params.extend(after)
+            query += f" WHERE (rank, id) > (${len(params) - 1}, ${len(params)})"
+        params.append(limit)
+        query += f" ORDER BY rank, id LIMIT ${len(params)}"
+
+        async with self.connection() as conn:
+            rows = await conn.fetch(query, *params)
+
+        return _records(rows)
+
+    @timed
+    async def get_interview_counts(self, guild_id, period, week, month):
+        # Only pass the parameters the query uses, Postgres can't type the rest
+        count, params = {
+            "lifetime": ("lifetime", []),
+            "weekly": ("CASE WHEN week = $2 THEN weekly ELSE 0 END", [week]),
+            "monthly": ("CASE WHEN month = $2 THEN monthly ELSE 0 END", [month]),
+        }[period]
+
+        async with self.connection() as conn:
+            rows = await conn.fetch(
+                f"""SELECT user_name, {count} AS count, lifetime FROM user_stats
+                WHERE guild_id = $1 AND {count} > 0
+                ORDER BY count DESC, lifetime DESC""",
+                guild_id,
+                *params,
+            )
+        return _records(rows)
+
+    @timed
+    async def get_user_total_count(self, guild_id, user_id):
+        async with self.connection() as conn:
+            count = await conn.fetchval(
+                "SELECT lifetime FROM user_stats WHERE guild_id = $1 AND user_id = $2",
+                guild_id,
+                user_id,
+            )
+        return count or 0
+
+    @timed
+    async def archive_interviews_chunk(self, guild_id, before, limit):
+        # One statement moves the rows, so they're never in both tables
+        async with self.connection() as conn:
+            rows = await conn.fetch(
+                f"""WITH moved AS (
+                    DELETE FROM interviews WHERE id IN (
+                        SELECT id FROM interviews
+                        WHERE guild_id = $1 AND scheduled_at < $2
+                        ORDER BY scheduled_at LIMIT $3
+                    ) RETURNING *
+                )
+                INSERT INTO interviews_archive ({COLUMNS}, archived_at)
+                SELECT {COLUMNS}, $4 FROM moved
+                RETURNING {COLUMNS}""",
+                guild_id,
+                before,
+                limit,
+                int(time.time()),
+            )
+        return _records(rows)
+
+    @timed
+    async def adopt_legacy_interviews(self, guild_id):
+        async with self.transaction() as conn:
+            moved = 0
+            for table in ("interviews", "interviews_archive"):
+                status = await conn.execute(
+                    f"UPDATE {table} SET guild_id = $1 WHERE guild_id = 0", guild_id
+                )
+                moved += _rowcount(status)
+
+            # Merge their counters into the guild's, keeping the newest period
+            await conn.execute(
+                """INSERT INTO user_stats AS s
+                SELECT $1::bigint, user_id, user_name, lifetime, weekly, week, monthly, month
+                FROM user_stats WHERE guild_id = 0
+                ON CONFLICT (guild_id, user_id) DO UPDATE SET
+                    lifetime = s.lifetime + excluded.lifetime,
+                    weekly = CASE
+                        WHEN s.week = excluded.week THEN s.weekly + excluded.weekly
+                        WHEN s.week < excluded.week THEN excluded.weekly
+                        ELSE s.weekly END,
+                    week = greatest(s.week, excluded.week),
+                    monthly = CASE
+                        WHEN s.month = excluded.month THEN s.monthly + excluded.monthly
+                        WHEN s.month < excluded.month THEN excluded.monthly
+                        ELSE s.monthly END,
+                    month = greatest(s.month, excluded.month)""",
+                guild_id,
+            )
+            await conn.execute("DELETE FROM user_stats WHERE guild_id = 0")
+
+        return moved
+
+    @timed
+    async def get_upcoming_reminders(self, after):
+        async with self.connection() as conn:
+            rows = await conn.fetch(
+                "SELECT * FROM interviews WHERE scheduled_at > $1 AND has_time ORDER BY scheduled_at",
+                after,
+            )
+        return _records(rows)
+
+    @timed
+    async def load_guild_configs(self):
+        async with self.connection() as conn:
+            return _records(await conn.fetch("SELECT * FROM guild_config"))
+
+    @timed
+    async def save_guild_config(self, config):
+        async with self.connection() as conn:
+            await conn.execute(
+                """INSERT INTO guild_config (guild_id, channel_id, timezone, reminder_hour)
+                VALUES ($1, $2, $3, $4)
+                ON CONFLICT (guild_id) DO UPDATE SET
+                    channel_id = excluded.channel_id,
+                    timezone = excluded.timezone,
+                    reminder_hour = excluded.reminder_hour""",
+                config["guild_id"],
+                config["channel_id"],
+                config["timezone"],
+                config["reminder_hour"],
+            )
+
+    @timed
+    async def acquire_lease(self, name, holder, ttl):
+        # Workers may run on different hosts, so expiry goes by the server's clock
+        async with self.transaction() as conn:
+            await conn.execute(
+                """INSERT INTO leases (name, holder, expires_at)
+                VALUES ($1, $2, extract(epoch FROM clock_timestamp())::float8 + $3)
+                ON CONFLICT (name) DO UPDATE
+                SET holder = excluded.holder, expires_at = excluded.expires_at
+                WHERE leases.holder = excluded.holder
+                    OR leases.expires_at < extract(epoch FROM clock_timestamp())""",
+                name,
+                holder,
+                float(ttl),
+            )
+            row = await conn.fetchrow(
+                "SELECT holder, expires_at FROM leases WHERE name = $1", name
+            )
+
+        return row["holder"] == holder, row["holder"], row["expires_at"]
+
+    @timed
+    async def release_lease(self, name, holder):
+        async with self.connection() as conn:
+            await conn.execute(
+                "DELETE FROM leases WHERE name = $1 AND holder = $2", name, holder
+            )
+
+    @timed
+    async def latest_change(self):
+        # Changes are keyed by (transaction, seq), see read_changes()
+        async with self.connection() as conn:
+            return (await conn.fetchval(f"SELECT {CHANGE_HORIZON}"), 0)
+
+    @timed
+    async def read_changes(self, after, limit):
+        # Only transactions below the horizon, so whatever commits later
+        # always sorts after the returned cursor and is never skipped
+        async with self.connection() as conn:
+            changes = await conn.fetch(
+                f"""SELECT * FROM change_log
+                WHERE (xid, seq) > ($1, $2) AND xid < {CHANGE_HORIZON}
+                ORDER BY xid, seq LIMIT $3""",
+                *after,
+                limit,
+            )
+            if not changes:
+                return Changes(after, {}, {}, set())
+
+            interview_ids = {c["row_id"] for c in changes if c["kind"] == "interview"}
+            rows = []
+            if interview_ids:
+                rows = await conn.fetch(
+                    "SELECT * FROM interviews WHERE id = ANY($1::bigint[])",
+                    list(interview_ids),
+                )
+
+        cursor = (changes[-1]["xid"], changes[-1]["seq"])
+        return collect_changes(cursor, changes, rows)
+
+    @timed
+    async def ack_changes(self, reader, cursor):
+        async with self.transaction() as conn:
+            status = await conn.execute(
+                """UPDATE change_readers
+                SET xid = $2, seq = $3, seen_at = extract(epoch FROM clock_timestamp())
+                WHERE name = $1""",
+                reader,
+                *cursor,
+            )
+            known = _rowcount(status) > 0
+            if not known:
+                await conn.execute(
+                    """INSERT INTO change_readers (name, xid, seq, seen_at)
+                    VALUES ($1, $2, $3, extract(epoch FROM clock_timestamp()))""",
+                    reader,
+                    *cursor,
+                )
+        return known
+
+    @timed
+    async def prune_changes(self, stale_after):
+        async with self.transaction() as conn:
+            await conn.execute(
+                """DELETE FROM change_readers
+                WHERE seen_at < extract(epoch FROM clock_timestamp()) - $1""",
+                float(stale_after),
+            )
+            # No readers left, nothing is known to be applied
+            await conn.execute(
+                """DELETE FROM change_log WHERE (xid, seq) <= (
+                    SELECT xid, seq FROM change_readers ORDER BY xid, seq LIMIT 1
+                )"""
+            )
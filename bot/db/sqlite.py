@@ -0,0 +1,529 @@
+"""
+SQLite storage backend, the default.
+Every query runs on the DB worker thread (see bot/db/manager.py) against one
+WAL-mode database file. The whole bot shares a single writer, which is
+plenty for one process and a handful of workers.
+"""
+
+import re
+import time
+from .manager import close_db, get_db, init_db_async, run_in_db_thread
+from .storage import (
+    Changes,
+    Record,
+    added_counts,
+    collect_changes,
+    merge_schedule,
+    removed_periods,
+)
+
+
+def _records(rows):
+    return [Record(row) for row in rows]
+
+
+def _record(row):
+    return None if row is None else Record(row)
+
+
+def _match_query(text):
+    """Turn free text into an FTS5 query matching every word as a prefix
+
+    Returns None if there's nothing to search for. Words are quoted, so
+    FTS5 operators typed by users are searched for literally.
+    """
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def _count_added(conn, interviews):
+    """Bump their owners' counters in user_stats for new interviews"""
+    conn.executemany(
+        """INSERT INTO user_stats
+        (guild_id, user_id, user_name, lifetime, weekly, week, monthly, month)
+        VALUES (?1, ?2, ?3, ?4, ?4, ?5, ?4, ?6)
+        ON CONFLICT (guild_id, user_id) DO UPDATE SET
+            user_name = excluded.user_name,
+            lifetime = lifetime + excluded.lifetime,
+            weekly = CASE WHEN week = excluded.week THEN weekly + excluded.weekly
+                ELSE excluded.weekly END,
+            week = excluded.week,
+            monthly = CASE WHEN month = excluded.month THEN monthly + excluded.monthly
+                ELSE excluded.monthly END,
+            month = excluded.month""",
+        added_counts(interviews),
+    )
+
+
+def _count_removed(conn, interview):
+    """Take a cancelled interview back out of its owner's counters"""
+    week, month = removed_periods(interview)
+    conn.execute(
+        """UPDATE user_stats SET
+            lifetime = max(lifetime - 1, 0),
+            weekly = CASE WHEN week = ? THEN max(weekly - 1, 0) ELSE weekly END,
+            monthly = CASE WHEN month = ? THEN max(monthly - 1, 0) ELSE monthly END
+        WHERE guild_id = ? AND user_id = ?""",
+        (week, month, interview["guild_id"], interview["user_id"]),
+    )
+
+
+class SQLiteStorage:
+    """Storage on the local SQLite file (DB_FILE)
+
+    Every method is a coroutine running on the DB worker thread, the
+    blocking version stays available as `SQLiteStorage.<method>.sync`.
+    """
+
+    @staticmethod
+    async def open():
+        await init_db_async()
+
+    @staticmethod
+    async def close():
+        close_db()
+
+    @staticmethod
+    @run_in_db_thread
+    def add_interview(interview):
+        with get_db() as conn:
+            row = conn.execute(
+                """INSERT INTO interviews
+                (guild_id, user_id, user_name, scheduled_at, has_time, timezone, interview_type, description, created_at)
+                VALUES (:guild_id, :user_id, :user_name, :scheduled_at, :has_time, :timezone, :interview_type, :description, :created_at)
+                RETURNING *""",
+                interview,
+            ).fetchall()[0]
+            _count_added(conn, [interview])
+        return Record(row)
+
+    @staticmethod
+    @run_in_db_thread
+    def add_interviews(interviews):
+        with get_db() as conn:
+            conn.executemany(
+                """INSERT INTO interviews
+                (guild_id, user_id, user_name, scheduled_at, has_time, timezone, interview_type, description, created_at)
+                VALUES (:guild_id, :user_id, :user_name, :scheduled_at, :has_time, :timezone, :interview_type, :description, :created_at)""",
+                interviews,
+            )
+            _count_added(conn, interviews)
+        return len(interviews)
+
+    @staticmethod
+    @run_in_db_thread
+    def add_interview_batch(interviews):
+        # executemany() can't return rows, but every insert still shares
+        # one transaction and one commit
+        with get_db() as conn:
+            rows = [
+                conn.execute(
+                    """INSERT INTO interviews
+                    (guild_id, user_id, user_name, scheduled_at, has_time, timezone, interview_type, description, created_at)
+                    VALUES (:guild_id, :user_id, :user_name, :scheduled_at, :has_time, :timezone, :interview_type, :description, :created_at)
+                    RETURNING *""",
+                    interview,
+                ).fetchall()[0]
+                for interview in interviews
+            ]
+            _count_added(conn, interviews)
+        return [Record(row) for row in rows]
+
+    @staticmethod
+    @run_in_db_thread
+    def get_interview(guild_id, interview_id):
+        with get_db() as conn:
+            cursor = conn.execute(
+                "SELECT * FROM interviews WHERE id = ? AND guild_id = ?",
+                (interview_id, guild_id),
+            )
+            return _record(cursor.fetchone())
+
+    @staticmethod
+    @run_in_db_thread
+    def update_interview(
+        guild_id, interview_id, user_id, updates, new_date=None, new_time=None
+    ):
+        updates = dict(updates)
+
+        with get_db() as conn:
+            current = conn.execute(
+                "SELECT * FROM interviews WHERE id = ? AND guild_id = ? AND user_id = ?",
+                (interview_id, guild_id, user_id),
+            ).fetchone()
+            if current is None:
+                return None
+
+            if new_date is not None or new_time is not None:
+                updates.update(merge_schedule(current, new_date, new_time))
+            if not updates:
+                return None
+
+            # Build SQL for updates
+            sql_updates = []
+            params = []
+
+            for key, value in updates.items():
+                sql_updates.append(f"{key} = ?")
+                params.append(value)
+
+            # Add WHERE clause parameters
+            params.extend([interview_id, guild_id, user_id])
+
+            updated = conn.execute(
+                f"UPDATE interviews SET {', '.join(sql_updates)} WHERE id = ? AND guild_id = ? AND user_id = ? RETURNING *",
+                params,
+            ).fetchall()
+
+        if not updated:
+            return None
+        return Record(current), Record(updated[0])
+
+    @staticmethod
+    @run_in_db_thread
+    def delete_interview(guild_id, interview_id, user_id):
+        with get_db() as conn:
+            deleted = conn.execute(
+                "DELETE FROM interviews WHERE id = ? AND guild_id = ? AND user_id = ? RETURNING *",
+                (interview_id, guild_id, user_id),
+            ).fetchall()
+            if deleted:
+                _count_removed(conn, deleted[0])
+
+        return Record(deleted[0]) if deleted else None
+
+    @staticmethod
+    @run_in_db_thread
+    def get_user_interviews(guild_id, user_id, since=None):
+        if since is None:
+            query = "SELECT * FROM interview_history WHERE guild_id = ? AND user_id = ?"
+            params = [guild_id, user_id]
+        else:
+            query = "SELECT * FROM interviews WHERE guild_id = ? AND user_id = ? AND scheduled_at >= ?"
+            params = [guild_id, user_id, since]
+
+        query += " ORDER BY scheduled_at"
+
+        with get_db() as conn:
+            return _records(conn.execute(query, params))
+
+    @staticmethod
+    @run_in_db_thread
+    def get_interviews_between(guild_id, start, end=None):
+        query = "SELECT * FROM interviews WHERE guild_id = ? AND scheduled_at >= ?"
+        params = [guild_id, start]
+        if end is not None:
+            query += " AND scheduled_at < ?"
+            params.append(end)
+
+        query += " ORDER BY scheduled_at"
+
+        with get_db() as conn:
+            return _records(conn.execute(query, params))
+
+    @staticmethod
+    @run_in_db_thread
+    def get_future_interviews_page(guild_id, since, after=None, limit=20):
+        query = "SELECT * FROM interviews WHERE guild_id = ? AND scheduled_at >= ?"
+        params = [guild_id, since]
+
+        if after is not None:
+            query += " AND (scheduled_at, id) > (?, ?)"
+            params.extend(after)
+
+        query += " ORDER BY scheduled_at, id LIMIT ?"
+        params.append(limit)
+
+        with get_db() as conn:
+            return _records(conn.execute(query, params))
+
+    @staticmethod
+    @run_in_db_thread
+    def get_interviews_page(guild_id, archived, after=None, limit=500):
+        table = "interviews_archive" if archived else "interviews"
+        query = f"SELECT * FROM {table} WHERE guild_id = ?"
+        params = [guild_id]
+
+        if after is not None:
+            query += " AND id > ?"
+            params.append(after)
+
+        query += " ORDER BY id LIMIT ?"
+        params.append(limit)
+
+        with get_db() as conn:
+            return _records(conn.execute(query, params))
+
+    @staticmethod
+    @run_in_db_thread
+    def get_user_history_page(guild_id, user_id, after=None, limit=20):
+        query = "SELECT * FROM interview_history WHERE guild_id = ? AND user_id = ?"
+        params = [guild_id, user_id]
+
+        if after is not None:
+            query += " AND (scheduled_at, id) < (?, ?)"
+            params.extend(after)
+
+        query += " ORDER BY scheduled_at DESC, id DESC LIMIT ?"
+        params.append(limit)
+
+        with get_db() as conn:
+            return _records(conn.execute(query, params))
+
+    @staticmethod
+    @run_in_db_thread
+    def search_interviews(guild_id, text, user_id=None, after=None, limit=20):
+        match = _match_query(text)
+        if match is None:
+            return []
+
+        # Scope by guild (and user) inside the MATCH itself
+        match = f'guild_id:"{int(guild_id)}" AND ({match})'
+        if user_id is not None:
+            match = f'user_id:"{int(user_id)}" AND {match}'
+
+        query = (
+            "SELECT rowid, rank FROM interview_search WHERE interview_search MATCH ?"
+        )
+        params = [match]
+        if after is not None:
+            query += " AND (rank, rowid) > (?, ?)"
+            params.extend(after)
+        query += " ORDER BY rank, rowid LIMIT ?"
+        params.append(limit)
+
+        with get_db() as conn:
+            ranks = dict(conn.execute(query, params).fetchall())
+            if not ranks:
+                return []
+
+            # Only the rows on this page get looked up, in whichever tier
+            # they live in
+            rows = conn.execute(
+                f"""SELECT * FROM interview_history
+                WHERE id IN ({', '.join('?' * len(ranks))})""",
+                list(ranks),
+            ).fetchall()
+
+        results = [Record(row, rank=ranks[row["id"]]) for row in rows]
+        results.sort(key=lambda row: (row["rank"], row["id"]))
+        return results
+
+    @staticmethod
+    @run_in_db_thread
+    def get_interview_counts(guild_id, period, week, month):
+        count = {
+            "lifetime": "lifetime",
+            "weekly": "CASE WHEN week = :week THEN weekly ELSE 0 END",
+            "monthly": "CASE WHEN month = :month THEN monthly ELSE 0 END",
+        }[period]
+
+        with get_db() as conn:
+            cursor = conn.execute(
+                f"""SELECT user_name, {count} AS count, lifetime FROM user_stats
+                WHERE guild_id = :guild_id AND {count} > 0
+                ORDER BY count DESC, lifetime DESC""",
+                {"guild_id": guild_id, "week": week, "month": month},
+            )
+            return _records(cursor)
+
+    @staticmethod
+    @run_in_db_thread
+    def get_user_total_count(guild_id, user_id):
+        with get_db() as conn:
+            row = conn.execute(
+                "SELECT lifetime FROM user_stats WHERE guild_id = ? AND user_id = ?",
+                (guild_id, user_id),
+            ).fetchone()
+            return row[0] if row else 0
+
+    @staticmethod
+    @run_in_db_thread
+    def archive_interviews_chunk(guild_id, before, limit):
+        with get_db() as conn:
+            moved = conn.execute(
+                """DELETE FROM interviews WHERE id IN (
+                    SELECT id FROM interviews WHERE guild_id = ? AND scheduled_at < ?
+                    ORDER BY scheduled_at LIMIT ?
+                ) RETURNING *""",
+                (guild_id, before, limit),
+            ).fetchall()
+
+            archived_at = int(time.time())
+            conn.executemany(
+                """INSERT INTO interviews_archive
+                (id, guild_id, user_id, user_name, scheduled_at, has_time, timezone, interview_type, description, created_at, archived_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                [
+                    (
+                        row["id"],
+                        row["guild_id"],
+                        row["user_id"],
+                        row["user_name"],
+                        row["scheduled_at"],
+                        row["has_time"],
+                        row["timezone"],
+                        row["interview_type"],
+                        row["description"],
+                        row["created_at"],
+                        archived_at,
+                    )
+                    for row in moved
+                ],
+            )
+
+        return _records(moved)
+
+    @staticmethod
+    @run_in_db_thread
+    def adopt_legacy_interviews(guild_id):
+        with get_db() as conn:
+            moved = 0
+            for table in ("interviews", "interviews_archive"):
+                cursor = conn.execute(
+                    f"UPDATE {table} SET guild_id = ? WHERE guild_id = 0", (guild_id,)
+                )
+                moved += cursor.rowcount
+
+            # Merge their counters into the guild's, keeping the newest period
+            conn.execute(
+                """INSERT INTO user_stats
+                SELECT ?, user_id, user_name, lifetime, weekly, week, monthly, month
+                FROM user_stats WHERE guild_id = 0
+                ON CONFLICT (guild_id, user_id) DO UPDATE SET
+                    lifetime = lifetime + excluded.lifetime,
+                    weekly = CASE
+                        WHEN week = excluded.week THEN weekly + excluded.weekly
+                        WHEN week < excluded.week THEN excluded.weekly
+                        ELSE weekly END,
+                    week = max(week, excluded.week),
+                    monthly = CASE
+                        WHEN month = excluded.month THEN monthly + excluded.monthly
+                        WHEN month < excluded.month THEN excluded.monthly
+                        ELSE monthly END,
+                    month = max(month, excluded.month)""",
+                (guild_id,),
+            )
+            conn.execute("DELETE FROM user_stats WHERE guild_id = 0")
+
+        return moved
+
+    @staticmethod
+    @run_in_db_thread
+    def get_upcoming_reminders(after):
+        with get_db() as conn:
+            cursor = conn.execute(
+                "SELECT * FROM interviews WHERE scheduled_at > ? AND has_time = 1 ORDER BY scheduled_at",
+                (after,),
+            )
+            return _records(cursor)
+
+    @staticmethod
+    @run_in_db_thread
+    def load_guild_configs():
+        with get_db() as conn:
+            return _records(conn.execute("SELECT * FROM guild_config"))
+
+    @staticmethod
+    @run_in_db_thread
+    def save_guild_config(config):
+        with get_db() as conn:
+            conn.execute(
+                """INSERT OR REPLACE INTO guild_config
+                (guild_id, channel_id, timezone, reminder_hour)
+                VALUES (?, ?, ?, ?)""",
+                (
+                    config["guild_id"],
+                    config["channel_id"],
+                    config["timezone"],
+                    config["reminder_hour"],
+                ),
+            )
+
+    @staticmethod
+    @run_in_db_thread
+    def acquire_lease(name, holder, ttl):
+        # All bot processes share one host and one database file, so their
+        # clocks agree
+        now = time.time()
+        with get_db() as conn:
+            conn.execute(
+                """INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT (name) DO UPDATE
+                SET holder = excluded.holder, expires_at = excluded.expires_at
+                WHERE leases.holder = excluded.holder OR leases.expires_at < ?""",
+                (name, holder, now + ttl, now),
+            )
+            row = conn.execute(
+                "SELECT holder, expires_at FROM leases WHERE name = ?", (name,)
+            ).fetchone()
+
+        return row["holder"] == holder, row["holder"], row["expires_at"]
+
+    @staticmethod
+    @run_in_db_thread
+    def release_lease(name, holder):
+        with get_db() as conn:
+            conn.execute(
+                "DELETE FROM leases WHERE name = ? AND holder = ?", (name, holder)
+            )
+
+    @staticmethod
+    @run_in_db_thread
+    def latest_change():
+        with get_db() as conn:
+            return conn.execute(
+                "SELECT coalesce(max(seq), 0) FROM change_log"
+            ).fetchone()[0]
+
+    @staticmethod
+    @run_in_db_thread
+    def read_changes(after, limit):
+        with get_db() as conn:
+            changes = conn.execute(
+                "SELECT * FROM change_log WHERE seq > ? ORDER BY seq LIMIT ?",
+                (after, limit),
+            ).fetchall()
+            if not changes:
+                return Changes(after, {}, {}, set())
+
+            interview_ids = {c["row_id"] for c in changes if c["kind"] == "interview"}
+            rows = []
+            if interview_ids:
+                placeholders = ",".join("?" * len(interview_ids))
+                rows = conn.execute(
+                    f"SELECT * FROM interviews WHERE id IN ({placeholders})",
+                    tuple(interview_ids),
+                ).fetchall()
+
+        return collect_changes(changes[-1]["seq"], changes, rows)
+
+    @staticmethod
+    @run_in_db_thread
+    def ack_changes(reader, cursor):
+        with get_db() as conn:
+            known = conn.execute(
+                "UPDATE change_readers SET seq = ?, seen_at = ? WHERE name = ?",
+                (cursor, time.time(), reader),
+            ).rowcount
+            if not known:
+                conn.execute(
+                    "INSERT INTO change_readers (name, seq, seen_at) VALUES (?, ?, ?)",
+                    (reader, cursor, time.time()),
+                )
+        return bool(known)
+
+    @staticmethod
+    @run_in_db_thread
+    def prune_changes(stale_after):
+        with get_db() as conn:
+            conn.execute(
+                "DELETE FROM change_readers WHERE seen_at < ?",
+                (time.time() - stale_after,),
+            )
+            # No readers left, nothing is known to be applied
+            conn.execute(
+                "DELETE FROM change_log WHERE seq <= (SELECT min(seq) FROM change_readers)"
+            )
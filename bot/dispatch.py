@@ -0,0 +1,287 @@
+"""
+Outbound message dispatcher.
+Reminders and announcements are queued here instead of calling
+`channel.send` inline. A few workers drain the queue with per-channel rate
+limiting, retries with backoff, and coalescing of queued lines for the same
+channel into a single message.
+
+The buckets only pace our own sends. Discord's 429s are discord.py's
+business: its HTTP client already waits out and retries them, so a 429
+that still reaches us is a failure like any other.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+import aiohttp
+import discord
+from bot.utils.formatters import MESSAGE_LIMIT
+
+log = logging.getLogger(__name__)
+
+# How many channels may be sent to at the same time
+DISPATCH_CONCURRENCY = int(os.getenv("DISPATCH_CONCURRENCY", "4"))
+
+# Messages per channel we allow ourselves every DISPATCH_CHANNEL_PER
+# seconds, Discord allows roughly 5 per 5 seconds
+CHANNEL_RATE = int(os.getenv("DISPATCH_CHANNEL_RATE", "5"))
+CHANNEL_PER = float(os.getenv("DISPATCH_CHANNEL_PER", "5"))
+
+MAX_RETRIES = 3
+BASE_BACKOFF = 1.0  # Seconds, doubled after every failed attempt
+
+# Failures worth another try: Discord's 5xx, and the connection dropping
+TRANSIENT_ERRORS = (
+    discord.DiscordServerError,
+    aiohttp.ClientError,
+    OSError,
+    asyncio.TimeoutError,
+)
+
+
+def split_message(content, limit=MESSAGE_LIMIT):
+    """Split text into chunks under `limit`, breaking between lines when possible"""
+    if len(content) <= limit:
+        return [content]
+
+    chunks = []
+    current = ""
+    for line in content.split("\n"):
+        # A single line that's too long gets hard-split
+        while len(line) > limit:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(line[:limit])
+            line = line[limit:]
+
+        if current and len(current) + 1 + len(line) > limit:
+            chunks.append(current)
+            current = line
+        else:
+            current = f"{current}\n{line}" if current else line
+
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class TokenBucket:
+    """Classic token bucket"""
+
+    def __init__(self, rate=CHANNEL_RATE, per=CHANNEL_PER):
+        self.rate = rate
+        self.per = per
+        self.tokens = float(rate)
+        self.updated = time.monotonic()
+
+    def delay(self):
+        """Seconds to wait before a token is available (0 if one is)"""
+        now = time.monotonic()
+        self.tokens = min(
+            self.rate, self.tokens + (now - self.updated) * self.rate / self.per
+        )
+        self.updated = now
+
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) * self.per / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+class _Item:
+    __slots__ = ("content", "embed", "queued_at", "future")
+
+    def __init__(self, content, embed, future):
+        self.content = content
+        self.embed = embed
+        self.queued_at = time.monotonic()
+        self.future = future
+
+
+class MessageDispatcher:
+    """Queue of outgoing messages drained by a bounded pool of workers
+
+    Every channel has its own FIFO of pending items. A channel ID is in the
+    work queue at most once, so a worker that picks it up can merge all the
+    text lines waiting for that channel into as few messages as possible.
+    """
+
+    def __init__(self, bot, concurrency=DISPATCH_CONCURRENCY):
+        self.bot = bot
+        self.concurrency = concurrency
+        self._queue = asyncio.Queue()
+        self._pending = {}  # channel_id -> deque of _Item
+        self._buckets = {}  # channel_id -> TokenBucket
+        self._workers = []
+
+        # Metrics
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.coalesced = 0
+        self._latencies = deque(maxlen=1000)
+
+    def start(self):
+        """Start the workers on the current event loop"""
+        if not self._workers:
+            self._workers = [
+                asyncio.create_task(self._worker()) for _ in range(self.concurrency)
+            ]
+
+    async def stop(self, timeout=10):
+        """Try to flush what's queued, then stop the workers"""
+        if self._pending:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                log.warning("⚠️ Dropping %d unsent messages", self.queue_depth())
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
+
+    def send(self, channel_id, content=None, embed=None):
+        """Queue a message for a channel
+
+        Text is split to fit Discord's limit and may be merged with other
+        text queued for the same channel. Embeds are always sent on their own.
+
+        Returns:
+            Future that resolves once everything is delivered (awaiting it is
+            optional)
+        """
+        loop = asyncio.get_running_loop()
+        items = []
+
+        if content:
+            for chunk in split_message(content):
+                items.append(_Item(chunk, None, loop.create_future()))
+        if embed is not None:
+            items.append(_Item(None, embed, loop.create_future()))
+
+        pending = self._pending.get(channel_id)
+        if pending is None:
+            pending = self._pending[channel_id] = deque()
+            self._queue.put_nowait(channel_id)
+        pending.extend(items)
+
+        return asyncio.gather(*(item.future for item in items))
+
+    def queue_depth(self):
+        """Number of messages waiting to be sent"""
+        return sum(len(items) for items in self._pending.values())
+
+    def stats(self):
+        """Queue depth, counters and delivery latency in milliseconds"""
+        latencies = sorted(self._latencies)
+
+        def percentile(p):
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+        return {
+            "queue_depth": self.queue_depth(),
+            "channels_waiting": len(self._pending),
+            "sent": self.sent,
+            "failed": self.failed,
+            "retries": self.retries,
+            "coalesced": self.coalesced,
+            "latency_p50_ms": percentile(0.50),
+            "latency_p95_ms": percentile(0.95),
+        }
+
+    def _take_batch(self, pending):
+        """Pop the items that go into the next message for a channel"""
+        first = pending.popleft()
+        batch = [first]
+        if first.embed is not None:
+            return batch
+
+        length = len(first.content)
+        while pending and pending[0].embed is None:
+            extra = len(pending[0].content) + 1
+            if length + extra > MESSAGE_LIMIT:
+                break
+            batch.append(pending.popleft())
+            length += extra
+
+        self.coalesced += len(batch) - 1
+        return batch
+
+    async def _worker(self):
+        while True:
+            channel_id = await self._queue.get()
+            try:
+                await self._drain(channel_id)
+            except Exception as e:
+                log.exception("⚠️ Dispatcher error for channel %s: %s", channel_id, e)
+            finally:
+                self._queue.task_done()
+
+    async def _drain(self, channel_id):
+        """Send everything queued for one channel"""
+        batch = []
+        try:
+            bucket = self._buckets.setdefault(channel_id, TokenBucket())
+            channel = self.bot.get_channel(
+                channel_id
+            ) or self.bot.get_partial_messageable(channel_id)
+
+            while True:
+                pending = self._pending.get(channel_id)
+                if not pending:
+                    self._pending.pop(channel_id, None)
+                    return
+
+                # Wait for the rate limit before picking the batch, so
+                # anything queued in the meantime can still be merged in
+                delay = bucket.delay()
+                while delay > 0:
+                    await asyncio.sleep(delay)
+                    delay = bucket.delay()
+
+                batch = self._take_batch(pending)
+                await self._deliver(channel_id, channel, bucket, batch)
+        except Exception as e:
+            log.exception("⚠️ Dispatcher error for channel %s: %s", channel_id, e)
+            # Fail what's left, so nobody waits on it forever and the next
+            # send() queues the channel again
+            for item in [*batch, *self._pending.pop(channel_id, ())]:
+                if not item.future.done():
+                    self.failed += 1
+                    item.future.set_exception(e)
+
+    async def _deliver(self, channel_id, channel, bucket, batch):
+        """Send one message, retrying transient failures with backoff"""
+        first = batch[0]
+        content = "\n".join(item.content for item in batch) if first.content else None
+
+        for attempt in range(MAX_RETRIES + 1):
+            bucket.take()
+            try:
+                await channel.send(content=content, embed=first.embed)
+                break
+            except Exception as e:
+                # Missing channel or permissions won't fix themselves
+                if not isinstance(e, TRANSIENT_ERRORS) or attempt == MAX_RETRIES:
+                    self.failed += len(batch)
+                    log.warning("⚠️ Could not send to channel %s: %s", channel_id, e)
+                    for item in batch:
+                        if not item.future.done():
+                            item.future.set_exception(e)
+                    return
+
+                self.retries += 1
+                await asyncio.sleep(max(BASE_BACKOFF * 2**attempt, bucket.delay()))
+
+        now = time.monotonic()
+        self.sent += len(batch)
+        for item in batch:
+            self._latencies.append(now - item.queued_at)
+            if not item.future.done():
+                item.future.set_result(None)
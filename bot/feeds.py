@@ -0,0 +1,248 @@
+"""
+Calendar feeds.
+Each user's interviews, and each guild's upcoming ones, as iCalendar feeds
+that calendar apps subscribe to. Links carry an HMAC of the guild and user
+they show, so knowing someone's IDs isn't enough to guess theirs.
+
+Calendar apps poll every few minutes, so feeds are rendered once per data
+version and kept in memory. The version is the guild's tag in the query
+cache, which every write moves (the change tailer covers writes by other
+workers), so answering a poll never needs the database: an unchanged feed
+costs a 304, a changed one a single query however many subscribe.
+"""
+
+import asyncio
+import base64
+import gzip
+import hashlib
+import hmac
+import logging
+import os
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from bot.db.cache import guild_tag, query_cache
+from bot.db.models import InterviewManager
+from bot.metrics import FEED_REQUESTS
+from bot.utils.transfer import ical_event, ical_footer, ical_header
+
+log = logging.getLogger(__name__)
+
+# Disabled unless both a port and a secret are set. The secret signs every
+# link, changing it revokes them all.
+FEED_HOST = os.getenv("FEED_HOST", "127.0.0.1")
+FEED_PORT = int(os.getenv("FEED_PORT", "0"))
+FEED_SECRET = os.getenv("FEED_SECRET", "")
+# Where subscribers reach the server, e.g. behind a reverse proxy
+FEED_BASE_URL = os.getenv("FEED_BASE_URL", "").rstrip("/")
+# Feeds kept rendered, least recently polled go first
+FEED_CACHE_SIZE = int(os.getenv("FEED_CACHE_SIZE", "1000"))
+# Seconds a rendered feed is trusted before checking its rows again, which
+# catches upcoming feeds rolling over to a new day
+FEED_TTL = float(os.getenv("FEED_TTL", "300"))
+# Seconds calendar apps may reuse a feed without asking
+FEED_MAX_AGE = int(os.getenv("FEED_MAX_AGE", "300"))
+
+# 128 bits of HMAC-SHA256 per link
+SIGNATURE_BYTES = 16
+
+Feed = namedtuple(
+    "Feed", "version expires_at fingerprint body gzipped etag last_modified"
+)
+
+
+def feeds_enabled():
+    return bool(FEED_PORT and FEED_SECRET)
+
+
+def _signature(guild_id, user_id):
+    digest = hmac.new(
+        FEED_SECRET.encode(), f"{guild_id}:{user_id}".encode(), hashlib.sha256
+    ).digest()
+    return base64.urlsafe_b64encode(digest[:SIGNATURE_BYTES]).rstrip(b"=").decode()
+
+
+def feed_token(guild_id, user_id=None):
+    """Token of a user's feed, or of the guild's upcoming interviews"""
+    user_id = user_id or 0
+    return f"{guild_id}-{user_id}-{_signature(guild_id, user_id)}"
+
+
+def read_token(token):
+    """(guild ID, user ID or None) a token is for, None if it isn't genuine"""
+    try:
+        guild_id, user_id, signature = token.split("-", 2)
+        guild_id, user_id = int(guild_id), int(user_id)
+    except ValueError:
+        return None
+    if not hmac.compare_digest(
+        signature.encode(), _signature(guild_id, user_id).encode()
+    ):
+        return None
+    return guild_id, user_id or None
+
+
+def feed_url(guild_id, user_id=None):
+    """Link to subscribe to, see feed_token()"""
+    base = FEED_BASE_URL or f"http://{FEED_HOST}:{FEED_PORT}"
+    return f"{base}/feeds/{feed_token(guild_id, user_id)}.ics"
+
+
+class FeedCache:
+    """Rendered feeds, each valid until its guild's data version moves
+
+    Concurrent requests for a feed that needs rendering share one query.
+    """
+
+    def __init__(self, name_of=None, maxsize=FEED_CACHE_SIZE, ttl=FEED_TTL):
+        """
+        Args:
+            name_of: Callable giving a guild's name, or None if unknown, for
+                the guild feed's calendar name
+        """
+        self.name_of = name_of
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.renders = 0
+        self._feeds = OrderedDict()  # (guild_id, user_id) -> Feed
+        self._rendering = {}  # (guild_id, user_id) -> Task rendering it
+
+    def __len__(self):
+        return len(self._feeds)
+
+    def current(self, key):
+        """The feed if it's still up to date, without touching the database"""
+        feed = self._feeds.get(key)
+        if (
+            feed is None
+            or feed.version != query_cache.tag_version(guild_tag(key[0]))
+            or feed.expires_at < time.monotonic()
+        ):
+            return None
+        self._feeds.move_to_end(key)
+        return feed
+
+    async def get(self, key):
+        """The feed of (guild ID, user ID or None), rendering it if it changed
+
+        Returns:
+            (Feed, whether it had to be read from the database)
+        """
+        feed = self.current(key)
+        if feed is not None:
+            return feed, False
+
+        task = self._rendering.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._render(key))
+            self._rendering[key] = task
+            task.add_done_callback(lambda _: self._rendering.pop(key, None))
+        return await asyncio.shield(task), True
+
+    async def _render(self, key):
+        guild_id, user_id = key
+        # Taken first, a write during the query leaves the feed outdated
+        version = query_cache.tag_version(guild_tag(guild_id))
+        rows = await InterviewManager.get_feed_interviews(guild_id, user_id)
+        fingerprint = hashlib.sha256(repr(rows).encode()).hexdigest()[:32]
+        expires_at = time.monotonic() + self.ttl
+
+        previous = self._feeds.get(key)
+        if previous is not None and previous.fingerprint == fingerprint:
+            # Somebody else's interview changed, this feed didn't
+            feed = previous._replace(version=version, expires_at=expires_at)
+        else:
+            stamp = datetime.now(timezone.utc).replace(microsecond=0)
+            body = "".join(
+                [
+                    ical_header(self._calendar_name(guild_id, user_id, rows)),
+                    *(ical_event(row, stamp) for row in rows),
+                    ical_footer(),
+                ]
+            ).encode()
+            feed = Feed(
+                version,
+                expires_at,
+                fingerprint,
+                body,
+                gzip.compress(body, mtime=0),
+                f'W/"{fingerprint}"',
+                stamp,
+            )
+            self.renders += 1
+
+        self._feeds[key] = feed
+        self._feeds.move_to_end(key)
+        while len(self._feeds) > self.maxsize:
+            self._feeds.popitem(last=False)
+        return feed
+
+    def _calendar_name(self, guild_id, user_id, rows):
+        if user_id is not None:
+            return f"Interviews ({rows[-1]['user_name']})" if rows else "Interviews"
+        name = self.name_of(guild_id) if self.name_of else None
+        return f"{name} interviews" if name else "Server interviews"
+
+
+def _not_modified(request, feed):
+    """Whether the client's copy is still good (RFC 9110 section 13.2.2)"""
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None:
+        # Weak comparison, the gzipped and plain bodies share an ETag
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or feed.etag.removeprefix("W/") in tags
+    since = request.if_modified_since
+    return since is not None and feed.last_modified <= since
+
+
+def feed_app(cache):
+    """The aiohttp application serving GET /feeds/<token>.ics from `cache`"""
+    from aiohttp import web
+
+    async def handle_feed(request):
+        key = read_token(request.match_info["token"])
+        if key is None:
+            FEED_REQUESTS.inc(result="not_found")
+            raise web.HTTPNotFound()
+
+        feed, fetched = await cache.get(key)
+        headers = {
+            "ETag": feed.etag,
+            "Last-Modified": format_datetime(feed.last_modified, usegmt=True),
+            "Cache-Control": f"private, max-age={FEED_MAX_AGE}",
+            "Vary": "Accept-Encoding",
+        }
+        if _not_modified(request, feed):
+            FEED_REQUESTS.inc(result="not_modified")
+            return web.Response(status=304, headers=headers)
+
+        FEED_REQUESTS.inc(result="miss" if fetched else "hit")
+        body = feed.body
+        if "gzip" in request.headers.get("Accept-Encoding", ""):
+            headers["Content-Encoding"] = "gzip"
+            body = feed.gzipped
+        return web.Response(
+            body=body, headers=headers, content_type="text/calendar", charset="utf-8"
+        )
+
+    app = web.Application()
+    app.router.add_get("/feeds/{token}.ics", handle_feed)
+    return app
+
+
+async def start_feed_server(name_of=None, host=FEED_HOST, port=FEED_PORT):
+    """Serve the feeds, returns the runner to clean up (None if disabled)"""
+    if not port:
+        return None
+    if not FEED_SECRET:
+        log.warning("⚠️ FEED_PORT is set without FEED_SECRET, feeds are disabled")
+        return None
+
+    from aiohttp import web
+
+    runner = web.AppRunner(feed_app(FeedCache(name_of)), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    log.info("📅 Calendar feeds available on http://%s:%s/feeds/", host, port)
+    return runner
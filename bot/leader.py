@@ -0,0 +1,105 @@
+"""
+Leader election between bot processes.
+When the bot runs as several sharded workers, every one of them would
+otherwise post the same digests and reminders. The workers compete for a
+lease in the shared database instead, and only the holder loads the
+extensions that must run once (TasksCog and FeedsCog). If the leader dies
+its lease expires and another worker loads them.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+
+log = logging.getLogger(__name__)
+
+# Extensions only the leader loads
+LEADER_EXTENSIONS = ("bot.cogs.tasks", "bot.cogs.feeds")
+
+LEASE_NAME = "tasks"
+# A dead leader is replaced after at most this many seconds
+LEADER_LEASE_TTL = float(os.getenv("LEADER_LEASE_TTL", "30"))
+
+
+class LeaderElection:
+    """Competes for the leader lease, loading LEADER_EXTENSIONS while held"""
+
+    def __init__(self, bot, ttl=LEADER_LEASE_TTL):
+        self.bot = bot
+        self.ttl = ttl
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self._expires_at = 0.0
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Step down and free the lease for the next leader right away"""
+        from bot.db.leases import LeaseManager
+
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self.is_leader:
+            await self._step_down()
+            await LeaseManager.release(LEASE_NAME, self.holder)
+
+    async def _run(self):
+        from bot.db.leases import LeaseManager
+
+        await self.bot.db_ready.wait()
+        last_holder = None
+        while True:
+            try:
+                won, holder, expires_at = await LeaseManager.acquire(
+                    LEASE_NAME, self.holder, self.ttl
+                )
+            except Exception:
+                log.exception("⚠️ Could not renew the leader lease")
+                won = False
+                holder = expires_at = None
+                # Keep leading only as long as the lease we already have
+                if self.is_leader and time.time() < self._expires_at:
+                    won = True
+
+            if won:
+                self._expires_at = expires_at or self._expires_at
+                if not self.is_leader:
+                    try:
+                        await self._step_up()
+                    except Exception:
+                        log.exception("⚠️ Could not start leading, stepping down")
+                        await self._step_down()
+                        await LeaseManager.release(LEASE_NAME, self.holder)
+            else:
+                if self.is_leader:
+                    await self._step_down()
+                if holder and holder != last_holder:
+                    log.info("👑 %s is the leader, standing by", holder)
+            last_holder = holder
+
+            # Renew well before expiry, and retry a free lease just as often
+            await asyncio.sleep(self.ttl / 3)
+
+    async def _step_up(self):
+        self.is_leader = True
+        log.info("👑 Elected leader (%s), starting scheduled tasks", self.holder)
+        for extension in LEADER_EXTENSIONS:
+            await self.bot.load_extension(extension)
+        # Slash commands are registered with Discord once, not by every worker
+        await self.bot.sync_app_commands()
+
+    async def _step_down(self):
+        self.is_leader = False
+        log.info("👑 No longer the leader, stopping scheduled tasks")
+        for extension in LEADER_EXTENSIONS:
+            if extension in self.bot.extensions:
+                await self.bot.unload_extension(extension)
+        # The next time we lead, the schedule is rebuilt from the database
+        self.bot.scheduler.cancel_where(lambda key: True)
@@ -0,0 +1,160 @@
+"""
+Logging setup.
+Log calls only put records on a queue, a background thread formats them and
+does the actual I/O, so a slow terminal or disk never stalls the event loop.
+The console gets readable lines, log files get one JSON object per line
+with guild, user, command and duration fields when they're known.
+"""
+
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Files go to the data volume when running in Docker, set LOG_DIR= to disable
+LOG_DIR = os.getenv("LOG_DIR", "/app/data/logs" if os.path.isdir("/app/data") else "")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+# Worker processes each rotate their own file, rotation isn't multi-process safe
+WORKER_ID = os.getenv("WORKER_ID")
+LOG_FILE_NAME = f"bot-worker{WORKER_ID}.jsonl" if WORKER_ID else "bot.jsonl"
+# Share of DEBUG records kept, commands alone log one per invocation
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.1"))
+
+# Fields copied from a record into its JSON line when set, through `extra=`
+# or the command context below
+CONTEXT_FIELDS = ("guild", "user", "command", "duration_ms")
+
+# Guild, user and command of the command being run in the current task
+command_context = contextvars.ContextVar("command_context", default={})
+
+_listener = None
+
+
+class ContextFilter(logging.Filter):
+    """Attach the current command's context to records that don't set it"""
+
+    def filter(self, record):
+        for field, value in command_context.get().items():
+            if not hasattr(record, field):
+                setattr(record, field, value)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a share of low-level records
+
+    DEBUG records are kept with probability `rate`. Any record can override
+    it with `extra={"sample": 0.01}`. Kept records note the rate they were
+    sampled at so counts can be scaled back up.
+    """
+
+    def __init__(self, rate=LOG_DEBUG_SAMPLE_RATE):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        rate = getattr(record, "sample", None)
+        if rate is None:
+            rate = self.rate if record.levelno <= logging.DEBUG else 1.0
+        if rate >= 1.0:
+            return True
+        record.sample = rate
+        return random.random() < rate
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if WORKER_ID is not None:
+            entry["worker"] = int(WORKER_ID)
+        for field in CONTEXT_FIELDS + ("sample",):
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Queue records as they are, the listener's handlers format them"""
+
+    def prepare(self, record):
+        # The default prepare() formats the message on the caller's thread
+        # and drops exc_info. Only resolve the arguments now, since they may
+        # change before the listener gets to them.
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+def setup_logging(level=LOG_LEVEL, log_dir=LOG_DIR):
+    """Send all logging through a queue to the console and rotating JSON files
+
+    Safe to call more than once, later calls are ignored.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(
+        logging.Formatter("%(asctime)s %(levelname)-7s %(message)s", "%H:%M:%S")
+    )
+    handlers = [console]
+
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(
+            os.path.join(log_dir, LOG_FILE_NAME),
+            maxBytes=LOG_MAX_BYTES,
+            backupCount=LOG_BACKUP_COUNT,
+            encoding="utf-8",
+        )
+        file_handler.setFormatter(JsonFormatter())
+        handlers.append(file_handler)
+
+    # Filters run on the caller's side so dropped records are never queued
+    log_queue = queue.SimpleQueue()
+    queue_handler = _QueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter())
+    queue_handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.handlers[:] = [queue_handler]
+    # discord.py is chatty at DEBUG, keep it at INFO even when we debug
+    logging.getLogger("discord").setLevel(max(logging.INFO, root.level))
+
+    _listener = logging.handlers.QueueListener(
+        log_queue, *handlers, respect_handler_level=True
+    )
+    _listener.start()
+
+
+def stop_logging():
+    """Write out whatever is still queued and stop the background thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
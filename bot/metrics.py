@@ -0,0 +1,330 @@
+"""
+Runtime metrics.
+Counters and latency histograms for commands and database queries, served in
+the Prometheus text format on a local HTTP endpoint and summarized by !stats.
+"""
+
+import asyncio
+import bisect
+import logging
+import os
+import threading
+import time
+from bot.log import command_context
+
+log = logging.getLogger(__name__)
+
+# The endpoint only listens locally by default, set METRICS_PORT=0 to disable
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))
+
+# Upper bounds in seconds, from a fast cache hit to a very slow Discord call
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _escape(value):
+    """Escape a label value for the text format"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    """Monotonic counter, one value per combination of label values"""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels[name] for name in self.labels), 0)
+
+    def items(self):
+        """(label values, value) pairs seen so far"""
+        with self._lock:
+            return sorted(self._values.items())
+
+    def render(self):
+        for key, value in self.items():
+            yield f"{self.name}{_format_labels(self.labels, key)} {value}"
+
+
+class Histogram:
+    """Bucketed distribution of observed values, like a Prometheus histogram"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def label_values(self):
+        """Every combination of label values seen so far"""
+        with self._lock:
+            return sorted(self._series)
+
+    def count(self, *key):
+        series = self._series.get(key)
+        return sum(series[:-1]) if series else 0
+
+    def quantile(self, q, *key):
+        """Estimate a quantile by interpolating inside its bucket
+
+        Same estimate as Prometheus' histogram_quantile(), so it's only as
+        precise as the buckets. Values past the last bucket report its bound.
+        """
+        with self._lock:
+            series = self._series.get(key)
+            counts = list(series[:-1]) if series else []
+        total = sum(counts)
+        if not total:
+            return None
+
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            if seen + count >= rank and count:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def render(self):
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                cumulative += count
+                labels = _format_labels(self.labels + ("le",), key + (bound,))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labels, key)
+            yield f"{self.name}_sum{labels} {series[-1]}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Gauge:
+    """Value read from a callback every time the metrics are scraped"""
+
+    kind = "gauge"
+
+    def __init__(self, name, help_text, callback):
+        self.name = name
+        self.help = help_text
+        self.callback = callback
+
+    def render(self):
+        try:
+            yield f"{self.name} {self.callback()}"
+        except Exception:
+            pass  # Whatever it reads from isn't set up yet
+
+
+class Registry:
+    """Every metric the bot exposes"""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+COMMAND_LATENCY = registry.register(
+    Histogram(
+        "bot_command_duration_seconds",
+        "Time spent running each command",
+        labels=("command",),
+    )
+)
+COMMAND_ERRORS = registry.register(
+    Counter(
+        "bot_command_errors_total",
+        "Commands that failed, by error type",
+        labels=("command", "error"),
+    )
+)
+DB_LATENCY = registry.register(
+    Histogram(
+        "bot_db_query_duration_seconds",
+        "Time each InterviewManager query spent on the DB worker thread",
+        labels=("query",),
+    )
+)
+DB_WAIT = registry.register(
+    Histogram(
+        "bot_db_queue_wait_seconds",
+        "Time queries waited for the DB worker thread to be free",
+    )
+)
+DB_ERRORS = registry.register(
+    Counter(
+        "bot_db_query_errors_total",
+        "Queries that raised an exception",
+        labels=("query",),
+    )
+)
+DB_ROWS = registry.register(
+    Counter(
+        "bot_db_rows_returned_total",
+        "Rows returned by queries that return a list",
+        labels=("query",),
+    )
+)
+
+FEED_REQUESTS = registry.register(
+    Counter(
+        "bot_feed_requests_total",
+        "Calendar feed requests, by how they were answered",
+        labels=("result",),
+    )
+)
+
+
+def instrument_bot(bot):
+    """Time every command, count failures and expose the bot's queues"""
+    from discord.ext import commands
+
+    @bot.before_invoke
+    async def start_timer(ctx):
+        ctx.metrics_start = time.perf_counter()
+        # Everything logged while the command runs is tagged with this
+        command_context.set(
+            {
+                "guild": ctx.guild.id if ctx.guild else None,
+                "user": ctx.author.id,
+                "command": ctx.command.qualified_name,
+            }
+        )
+
+    @bot.after_invoke
+    async def stop_timer(ctx):
+        # Runs whether the command succeeded or not
+        start = getattr(ctx, "metrics_start", None)
+        if start is not None and ctx.command is not None:
+            duration = time.perf_counter() - start
+            COMMAND_LATENCY.observe(duration, command=ctx.command.qualified_name)
+            log.debug(
+                "Command finished",
+                extra={"duration_ms": round(duration * 1000, 2)},
+            )
+
+    async def count_error(ctx, error):
+        command = ctx.command.qualified_name if ctx.command else "unknown"
+        error = getattr(error, "original", error)
+        COMMAND_ERRORS.inc(command=command, error=type(error).__name__)
+        if not isinstance(error, commands.CommandError):
+            # A bug rather than bad input, the cogs only tell the user
+            log.error(
+                "Command %s failed",
+                command,
+                exc_info=error,
+                extra={"command": command},
+            )
+
+    # A listener, so the default error reporting and cog handlers still run
+    bot.add_listener(count_error, "on_command_error")
+
+    registry.register(
+        Gauge(
+            "bot_dispatch_queue_depth",
+            "Messages waiting in the outbound dispatcher",
+            lambda: bot.dispatcher.queue_depth(),
+        )
+    )
+    registry.register(
+        Gauge(
+            "bot_scheduled_jobs",
+            "Jobs pending in the scheduler",
+            lambda: len(bot.scheduler),
+        )
+    )
+    registry.register(
+        Gauge(
+            "bot_event_loop_tasks",
+            "Tasks alive on the event loop",
+            lambda: len(asyncio.all_tasks()),  # Scraped from the bot's own loop
+        )
+    )
+
+
+async def start_metrics_server(host=METRICS_HOST, port=METRICS_PORT):
+    """Serve GET /metrics, returns the runner to clean up (None if disabled)"""
+    if not port:
+        return None
+
+    # Only the running bot serves metrics, tools importing this module don't
+    from aiohttp import web
+
+    async def handle_metrics(request):
+        return web.Response(
+            text=registry.render(), content_type="text/plain", charset="utf-8"
+        )
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    log.info("📈 Metrics available on http://%s:%s/metrics", host, port)
+    return runner
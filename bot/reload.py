@@ -0,0 +1,160 @@
+"""
+Hot reloading.
+Cogs can be reloaded and settings re-read without restarting the process,
+so a deploy doesn't cost a gateway reconnect. Running commands finish first
+and new ones wait for the reload instead of failing. Only the cog modules
+themselves are re-imported, changes to helpers still need a restart.
+"""
+
+import asyncio
+import importlib.util
+import logging
+import os
+
+log = logging.getLogger(__name__)
+
+# Loaded in this order when the bot starts, each module has a setup(bot)
+EXTENSIONS = (
+    "bot.cogs.interviews",
+    "bot.cogs.admin",
+    "bot.cogs.slash",
+    "bot.cogs.tasks",
+    "bot.cogs.feeds",
+)
+
+# Seconds between checks for changed files, 0 disables the watcher
+RELOAD_POLL_INTERVAL = float(os.getenv("RELOAD_POLL_INTERVAL", "0"))
+ENV_FILE = os.getenv("ENV_FILE", ".env")
+
+
+def resolve_extension(name):
+    """Turn a short name like `tasks` into its module name, None if unknown"""
+    for extension in EXTENSIONS:
+        if name in (extension, extension.rsplit(".", 1)[-1]):
+            return extension
+    return None
+
+
+async def reload_extensions(bot, extensions, exclude=None):
+    """Reload cogs once running commands are done
+
+    Args:
+        bot: The running bot
+        extensions: Module names, from EXTENSIONS
+        exclude: Context of the command asking for the reload, if any
+
+    Returns:
+        {extension: None if it reloaded, else the error}. A cog that fails
+        to reload keeps running its previous version, one that isn't loaded
+        in this process is skipped with ExtensionNotLoaded.
+    """
+    from discord.ext import commands
+
+    results = {}
+    async with bot.commands_paused(exclude=exclude):
+        for extension in extensions:
+            if extension not in bot.extensions:
+                # TasksCog only runs on the leader, for one
+                results[extension] = commands.ExtensionNotLoaded(extension)
+                continue
+            try:
+                await bot.reload_extension(extension)
+            except Exception as e:
+                log.exception("⚠️ Could not reload %s, keeping the old one", extension)
+                results[extension] = e
+            else:
+                log.info("🔄 Reloaded %s", extension)
+                results[extension] = None
+    return results
+
+
+async def reload_config(bot):
+    """Re-read .env and the guild settings, and apply them in place
+
+    Picks up a new CHANNEL_ID and any guild_config rows changed outside the
+    bot. Settings read once at import (DB_*, CACHE_*, METRICS_*...) still
+    need a restart.
+
+    Returns:
+        Number of guild configs loaded
+    """
+    from dotenv import load_dotenv
+    from bot.db import events
+    from bot.db.cache import query_cache
+    from bot.db.guilds import GuildConfigManager
+
+    load_dotenv(ENV_FILE, override=True)
+    count = await GuildConfigManager.load_all()
+
+    # Cached results depend on guild timezones, and the schedule on all of it
+    query_cache.clear()
+    for config in GuildConfigManager.all():
+        events.publish(events.GUILD_CONFIG_UPDATED, config)
+
+    if bot.election.is_leader:
+        await bot.adopt_legacy_channel()
+    log.info("🔄 Reloaded settings for %d guild(s)", count)
+    return count
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class ReloadWatcher:
+    """Polls the cog files and .env, and reloads whatever changed
+
+    Polling a handful of files is cheap and works the same on every
+    platform and inside containers, where inotify on mounted volumes is
+    unreliable.
+    """
+
+    def __init__(self, bot, interval=RELOAD_POLL_INTERVAL, env_file=ENV_FILE):
+        self.bot = bot
+        self.interval = interval
+        self.files = {
+            importlib.util.find_spec(extension).origin: extension
+            for extension in EXTENSIONS
+        }
+        self.env_file = env_file
+        self._task = None
+
+    def _snapshot(self):
+        paths = list(self.files) + [self.env_file]
+        return {path: _mtime(path) for path in paths}
+
+    def start(self):
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+            log.info("👀 Watching cogs and %s for changes", self.env_file)
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        seen = self._snapshot()
+        while True:
+            await asyncio.sleep(self.interval)
+            current = self._snapshot()
+            changed = [path for path in current if current[path] != seen[path]]
+            seen = current
+            if not changed:
+                continue
+
+            try:
+                extensions = [
+                    self.files[path]
+                    for path in changed
+                    if self.files.get(path) in self.bot.extensions
+                ]
+                if extensions:
+                    await reload_extensions(self.bot, extensions)
+                if self.env_file in changed:
+                    await reload_config(self.bot)
+            except Exception:
+                log.exception("⚠️ Reload after a file change failed")
@@ -0,0 +1,131 @@
+"""
+Event-driven job scheduler.
+Keeps every upcoming deadline in a heap and sleeps exactly until the next
+one, so thousands of pending reminders cost nothing until they're due.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+log = logging.getLogger(__name__)
+
+
+class Scheduler:
+    """Runs coroutines at given UTC epochs
+
+    Jobs are identified by a key (any hashable). Scheduling a key that is
+    already pending replaces the old job, which makes incremental updates
+    trivial: reschedule on change, cancel on delete.
+    """
+
+    def __init__(self):
+        self._heap = []  # [when, seq, key, callback, args] entries
+        self._jobs = {}  # key -> its live heap entry
+        self._seq = itertools.count()  # Tie-breaker so entries never compare keys
+        self._cancelled = 0
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._running = set()  # Jobs currently firing, kept so they aren't GC'd
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def __contains__(self, key):
+        return key in self._jobs
+
+    def schedule(self, key, when, callback, *args):
+        """Run `await callback(*args)` at epoch `when`, replacing any job with this key"""
+        self.cancel(key)
+
+        entry = [when, next(self._seq), key, callback, args]
+        self._jobs[key] = entry
+        heapq.heappush(self._heap, entry)
+
+        # Only wake the runner if this is the new earliest deadline
+        if self._heap[0] is entry:
+            self._wakeup.set()
+
+    def cancel(self, key):
+        """Forget a pending job (no-op if there isn't one)"""
+        entry = self._jobs.pop(key, None)
+        if entry is None:
+            return
+
+        # Removing from the middle of a heap is O(n), so just mark the entry
+        # dead and skip it when it reaches the top
+        entry[3] = None
+        self._cancelled += 1
+        if self._cancelled > 64 and self._cancelled > len(self._heap) // 2:
+            self._heap = [e for e in self._heap if e[3] is not None]
+            heapq.heapify(self._heap)
+            self._cancelled = 0
+
+    def cancel_where(self, predicate):
+        """Cancel every pending job whose key matches `predicate`"""
+        for key in [key for key in self._jobs if predicate(key)]:
+            self.cancel(key)
+
+    def replace_callbacks(self, replace):
+        """Swap every pending job's callback for `replace(callback)`
+
+        Lets a reloaded cog take over the jobs its previous version booked,
+        without touching their keys or deadlines.
+        """
+        for entry in self._jobs.values():
+            entry[3] = replace(entry[3])
+
+    def next_deadline(self):
+        """Epoch of the earliest pending job, or None"""
+        self._drop_cancelled()
+        return self._heap[0][0] if self._heap else None
+
+    def start(self):
+        """Start running jobs on the current event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        """Stop running jobs (pending ones are kept)"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def _drop_cancelled(self):
+        while self._heap and self._heap[0][3] is None:
+            heapq.heappop(self._heap)
+            self._cancelled -= 1
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            deadline = self.next_deadline()
+
+            if deadline is None:
+                await self._wakeup.wait()
+                continue
+
+            delay = deadline - time.time()
+            if delay > 0:
+                # Sleep until the deadline, or until an earlier job shows up
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            _, _, key, callback, args = heapq.heappop(self._heap)
+            del self._jobs[key]
+
+            # Each job gets its own task, so a slow send can't delay the next one
+            task = asyncio.create_task(self._fire(key, callback, args))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _fire(self, key, callback, args):
+        try:
+            await callback(*args)
+        except Exception as e:
+            log.exception("⚠️ Scheduled job %s failed: %s", key, e)
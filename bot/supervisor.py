@@ -0,0 +1,175 @@
+"""
+Multi-process supervisor.
+With WORKERS > 1, run.py starts this instead of the bot. It splits the
+shards between that many worker processes, each running the bot for its own
+shard range, and restarts any worker that dies. The workers share the
+SQLite database, and elect one of them to run the scheduled tasks (see
+bot/leader.py).
+"""
+
+import asyncio
+import logging
+import os
+import signal
+import sys
+import time
+
+log = logging.getLogger(__name__)
+
+WORKERS = int(os.getenv("WORKERS", "1"))
+# Total shards, asked from Discord when unset
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0")) or None
+
+# Discord lets a bot identify one shard per 5 seconds (per concurrency bucket)
+IDENTIFY_INTERVAL = 5.0
+# A worker crashing again sooner than this after starting backs off longer
+MIN_UPTIME = 60.0
+MAX_BACKOFF = 60.0
+
+
+async def recommended_shards(token):
+    """Ask Discord how many shards to use
+
+    Returns:
+        (shard count, identify max_concurrency)
+    """
+    import aiohttp
+
+    async with aiohttp.ClientSession() as session:
+        async with session.get(
+            "https://discord.com/api/v10/gateway/bot",
+            headers={"Authorization": f"Bot {token}"},
+        ) as response:
+            response.raise_for_status()
+            data = await response.json()
+    return data["shards"], data["session_start_limit"]["max_concurrency"]
+
+
+def shard_ranges(shard_count, workers):
+    """Split shard IDs 0..shard_count-1 into `workers` contiguous ranges"""
+    workers = min(workers, shard_count)
+    size, extra = divmod(shard_count, workers)
+    ranges, start = [], 0
+    for worker in range(workers):
+        end = start + size + (worker < extra)
+        ranges.append(list(range(start, end)))
+        start = end
+    return ranges
+
+
+class Worker:
+    """One bot process and its shard range, restarted when it exits"""
+
+    def __init__(self, worker_id, shard_ids, shard_count, command):
+        self.worker_id = worker_id
+        self.shard_ids = shard_ids
+        self.shard_count = shard_count
+        self.command = command
+        self.process = None
+        self.backoff = 1.0
+
+    def _env(self):
+        env = dict(os.environ)
+        env["WORKER_ID"] = str(self.worker_id)
+        env["SHARD_IDS"] = ",".join(map(str, self.shard_ids))
+        env["SHARD_COUNT"] = str(self.shard_count)
+        # Each worker needs its own metrics port
+        metrics_port = int(env.get("METRICS_PORT", "9100"))
+        if metrics_port:
+            env["METRICS_PORT"] = str(metrics_port + self.worker_id)
+        return env
+
+    async def run(self, stopping):
+        """Keep the worker alive until `stopping` is set"""
+        while not stopping.is_set():
+            started = time.monotonic()
+            self.process = await asyncio.create_subprocess_exec(
+                *self.command, env=self._env()
+            )
+            log.info(
+                "🚀 Worker %d (pid %d) started with shards %s",
+                self.worker_id,
+                self.process.pid,
+                self.shard_ids,
+            )
+            code = await self.process.wait()
+            if stopping.is_set():
+                break
+
+            # Back off when it keeps crashing right away
+            if time.monotonic() - started > MIN_UPTIME:
+                self.backoff = 1.0
+            log.warning(
+                "⚠️ Worker %d exited with code %s, restarting in %.0fs",
+                self.worker_id,
+                code,
+                self.backoff,
+            )
+            try:
+                await asyncio.wait_for(stopping.wait(), self.backoff)
+            except asyncio.TimeoutError:
+                pass
+            self.backoff = min(self.backoff * 2, MAX_BACKOFF)
+
+    def terminate(self):
+        if self.process and self.process.returncode is None:
+            self.process.terminate()
+
+
+async def supervise(command, workers=WORKERS, shard_count=SHARD_COUNT):
+    """Run `workers` copies of `command`, each with its own range of shards
+
+    Args:
+        command: argv that starts one worker, e.g. [python, run.py]
+        workers: Number of processes
+        shard_count: Total shards, asked from Discord when None
+    """
+    from bot.core import get_token
+    from bot.db import close_storage, open_storage
+
+    max_concurrency = 1
+    if shard_count is None:
+        shard_count, max_concurrency = await recommended_shards(get_token())
+
+    # Migrate once up front rather than having every worker wait on the lock
+    await open_storage()
+    await close_storage()
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stopping.set)
+
+    ranges = shard_ranges(shard_count, workers)
+    log.info(
+        "🧩 Running %d shard(s) in %d worker(s): %s", shard_count, len(ranges), ranges
+    )
+
+    pool = [
+        Worker(worker_id, shard_ids, shard_count, command)
+        for worker_id, shard_ids in enumerate(ranges)
+    ]
+    tasks = []
+    for worker in pool:
+        tasks.append(asyncio.create_task(worker.run(stopping)))
+        # Identifying every shard at once gets the later ones rate limited
+        delay = IDENTIFY_INTERVAL * len(worker.shard_ids) / max_concurrency
+        try:
+            await asyncio.wait_for(stopping.wait(), delay)
+        except asyncio.TimeoutError:
+            pass
+
+    await stopping.wait()
+    log.info("🛑 Stopping %d worker(s)", len(pool))
+    for worker in pool:
+        worker.terminate()
+    await asyncio.gather(*tasks)
+    # Reap workers that were still starting
+    for worker in pool:
+        if worker.process:
+            await worker.process.wait()
+
+
+def worker_command(script):
+    """argv that runs `script` with the current interpreter"""
+    return [sys.executable, os.path.abspath(script)]
@@ -1,8 +1,32 @@
-from bot.utils.formatters import format_interview_list
+from bot.utils.dates import (
+    DEFAULT_TIMEZONE,
+    day_bounds,
+    day_start,
+    from_timestamp,
+    interview_datetime,
+    interview_time,
+    local_now,
+    to_timestamp,
+)
+from bot.utils.formatters import (
+    MESSAGE_LIMIT,
+    format_interview_list,
+    iter_interview_pages,
+)
 from bot.utils.validators import validate_date, validate_time, is_valid_interview_id
 
 __all__ = [
+    "DEFAULT_TIMEZONE",
+    "day_bounds",
+    "day_start",
+    "from_timestamp",
+    "interview_datetime",
+    "interview_time",
+    "local_now",
+    "to_timestamp",
+    "MESSAGE_LIMIT",
     "format_interview_list",
+    "iter_interview_pages",
     "validate_date",
     "validate_time",
     "is_valid_interview_id",
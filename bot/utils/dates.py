@@ -0,0 +1,94 @@
+"""
+Date and time helpers.
+Interviews are stored as a UTC epoch (`scheduled_at`) plus the timezone they
+were scheduled in, these functions convert between that and local dates.
+"""
+
+from datetime import datetime, time, timedelta
+import pytz
+
+# Timezone used when nothing more specific is configured
+DEFAULT_TIMEZONE = "Europe/Paris"
+
+
+def local_now(tz_name=DEFAULT_TIMEZONE):
+    """Current time as an aware datetime in the given timezone"""
+    return datetime.now(pytz.timezone(tz_name))
+
+
+def to_timestamp(day, time_str=None, tz_name=DEFAULT_TIMEZONE):
+    """Turn a local date and optional HH:MM time into a UTC epoch
+
+    Args:
+        day: datetime.date of the interview
+        time_str: "HH:MM" string, or None for a date-only interview
+        tz_name: Timezone the date and time are expressed in
+
+    Returns:
+        Integer seconds since the epoch
+    """
+    if time_str:
+        clock = datetime.strptime(time_str, "%H:%M").time()
+    else:
+        clock = datetime.min.time()  # Date-only interviews sit at midnight
+    local = pytz.timezone(tz_name).localize(datetime.combine(day, clock))
+    return int(local.timestamp())
+
+
+def from_timestamp(timestamp, tz_name=DEFAULT_TIMEZONE):
+    """Turn a UTC epoch back into an aware datetime in the given timezone"""
+    return datetime.fromtimestamp(timestamp, pytz.timezone(tz_name))
+
+
+def day_start(day, tz_name=DEFAULT_TIMEZONE):
+    """UTC epoch of local midnight at the start of `day`"""
+    return to_timestamp(day, None, tz_name)
+
+
+def day_bounds(day, tz_name=DEFAULT_TIMEZONE):
+    """(start, end) UTC epochs covering the whole local day, end exclusive"""
+    return day_start(day, tz_name), day_start(day + timedelta(days=1), tz_name)
+
+
+def interview_datetime(interview):
+    """Local datetime of an interview row"""
+    return from_timestamp(interview["scheduled_at"], interview["timezone"])
+
+
+def interview_time(interview):
+    """HH:MM time of an interview row, or None if it has no time"""
+    if not interview["has_time"]:
+        return None
+    return interview_datetime(interview).strftime("%H:%M")
+
+
+def next_local_time(hour, tz_name=DEFAULT_TIMEZONE, weekday=None, after=None):
+    """UTC epoch of the next time the local clock shows `hour`:00
+
+    Args:
+        hour: Local hour (0-23)
+        tz_name: Timezone the hour is expressed in
+        weekday: Only match this day of the week (0 = Monday), or None
+        after: UTC epoch to search from (defaults to now)
+
+    Returns:
+        Integer seconds since the epoch, strictly after `after`
+    """
+    tz = pytz.timezone(tz_name)
+    now = from_timestamp(after, tz_name) if after is not None else local_now(tz_name)
+    day = now.date()
+
+    while True:
+        candidate = tz.localize(datetime.combine(day, time(hour=hour)))
+        if candidate > now and (weekday is None or day.weekday() == weekday):
+            return int(candidate.timestamp())
+        day += timedelta(days=1)
+
+
+def period_keys(when):
+    """Week and month a local datetime falls in, e.g. ("2024-W07", "2024-02")
+
+    The keys sort chronologically as plain strings, so SQL can compare them.
+    """
+    year, week, _ = when.isocalendar()
+    return f"{year}-W{week:02d}", when.strftime("%Y-%m")
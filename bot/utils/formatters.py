@@ -3,39 +3,30 @@ Message formatting utilities.
 Functions to format messages in a consistent way.
 """
 
-import re
-from datetime import datetime
-import pytz
+from bot.utils.dates import interview_datetime, local_now
 
+# Discord refuses messages longer than this
+MESSAGE_LIMIT = 2000
 
-def format_interview_list(interviews, title, include_username=True):
-    """Format a list of interviews into a nicely structured message
 
-    Args:
-        interviews: List of interview objects (from database)
-        title: Title for the message
-        include_username: Whether to include the username in the output
+def _interview_lines(interviews, include_username):
+    """Yield (group header, line) pairs for each interview
 
-    Returns:
-        Formatted string with all interviews grouped by date
+    The group header is the date heading the interview belongs under. Rows
+    must be sorted by date so each group is contiguous.
     """
-    today = datetime.now(pytz.timezone("Europe/Paris")).date()
-    date_groups = {}
+    today = {}  # timezone -> today's date there
 
-    for interview_row in interviews:
-        # Convert sqlite3.Row to dictionary if needed
-        interview = (
-            dict(interview_row) if hasattr(interview_row, "keys") else interview_row
-        )
+    for interview in interviews:
+        when = interview_datetime(interview)
 
-        # Convert string to date object if needed
-        if isinstance(interview["interview_date"], str):
-            int_date = datetime.strptime(interview["interview_date"], "%Y-%m-%d").date()
-        else:
-            int_date = interview["interview_date"]
+        # Compare against "today" in the timezone the interview was set in
+        tz_name = interview["timezone"]
+        if tz_name not in today:
+            today[tz_name] = local_now(tz_name).date()
 
         # Calculate days difference for grouping
-        days_diff = (int_date - today).days
+        days_diff = (when.date() - today[tz_name]).days
 
         # Create a group based on the date
         if days_diff == 0:
@@ -46,62 +37,95 @@ def format_interview_list(interviews, title, include_username=True):
             days_text = (
                 f"in {days_diff} days" if days_diff > 0 else f"{-days_diff} days ago"
             )
-            group = f"**{int_date.strftime('%A, %b %d')}** ({days_text}) 📅"
+            group = f"**{when.strftime('%A, %b %d')}** ({days_text}) 📅"
 
-        # Add the interview to the appropriate group
-        if group not in date_groups:
-            date_groups[group] = []
-        date_groups[group].append(interview)
+        time_info = f" at {when.strftime('%H:%M')}" if interview["has_time"] else ""
+
+        # Build the interview description line
+        interview_desc = f"`ID {interview['id']}`"
+
+        # Add username if requested (for admin commands)
+        if include_username:
+            interview_desc += f" **{interview['user_name']}**"
+
+        # Add time and type information
+        interview_desc += (
+            f"{time_info} {interview['interview_type']}: {interview['description']}"
+        )
+
+        yield group, interview_desc
+
+
+def format_interview_list(interviews, title, include_username=True):
+    """Format a list of interviews into a nicely structured message
 
+    Args:
+        interviews: List of interview objects (from database), sorted by date
+        title: Title for the message
+        include_username: Whether to include the username in the output
+
+    Returns:
+        Formatted string with all interviews grouped by date
+    """
     # Build the message
     message = [f"**{title}**"]
+    current_group = None
 
-    # Sort groups by date (Today first, then Tomorrow, then future dates)
-    sorted_groups = sorted(
-        date_groups.items(),
-        key=lambda x: (
-            -100 if "Today" in x[0] else (-50 if "Tomorrow" in x[0] else days_diff)
-        ),
-    )
-
-    # Add each group to the message
-    for group_name, group_interviews in sorted_groups:
-        message.append(f"\n{group_name}")
-        for interview in group_interviews:
-            time_info = ""
-            interview_type = interview["interview_type"]
-
-            # Check if interview_type looks like a time (HH:MM)
-            is_type_time_format = re.match(r"^\d{1,2}:\d{2}$", interview_type)
-
-            # Case 1: We have a proper interview_time
-            if (
-                interview.get("interview_time")
-                and interview["interview_time"] != "No time specified"
-            ):
-                time_info = f" at {interview['interview_time']}"
-
-                # If interview_type also looks like a time, it's probably incorrect data
-                if is_type_time_format:
-                    interview_type = "Interview"  # Default type
-
-            # Case 2: No proper interview_time but interview_type looks like a time
-            elif is_type_time_format:
-                time_info = f" at {interview_type}"
-                interview_type = "Interview"  # Default type
-
-            # Build the interview description line
-            interview_desc = f"`ID {interview['id']}`"
-
-            # Add username if requested (for admin commands)
-            if include_username:
-                interview_desc += f" **{interview['user_name']}**"
-
-            # Add time and type information
-            interview_desc += (
-                f"{time_info} {interview_type}: {interview['description']}"
-            )
-
-            message.append(interview_desc)
+    for group, line in _interview_lines(interviews, include_username):
+        # Rows come sorted by scheduled_at, so a new group means a new day
+        if group != current_group:
+            message.append(f"\n{group}")
+            current_group = group
+        message.append(line)
 
     return "\n".join(message)
+
+
+def iter_interview_pages(interviews, title, include_username=True, limit=MESSAGE_LIMIT):
+    """Split a list of interviews into messages that fit Discord's size limit
+
+    Works lazily, so `interviews` can be any iterable (e.g. a cursor).
+
+    Args:
+        interviews: Iterable of interview rows, sorted by date
+        title: Title shown at the top of the first message
+        include_username: Whether to include the username in the output
+        limit: Maximum length of each message
+
+    Yields:
+        (message, count) tuples, count being how many interviews it holds
+    """
+    header = f"**{title}**"
+    message = [header]
+    length = len(header)
+    count = 0
+    current_group = None
+
+    for group, line in _interview_lines(interviews, include_username):
+        # One giant description shouldn't make the whole page unsendable
+        max_line = limit - len(title) - len(group) - 15
+        if len(line) > max_line:
+            line = line[: max_line - 1] + "…"
+
+        new_group = group != current_group
+        extra = len(line) + 1 + (len(group) + 2 if new_group else 0)
+
+        if count and length + extra > limit:
+            yield "\n".join(message), count
+
+            # Repeat the title and the date we're in on the next message
+            message = [f"**{title} (cont.)**"]
+            length = len(message[0])
+            count = 0
+            new_group = True
+            extra = len(line) + len(group) + 3
+
+        if new_group:
+            message.append(f"\n{group}")
+            current_group = group
+        message.append(line)
+        length += extra
+        count += 1
+
+    if count:
+        yield "\n".join(message), count
@@ -0,0 +1,100 @@
+"""
+Button-driven pagination for long interview lists.
+Pages are fetched lazily with keyset queries, so the whole table is never
+loaded into memory no matter how many interviews there are.
+"""
+
+import discord
+from bot.utils.formatters import iter_interview_pages
+
+# Rows fetched per page, the renderer may show fewer to stay under 2000 chars
+PAGE_SIZE = 20
+
+
+class InterviewPaginator(discord.ui.View):
+    """Previous/Next buttons over a keyset-paginated interview query
+
+    Args:
+        fetch_page: Coroutine taking (after, limit) and returning rows sorted
+            by (scheduled_at, id), like InterviewManager.get_future_interviews_page
+            (or in reverse, like get_user_history_page)
+        title: Title shown above each page
+        author_id: Only this user may flip the pages
+        include_username: Whether to include the username in the output
+        cursor_of: Function giving the keyset cursor of a row, defaults to
+            its (scheduled_at, id)
+    """
+
+    def __init__(
+        self, fetch_page, title, author_id, include_username=True, cursor_of=None
+    ):
+        super().__init__(timeout=180)
+        self.fetch_page = fetch_page
+        self.cursor_of = cursor_of or (lambda row: (row["scheduled_at"], row["id"]))
+        self.title = title
+        self.author_id = author_id
+        self.include_username = include_username
+        self.message = None
+
+        # Keyset cursor for the start of every page we've visited
+        self.cursors = [None]
+        self.next_cursor = None
+
+    async def render(self):
+        """Fetch and render the current page
+
+        Returns:
+            The page text, or None if there are no interviews at all
+        """
+        rows = await self.fetch_page(self.cursors[-1], PAGE_SIZE + 1)
+        if not rows:
+            return None
+
+        page_number = len(self.cursors)
+        title = f"{self.title} (page {page_number})"
+        text, shown = next(
+            iter_interview_pages(rows[:PAGE_SIZE], title, self.include_username)
+        )
+
+        # Continue after the last row that actually fit on this page
+        if shown < len(rows):
+            self.next_cursor = self.cursor_of(rows[shown - 1])
+        else:
+            self.next_cursor = None
+
+        self.previous_page.disabled = page_number == 1
+        self.next_page.disabled = self.next_cursor is None
+        return text
+
+    async def interaction_check(self, interaction):
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message(
+                "❌ Only the person who ran the command can flip pages!",
+                ephemeral=True,
+            )
+            return False
+        return True
+
+    async def on_timeout(self):
+        # Grey out the buttons once nobody can use them anymore
+        for item in self.children:
+            item.disabled = True
+        if self.message:
+            try:
+                await self.message.edit(view=self)
+            except discord.HTTPException:
+                pass
+
+    @discord.ui.button(label="◀ Previous", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction, button):
+        if len(self.cursors) > 1:
+            self.cursors.pop()
+        text = await self.render() or "No more interviews scheduled! 📭"
+        await interaction.response.edit_message(content=text, view=self)
+
+    @discord.ui.button(label="Next ▶", style=discord.ButtonStyle.primary)
+    async def next_page(self, interaction, button):
+        if self.next_cursor is not None:
+            self.cursors.append(self.next_cursor)
+        text = await self.render() or "No more interviews scheduled! 📭"
+        await interaction.response.edit_message(content=text, view=self)
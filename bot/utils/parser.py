@@ -0,0 +1,259 @@
+"""
+Command argument parsing.
+Splits the text of `!schedule` and `!update_interview` into tokens in a
+single pass, then reads dates, times and key=value updates off them with
+precompiled patterns. Quoted values keep their spaces, and dates can be
+relative ("tomorrow", "next fri", "in 3 days"), resolved against the
+guild's current day.
+"""
+
+import functools
+import re
+from collections import namedtuple
+from datetime import timedelta
+from bot.utils.validators import validate_date
+
+# Keys accepted by !update_interview and the column each one updates
+UPDATE_KEYS = {
+    "date": "interview_date",
+    "time": "interview_time",
+    "type": "interview_type",
+    "desc": "description",
+}
+
+DATE_HELP = "use YYYY-MM-DD, or e.g. tomorrow, fri, next mon, in 3 days"
+TIME_HELP = "use HH:MM (24-hour) or e.g. 2:30pm"
+
+# Leading spaces, an optional key=, then a "quoted" or “quoted” value, an
+# unclosed quote, or a bare word
+TOKEN = re.compile(
+    r"""\s*(?:(?P<key>\w+)=)?
+    (?:"(?P<quoted>(?:[^"\\]|\\.)*)"
+      |“(?P<smart>[^”]*)”
+      |(?P<unclosed>["“])
+      |(?P<bare>\S*))""",
+    re.VERBOSE,
+)
+ESCAPE = re.compile(r"\\(.)")
+
+TIME = re.compile(
+    r"(?P<hour>\d{1,2})(?::(?P<minute>\d{2}))?\s*(?P<meridiem>am|pm)?",
+    re.IGNORECASE,
+)
+RELATIVE_DATE = re.compile(
+    r"""(?P<today>today)
+    |(?P<tomorrow>tomorrow)
+    |(?P<next>next\s+)?(?P<weekday>mon|tue|wed|thu|fri|sat|sun)[a-z]*
+    |(?P<next_week>next\s+week)
+    |in\s+(?P<count>\d{1,3})\s+(?P<unit>day|week)s?""",
+    re.IGNORECASE | re.VERBOSE,
+)
+WEEKDAY_NAMES = {
+    "mon": "monday",
+    "tue": "tuesday",
+    "wed": "wednesday",
+    "thu": "thursday",
+    "fri": "friday",
+    "sat": "saturday",
+    "sun": "sunday",
+}
+WEEKDAYS = {name: i for i, name in enumerate(WEEKDAY_NAMES)}
+
+# Longest relative date, in words ("in 3 days")
+MAX_DATE_WORDS = 3
+
+Token = namedtuple("Token", "key value raw")
+Token.__doc__ = """One token: `key` is None unless it was written key=value,
+`value` has its quotes removed and `raw` is the text as typed"""
+
+Schedule = namedtuple(
+    "Schedule", "interview_date interview_time interview_type description"
+)
+
+
+class ParseError(ValueError):
+    """Text that doesn't follow the grammar, the message says what's wrong"""
+
+
+def tokenize(text):
+    """Split command text into Tokens in one left-to-right pass
+
+    Raises:
+        ParseError: If a quote is never closed
+    """
+    tokens = []
+    text = text.strip()
+    pos = 0
+    end = len(text)
+    while pos < end:
+        match = TOKEN.match(text, pos)
+        if match["unclosed"]:
+            raise ParseError('Unbalanced quotes, close every " you open')
+
+        if match["quoted"] is not None:
+            value = ESCAPE.sub(r"\1", match["quoted"])
+        elif match["smart"] is not None:
+            value = match["smart"]
+        else:
+            value = match["bare"]
+        tokens.append(Token(match["key"], value, match.group().lstrip()))
+        pos = match.end()
+    return tokens
+
+
+def parse_time(text):
+    """Turn "14:30", "9:05", "2pm" or "2:30pm" into "HH:MM"
+
+    Returns:
+        The 24-hour "HH:MM" time, or None if `text` doesn't look like a time
+
+    Raises:
+        ParseError: If it looks like a time but isn't one, like 25:00
+    """
+    match = TIME.fullmatch(text)
+    if not match or not (match["minute"] or match["meridiem"]):
+        return None
+
+    hour = int(match["hour"])
+    minute = int(match["minute"] or 0)
+    if match["meridiem"]:
+        if not 1 <= hour <= 12:
+            raise ParseError(f"Invalid time `{text}`, {TIME_HELP}")
+        hour = hour % 12 + (12 if match["meridiem"].lower() == "pm" else 0)
+    if hour > 23 or minute > 59:
+        raise ParseError(f"Invalid time `{text}`, {TIME_HELP}")
+    return f"{hour:02d}:{minute:02d}"
+
+
+@functools.lru_cache(maxsize=1024)
+def resolve_date(phrase, today):
+    """The date a phrase means on `today`, None if it isn't a date
+
+    Memoized per (phrase, day), so the same words are only worked out once a
+    day. A bare weekday is the next one from today on (today included),
+    "next <weekday>" the next one after today.
+    """
+    if phrase[:1].isdigit():
+        return validate_date(phrase)
+
+    match = RELATIVE_DATE.fullmatch(phrase)
+    if match is None:
+        return None
+    if match["today"]:
+        return today
+    if match["tomorrow"]:
+        return today + timedelta(days=1)
+    if match["next_week"]:
+        return today + timedelta(weeks=1)
+    if match["weekday"]:
+        name = match.group()[len(match["next"] or "") :].lower()
+        short = name[:3]
+        if not WEEKDAY_NAMES[short].startswith(name):
+            return None  # "frisbee" isn't a day
+        days = (WEEKDAYS[short] - today.weekday()) % 7
+        if days == 0 and match["next"]:
+            days = 7
+        return today + timedelta(days=days)
+
+    count = int(match["count"])
+    unit = timedelta(weeks=1) if match["unit"].lower() == "week" else timedelta(1)
+    return today + count * unit
+
+
+def parse_date(words, today):
+    """Read a date off the start of `words`, absolute or relative
+
+    Args:
+        words: List of words, the date may span several ("next fri")
+        today: The guild's current date, relative dates count from it
+
+    Returns:
+        (datetime.date, number of words it took)
+
+    Raises:
+        ParseError: If the first words aren't a date
+    """
+    for size in range(min(MAX_DATE_WORDS, len(words)), 0, -1):
+        when = resolve_date(" ".join(words[:size]).lower(), today)
+        if when is not None:
+            return when, size
+    shown = words[0] if words else ""
+    raise ParseError(f"Invalid date `{shown}`, {DATE_HELP}")
+
+
+def parse_date_text(text, today):
+    """A whole value as a date, like parse_date() but every word must be used"""
+    words = text.split()
+    when, used = parse_date(words, today)
+    if used != len(words):
+        raise ParseError(f"Invalid date `{text}`, {DATE_HELP}")
+    return when
+
+
+def parse_time_text(text):
+    """A whole value as an "HH:MM" time, like parse_time() but never None"""
+    time_str = parse_time(text.strip())
+    if time_str is None:
+        raise ParseError(f"Invalid time `{text}`, {TIME_HELP}")
+    return time_str
+
+
+def parse_schedule(text, today):
+    """Parse one interview given to !schedule
+
+    Grammar: <date> [time] <type> [description...], where the date may be
+    relative and a multi-word type or description may be quoted. A time
+    without a type gives the type "Interview".
+
+    Returns:
+        Schedule(interview_date, interview_time or None, interview_type,
+        description)
+
+    Raises:
+        ParseError: With what's wrong
+    """
+    # key=value has no meaning here, "a=b" is just a word
+    words = [token.raw if token.key else token.value for token in tokenize(text)]
+    if not words:
+        raise ParseError("Give at least a date and a type!")
+
+    interview_date, used = parse_date(words, today)
+    rest = words[used:]
+
+    interview_time = parse_time(rest[0]) if rest else None
+    if interview_time is not None:
+        rest = rest[1:]
+    elif not rest:
+        raise ParseError("Give at least a date and a type!")
+
+    interview_type = rest[0] if rest else "Interview"
+    return Schedule(interview_date, interview_time, interview_type, " ".join(rest[1:]))
+
+
+def parse_updates(text, today):
+    """Parse `key=value` pairs from !update_interview into column updates
+
+    Values with spaces must be quoted, like desc="My description". Dates
+    may be relative (date=tomorrow, date="next fri"). Unknown keys and
+    words without a key are ignored, the first value of a key wins.
+
+    Returns:
+        Dictionary mapping column names to their new values, the date as a
+        datetime.date and the time as "HH:MM"
+
+    Raises:
+        ParseError: If a date or time is invalid
+    """
+    updates = {}
+    for token in tokenize(text):
+        column = UPDATE_KEYS.get((token.key or "").lower())
+        if column is None or column in updates:
+            continue
+
+        value = token.value
+        if column == "interview_date":
+            value = parse_date_text(value, today)
+        elif column == "interview_time":
+            value = parse_time_text(value)
+        updates[column] = value
+    return updates
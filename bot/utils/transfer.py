@@ -0,0 +1,370 @@
+"""
+Bulk import and export of interviews.
+Rows are read from and written to CSV, JSON Lines and iCalendar one at a
+time, so files of any size go through in constant memory. Imports are
+validated with the same rules as `!schedule`.
+"""
+
+import csv
+import io
+import json
+from datetime import datetime
+import pytz
+from bot.utils.dates import interview_datetime
+from bot.utils.validators import validate_date, validate_time
+
+# Columns of CSV files (and keys of JSON Lines), in order. `id` is exported
+# for reference but ignored on import, imported interviews get new IDs.
+FIELDS = (
+    "id",
+    "user_id",
+    "user_name",
+    "date",
+    "time",
+    "type",
+    "description",
+    "timezone",
+)
+
+# File extension -> format
+FORMATS = {
+    "csv": "csv",
+    "jsonl": "jsonl",
+    "ndjson": "jsonl",
+    "ics": "ics",
+    "ical": "ics",
+}
+EXTENSIONS = {"csv": "csv", "jsonl": "jsonl", "ics": "ics"}
+
+# Length timed interviews get in calendars
+EVENT_DURATION = "PT1H"
+ICAL_PRODID = "-//pweaseHiredMe//Interviews//EN"
+
+
+def format_of(filename):
+    """Format of a file from its extension, None if it isn't supported"""
+    return FORMATS.get(filename.rsplit(".", 1)[-1].lower())
+
+
+# Reading
+
+
+def _read_csv(lines, default_tz):
+    reader = csv.DictReader(lines)
+    for row in reader:
+        yield reader.line_num, row, None
+
+
+def _read_jsonl(lines, default_tz):
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield number, None, "not valid JSON"
+            continue
+        if not isinstance(row, dict):
+            yield number, None, "not a JSON object"
+            continue
+        yield number, row, None
+
+
+def _unfold(lines):
+    """Join folded iCalendar lines back together, with their line numbers"""
+    current = None
+    for number, line in enumerate(lines, start=1):
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current[1] += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = [number, line]
+    if current is not None:
+        yield current
+
+
+def _content_line(line):
+    """Split `NAME;PARAM=value:VALUE` into (NAME, {PARAM: value}, VALUE)"""
+    quoted = False
+    for i, char in enumerate(line):
+        if char == '"':
+            quoted = not quoted
+        elif char == ":" and not quoted:
+            break
+    else:
+        return line.upper(), {}, ""
+
+    name, *params = line[:i].split(";")
+    params = dict(param.partition("=")[::2] for param in params)
+    params = {key.upper(): value.strip('"') for key, value in params.items()}
+    return name.upper(), params, line[i + 1 :]
+
+
+def _unescape(text):
+    out, chars = [], iter(text)
+    for char in chars:
+        if char == "\\":
+            char = next(chars, "")
+            char = "\n" if char in "nN" else char
+        out.append(char)
+    return "".join(out)
+
+
+def _event_row(event, default_tz):
+    """Turn a VEVENT's properties into an import row"""
+    if "DTSTART" not in event:
+        raise ValueError("no DTSTART")
+    params, value = event["DTSTART"]
+    tz_name = event.get("X-INTERVIEW-TIMEZONE", ({}, default_tz))[1]
+    if tz_name not in pytz.all_timezones_set:
+        tz_name = default_tz
+
+    if params.get("VALUE") == "DATE" or len(value) == 8:
+        when, time_str = datetime.strptime(value, "%Y%m%d"), None
+    else:
+        when = datetime.strptime(value.rstrip("Z"), "%Y%m%dT%H%M%S")
+        if value.endswith("Z"):
+            when = pytz.utc.localize(when).astimezone(pytz.timezone(tz_name))
+        elif params.get("TZID") in pytz.all_timezones_set:
+            tz_name = params["TZID"]
+        time_str = when.strftime("%H:%M")
+
+    def text(name, default=""):
+        return _unescape(event[name][1]) if name in event else default
+
+    return {
+        "user_id": text("X-DISCORD-USER-ID", None),
+        "user_name": text("X-DISCORD-USER-NAME", None),
+        "date": when.strftime("%Y-%m-%d"),
+        "time": time_str,
+        "type": text("X-INTERVIEW-TYPE", text("SUMMARY")),
+        "description": text("DESCRIPTION"),
+        "timezone": tz_name,
+    }
+
+
+def _read_ics(lines, default_tz):
+    event = None
+    for number, line in _unfold(lines):
+        name, params, value = _content_line(line)
+        if name == "BEGIN" and value.upper() == "VEVENT":
+            event, start = {}, number
+        elif name == "END" and value.upper() == "VEVENT" and event is not None:
+            try:
+                yield start, _event_row(event, default_tz), None
+            except ValueError as e:
+                yield start, None, f"bad event ({e})"
+            event = None
+        elif event is not None:
+            event.setdefault(name, (params, value))
+
+
+READERS = {"csv": _read_csv, "jsonl": _read_jsonl, "ics": _read_ics}
+
+
+def validate_row(row, default_tz, default_user, name_of=None):
+    """Check one imported row and turn it into InterviewManager's fields
+
+    Args:
+        row: Dict with the FIELDS keys, as read from the file
+        default_tz: Timezone of rows that don't say
+        default_user: (user_id, user_name) of rows without a user_id
+        name_of: Function giving a user's name from their ID, for rows
+            with a user_id but no user_name
+
+    Returns:
+        (fields for InterviewManager.import_interviews, None) if valid,
+        else (None, what's wrong)
+    """
+
+    def value(key):
+        raw = row.get(key)
+        return "" if raw is None else str(raw).strip()
+
+    if value("user_id"):
+        try:
+            user_id = int(value("user_id"))
+        except ValueError:
+            return None, f"bad user_id `{value('user_id')}`"
+        user_name = value("user_name") or (name_of and name_of(user_id))
+        user_name = user_name or str(user_id)
+    else:
+        user_id, user_name = default_user
+
+    interview_date = validate_date(value("date"))
+    if not interview_date:
+        return None, f"bad date `{value('date')}`, use YYYY-MM-DD"
+
+    interview_time = value("time") or None
+    if interview_time is not None and not validate_time(interview_time):
+        return None, f"bad time `{interview_time}`, use HH:MM"
+
+    interview_type = value("type")
+    if not interview_type:
+        return None, "missing type"
+
+    timezone = value("timezone") or default_tz
+    if timezone not in pytz.all_timezones_set:
+        return None, f"unknown timezone `{timezone}`"
+
+    return {
+        "user_id": user_id,
+        "user_name": user_name,
+        "interview_date": interview_date,
+        "interview_time": interview_time,
+        "interview_type": interview_type,
+        "description": value("description"),
+        "timezone": timezone,
+    }, None
+
+
+def parse_interviews(lines, fmt, default_tz, default_user, name_of=None):
+    """Read and validate an import file one row at a time
+
+    Args:
+        lines: Iterable of text lines (an open file, say)
+        fmt: "csv", "jsonl" or "ics"
+        default_tz, default_user, name_of: See validate_row()
+
+    Yields:
+        (line number, fields or None, error or None)
+    """
+    for number, row, error in READERS[fmt](lines, default_tz):
+        if error is None:
+            fields, error = validate_row(row, default_tz, default_user, name_of)
+            yield number, fields, error
+        else:
+            yield number, None, error
+
+
+# Writing
+
+
+def _export_fields(row):
+    when = interview_datetime(row)
+    return {
+        "id": row["id"],
+        "user_id": row["user_id"],
+        "user_name": row["user_name"],
+        "date": when.strftime("%Y-%m-%d"),
+        "time": when.strftime("%H:%M") if row["has_time"] else None,
+        "type": row["interview_type"],
+        "description": row["description"],
+        "timezone": row["timezone"],
+    }
+
+
+def _csv_line(values):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue()
+
+
+def _escape(text):
+    return (
+        str(text or "")
+        .replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\n", "\\n")
+    )
+
+
+def _fold(line):
+    """Fold a content line to 75 octets per line, as RFC 5545 asks"""
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line + "\r\n"
+
+    parts, start, limit = [], 0, 75
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        # Don't split a multi-byte character
+        while end < len(encoded) and (encoded[end] & 0xC0) == 0x80:
+            end -= 1
+        parts.append(encoded[start:end].decode())
+        start, limit = end, 74  # Continuation lines start with a space
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def ical_header(name="Interviews"):
+    """Start of a VCALENDAR"""
+    return "".join(
+        _fold(line)
+        for line in (
+            "BEGIN:VCALENDAR",
+            "VERSION:2.0",
+            f"PRODID:{ICAL_PRODID}",
+            "CALSCALE:GREGORIAN",
+            f"X-WR-CALNAME:{_escape(name)}",
+        )
+    )
+
+
+def ical_event(row, stamp):
+    """One interview as a VEVENT
+
+    Args:
+        row: Interview row
+        stamp: UTC datetime the calendar was generated at (DTSTAMP)
+    """
+    when = interview_datetime(row)
+    if row["has_time"]:
+        start = "DTSTART:" + when.astimezone(pytz.utc).strftime("%Y%m%dT%H%M%SZ")
+    else:
+        start = "DTSTART;VALUE=DATE:" + when.strftime("%Y%m%d")
+
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:interview-{row['id']}@pweasehiredme",
+        "DTSTAMP:" + stamp.strftime("%Y%m%dT%H%M%SZ"),
+        start,
+    ]
+    if row["has_time"]:
+        lines.append(f"DURATION:{EVENT_DURATION}")
+    lines += [
+        f"SUMMARY:{_escape(row['interview_type'])} interview ({_escape(row['user_name'])})",
+        f"DESCRIPTION:{_escape(row['description'])}",
+        f"X-INTERVIEW-TYPE:{_escape(row['interview_type'])}",
+        f"X-INTERVIEW-TIMEZONE:{row['timezone']}",
+        f"X-DISCORD-USER-ID:{row['user_id']}",
+        f"X-DISCORD-USER-NAME:{_escape(row['user_name'])}",
+        "END:VEVENT",
+    ]
+    return "".join(_fold(line) for line in lines)
+
+
+def ical_footer():
+    """End of a VCALENDAR"""
+    return "END:VCALENDAR\r\n"
+
+
+async def iter_export(pages, fmt):
+    """Encode interviews for export, one chunk of text at a time
+
+    Args:
+        pages: Async iterable of lists of interview rows, like
+            InterviewManager.iter_interviews()
+        fmt: "csv", "jsonl" or "ics"
+    """
+    if fmt == "csv":
+        yield _csv_line(FIELDS)
+    elif fmt == "ics":
+        yield ical_header()
+        stamp = datetime.now(pytz.utc)
+
+    async for page in pages:
+        if fmt == "csv":
+            yield "".join(_csv_line(_export_fields(row).values()) for row in page)
+        elif fmt == "jsonl":
+            yield "".join(
+                json.dumps(_export_fields(row), ensure_ascii=False) + "\n"
+                for row in page
+            )
+        else:
+            yield "".join(ical_event(row, stamp) for row in page)
+
+    if fmt == "ics":
+        yield ical_footer()
@@ -3,18 +3,37 @@ Entry point for pweaseHiredMe Discord bot.
 Just import and run the bot - super simple! ^_^
 """
 
-import asyncio
-from bot.db import init_db
-from bot.core import run
+import time
 
-# Initialize the database
-init_db()
+# Startup timings are measured from here
+STARTED = time.perf_counter()
+
+import asyncio  # noqa: E402
+import logging  # noqa: E402
+import os  # noqa: E402
+from dotenv import load_dotenv  # noqa: E402
+
+# Settings are read from the environment when the bot modules are imported
+load_dotenv()
+
+from bot.log import setup_logging, stop_logging  # noqa: E402
+from bot.core import run  # noqa: E402
+from bot.supervisor import WORKERS, supervise, worker_command  # noqa: E402
+
+log = logging.getLogger("bot")
 
 if __name__ == "__main__":
-    # Run the bot using asyncio
+    setup_logging()
+    # Run the bot using asyncio, the database is set up as it connects
     try:
-        asyncio.run(run())
+        if WORKERS > 1 and "WORKER_ID" not in os.environ:
+            # Split the shards between several processes and watch over them
+            asyncio.run(supervise(worker_command(__file__)))
+        else:
+            asyncio.run(run(started=STARTED))
     except KeyboardInterrupt:
-        print("Bot was stopped by user (Ctrl+C)")
-    except Exception as e:
-        print(f"Error: {e}")
+        log.info("Bot was stopped by user (Ctrl+C)")
+    except Exception:
+        log.exception("Bot crashed")
+    finally:
+        stop_logging()
@@ -0,0 +1,72 @@
+"""
+Shared fixtures.
+`storage` runs a test once per backend: SQLite on a temporary file, and
+PostgreSQL in a database of its own on the server DATABASE_URL points at.
+The PostgreSQL run is skipped when DATABASE_URL is unset (see the README).
+"""
+
+import contextlib
+import os
+import uuid
+from urllib.parse import urlsplit, urlunsplit
+import pytest
+from bot.db import manager
+from bot.db.postgres import PostgresStorage
+from bot.db.sqlite import SQLiteStorage
+
+DATABASE_URL = os.getenv("DATABASE_URL", "")
+
+
+@contextlib.asynccontextmanager
+async def postgres_database():
+    """URL of a new, empty PostgreSQL database, dropped afterwards"""
+    if not DATABASE_URL.startswith(("postgres://", "postgresql://")):
+        pytest.skip("DATABASE_URL doesn't point at a PostgreSQL server")
+    import asyncpg
+
+    name = f"bot_test_{uuid.uuid4().hex[:12]}"
+    admin = await asyncpg.connect(DATABASE_URL)
+    try:
+        await admin.execute(f'CREATE DATABASE "{name}"')
+        try:
+            yield urlunsplit(urlsplit(DATABASE_URL)._replace(path=f"/{name}"))
+        finally:
+            await admin.execute(f'DROP DATABASE "{name}" WITH (FORCE)')
+    finally:
+        await admin.close()
+
+
+@contextlib.asynccontextmanager
+async def open_postgres():
+    """An open PostgresStorage on a new, empty database"""
+    async with postgres_database() as url:
+        backend = PostgresStorage(url, min_size=1, max_size=4)
+        await backend.open()
+        try:
+            yield backend
+        finally:
+            await backend.close()
+
+
+@pytest.fixture
+async def postgres():
+    """An open PostgresStorage, for what only PostgreSQL does"""
+    async with open_postgres() as backend:
+        yield backend
+
+
+@pytest.fixture(params=["sqlite", "postgres"])
+async def storage(request, tmp_path, monkeypatch):
+    """An open backend on an empty database, once per backend"""
+    if request.param == "sqlite":
+        monkeypatch.setattr(manager, "DB_FILE", str(tmp_path / "test.db"))
+        backend = SQLiteStorage()
+        await backend.open()
+        try:
+            yield backend
+        finally:
+            await backend.close()
+        return
+
+    async with open_postgres() as backend:
+        yield backend
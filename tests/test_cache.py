@@ -0,0 +1,124 @@
+"""
+Query cache tests.
+"""
+
+import pytest
+from bot.db import guilds
+from bot.db.cache import QueryCache, query_cache
+from bot.db.guilds import GuildConfigManager
+from bot.db.models import InterviewManager
+from bot.db.storage import set_storage
+from bot.utils.dates import local_now, to_timestamp
+from .test_storage_contract import ALICE, GUILD, interview
+
+
+def test_set_refuses_results_fetched_before_an_invalidation():
+    cache = QueryCache()
+    version = cache.version
+    cache.invalidate("a")
+
+    cache.set("key", 1, "a", version)
+    assert cache.get("key") == (False, None)
+    cache.set("key", 1, "b", version)
+    assert cache.get("key") == (True, 1)
+
+
+def test_invalidate_drops_tagged_entries():
+    cache = QueryCache()
+    cache.set("a1", 1, "a", cache.version)
+    cache.set("b1", 2, "b", cache.version)
+
+    cache.invalidate("a")
+    assert cache.get("a1") == (False, None)
+    assert cache.get("b1") == (True, 2)
+
+
+def test_invalidations_remembered_are_bounded():
+    cache = QueryCache(maxsize=4, max_tags=3)
+    for tag in range(1000):
+        cache.invalidate(tag)
+    assert len(cache._invalidated_at) == 3
+
+    # Re-invalidating a tag makes it the newest
+    cache.invalidate(997)
+    cache.invalidate(1000)
+    assert list(cache._invalidated_at) == [999, 997, 1000]
+
+
+def test_forgotten_invalidations_still_count():
+    cache = QueryCache(maxsize=4, max_tags=2)
+    before = cache.version
+    cache.invalidate("a")
+    seen = cache.tag_version("a")
+    cache.invalidate("b", "c")
+
+    # "a" is forgotten, but its version never goes back and a fetch from
+    # before it is still refused
+    assert "a" not in cache._invalidated_at
+    assert cache.tag_version("a") >= seen
+    cache.set("key", 1, "a", before)
+    assert cache.get("key") == (False, None)
+
+    # Fetches after it are fine
+    cache.set("key", 1, "a", cache.version)
+    assert cache.get("key") == (True, 1)
+
+
+def test_tag_versions_only_go_up():
+    cache = QueryCache(maxsize=4, max_tags=5)
+    versions = {}
+    for step in range(200):
+        cache.invalidate(step % 7, (step * 3) % 11)
+        if step % 50 == 0:
+            cache.clear()
+        for tag in range(11):
+            version = cache.tag_version(tag)
+            assert version >= versions.get(tag, 0)
+            versions[tag] = version
+
+
+@pytest.fixture
+async def manager(storage):
+    set_storage(storage)
+    query_cache.clear()
+    yield InterviewManager
+    set_storage(None)
+    guilds._configs.clear()
+    query_cache.clear()
+
+
+# A day apart wherever you are
+GUILD_TIMEZONE = "Pacific/Kiritimati"  # UTC+14
+OLD_TIMEZONE = "Pacific/Pago_Pago"  # UTC-11
+
+
+async def test_writes_invalidate_the_guilds_days(manager, storage):
+    # Scheduled today, back when the guild used another timezone
+    await GuildConfigManager.update(GUILD, timezone=GUILD_TIMEZONE)
+    today = local_now(GUILD_TIMEZONE).date()
+    row = await storage.add_interview(
+        interview(
+            scheduled_at=to_timestamp(today, "12:00", GUILD_TIMEZONE),
+            timezone=OLD_TIMEZONE,
+        )
+    )
+    assert len(await manager.get_today_interviews(GUILD)) == 1
+
+    await manager.delete_interview(GUILD, row["id"], ALICE)
+    assert await manager.get_today_interviews(GUILD) == []
+
+
+async def test_timezone_changes_move_the_guilds_days(manager, storage):
+    today = local_now("UTC").date()
+    if local_now("Etc/GMT-1").date() != today:
+        pytest.skip("UTC and UTC+1 are on different dates right now")
+
+    # Late on today's date in UTC, already tomorrow in UTC+1
+    await storage.add_interview(
+        interview(scheduled_at=to_timestamp(today, "23:30", "UTC"), timezone="UTC")
+    )
+    await GuildConfigManager.update(GUILD, timezone="UTC")
+    assert len(await manager.get_today_interviews(GUILD)) == 1
+
+    await GuildConfigManager.update(GUILD, timezone="Etc/GMT-1")
+    assert await manager.get_today_interviews(GUILD) == []
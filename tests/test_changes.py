@@ -0,0 +1,146 @@
+"""
+Change tailer tests.
+Writes go straight to the storage backend, the way another worker's writes
+reach this one: without invalidating anything here.
+"""
+
+import asyncio
+import pytest
+from bot.db import events, guilds
+from bot.db.cache import day_tag, guild_tag, query_cache, user_tag
+from bot.db.changes import ChangeTailer
+from bot.db.guilds import GuildConfigManager
+from bot.db.index import InterviewIndex
+from bot.db.storage import set_storage
+from bot.utils.dates import local_now
+from .test_storage_contract import ALICE, BOB, GUILD, interview
+
+
+@pytest.fixture
+async def tailer(storage):
+    set_storage(storage)
+    await GuildConfigManager.load_all()
+    query_cache.clear()
+    tailer = ChangeTailer(interval=3600)
+    await tailer.start()
+    try:
+        yield tailer
+    finally:
+        await tailer.stop()
+        set_storage(None)
+        guilds._configs.clear()
+        query_cache.clear()
+
+
+@pytest.fixture
+def published():
+    """[(event, argument)] published while the test runs"""
+    seen = []
+    names = (
+        events.INTERVIEW_UPDATED,
+        events.INTERVIEW_DELETED,
+        events.INTERVIEWS_RELOADED,
+        events.GUILD_CONFIG_UPDATED,
+    )
+    callbacks = {
+        name: (lambda *args, name=name: seen.append((name, *args))) for name in names
+    }
+    for name, callback in callbacks.items():
+        events.subscribe(name, callback)
+    yield seen
+    for name, callback in callbacks.items():
+        events.unsubscribe(name, callback)
+
+
+async def delivered():
+    """Let events published with call_soon_threadsafe run"""
+    await asyncio.sleep(0)
+
+
+def cache_entry(tag):
+    key = ("query", tag)
+    query_cache.set(key, "cached", tag, query_cache.version)
+    return key
+
+
+async def test_other_workers_writes_invalidate_and_publish(tailer, storage, published):
+    today = local_now(GuildConfigManager.timezone(GUILD)).date()
+    keys = [
+        cache_entry(tag)
+        for tag in (user_tag(GUILD, ALICE), guild_tag(GUILD), day_tag(GUILD, today))
+    ]
+    untouched = cache_entry(user_tag(GUILD, BOB))
+
+    row = await storage.add_interview(interview())
+    gone = await storage.add_interview(interview())
+    await storage.delete_interview(GUILD, gone["id"], ALICE)
+    await tailer.poll()
+    await delivered()
+
+    assert [query_cache.get(key) for key in keys] == [(False, None)] * 3
+    assert query_cache.get(untouched) == (True, "cached")
+    assert published == [
+        (events.INTERVIEW_UPDATED, row),
+        (
+            events.INTERVIEW_DELETED,
+            {"id": gone["id"], "guild_id": GUILD, "user_id": ALICE},
+        ),
+    ]
+
+    # Applied once
+    published.clear()
+    await tailer.poll()
+    await delivered()
+    assert published == []
+
+
+async def test_other_workers_settings_are_reloaded(tailer, storage, published):
+    config = {
+        "guild_id": GUILD,
+        "channel_id": 5,
+        "timezone": "Asia/Tokyo",
+        "reminder_hour": 7,
+    }
+    await storage.save_guild_config(config)
+    await tailer.poll()
+    await delivered()
+
+    assert GuildConfigManager.get(GUILD) == config
+    assert published == [(events.GUILD_CONFIG_UPDATED, config)]
+
+
+async def test_reloads_everything_after_being_given_up_on(tailer, storage, published):
+    key = cache_entry(user_tag(GUILD, BOB))
+    await asyncio.sleep(0.2)
+    await storage.prune_changes(0.1)
+
+    await storage.add_interview(interview())
+    await tailer.poll()
+    await delivered()
+
+    assert query_cache.get(key) == (False, None)
+    assert (events.INTERVIEWS_RELOADED,) in published
+
+
+async def test_other_workers_writes_reach_loaded_indexes(tailer, storage):
+    index = InterviewIndex()
+    index.start()
+    try:
+        kept = await storage.add_interview(interview(description="kept"))
+        gone = await storage.add_interview(interview(description="gone"))
+        await index.user(GUILD, ALICE)
+
+        await storage.update_interview(
+            GUILD, kept["id"], ALICE, {"description": "renamed"}
+        )
+        await storage.delete_interview(GUILD, gone["id"], ALICE)
+        added = await storage.add_interview(interview(description="added"))
+        await tailer.poll()
+        await delivered()
+
+        found = [i for i, _ in await index.search(GUILD, ALICE)]
+        renamed = [i for i, _ in await index.search(GUILD, ALICE, "renamed")]
+        assert found == [kept["id"], added["id"]]
+        assert renamed == [kept["id"]]
+    finally:
+        index.stop()
@@ -0,0 +1,145 @@
+"""
+Message dispatcher tests.
+"""
+
+import asyncio
+from types import SimpleNamespace
+import aiohttp
+import discord
+import pytest
+from bot import dispatch
+from bot.dispatch import MessageDispatcher
+
+
+def http_error(error, status):
+    return error(SimpleNamespace(status=status, reason="reason"), "message")
+
+
+class FakeChannel:
+    """Raises `errors` in turn, then accepts messages"""
+
+    id = 1
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.sent = []
+
+    async def send(self, content=None, embed=None):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.sent.append(content)
+
+
+def resolved(future):
+    """Fail instead of hanging if a message is never settled"""
+    return asyncio.wait_for(future, 5)
+
+
+class FakeBot:
+    def __init__(self):
+        self.channel = None
+
+    def get_channel(self, channel_id):
+        return self.channel
+
+
+@pytest.fixture
+async def dispatcher(monkeypatch):
+    monkeypatch.setattr(dispatch, "BASE_BACKOFF", 0)
+    dispatcher = MessageDispatcher(FakeBot())
+    dispatcher.start()
+    yield dispatcher
+    await dispatcher.stop()
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        http_error(discord.DiscordServerError, 503),
+        aiohttp.ClientConnectionError(),
+        TimeoutError(),
+    ],
+)
+async def test_transient_errors_are_retried(dispatcher, error):
+    channel = FakeChannel(error, error)
+    dispatcher.bot.channel = channel
+
+    await dispatcher.send(channel.id, "hello")
+
+    assert channel.sent == ["hello"]
+    assert (dispatcher.sent, dispatcher.retries, dispatcher.failed) == (1, 2, 0)
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        http_error(discord.Forbidden, 403),
+        http_error(discord.NotFound, 404),
+        # discord.py already waited out and retried the rate limit
+        http_error(discord.HTTPException, 429),
+    ],
+)
+async def test_other_errors_fail_at_once(dispatcher, error):
+    channel = FakeChannel(error)
+    dispatcher.bot.channel = channel
+
+    with pytest.raises(type(error)):
+        await dispatcher.send(channel.id, "hello")
+
+    assert channel.sent == []
+    assert (dispatcher.sent, dispatcher.retries, dispatcher.failed) == (0, 0, 1)
+
+
+async def test_gives_up_after_max_retries(dispatcher):
+    error = http_error(discord.DiscordServerError, 500)
+    channel = FakeChannel(*[error] * (dispatch.MAX_RETRIES + 1))
+    dispatcher.bot.channel = channel
+
+    with pytest.raises(discord.DiscordServerError):
+        await dispatcher.send(channel.id, "hello")
+
+    assert (dispatcher.retries, dispatcher.failed) == (dispatch.MAX_RETRIES, 1)
+
+
+async def test_unexpected_errors_fail_the_message_not_the_channel(dispatcher):
+    channel = FakeChannel(TypeError("unexpected"))
+    dispatcher.bot.channel = channel
+
+    with pytest.raises(TypeError):
+        await resolved(dispatcher.send(channel.id, "hello"))
+    await resolved(dispatcher.send(channel.id, "again"))
+
+    assert channel.sent == ["again"]
+    assert (dispatcher.sent, dispatcher.retries, dispatcher.failed) == (1, 0, 1)
+
+
+async def test_broken_channel_fails_everything_queued(dispatcher):
+    # Not a messageable channel at all
+    dispatcher.bot.channel = object()
+
+    with pytest.raises(AttributeError):
+        await resolved(dispatcher.send(1, "hello"))
+
+    channel = FakeChannel()
+    dispatcher.bot.channel = channel
+    await resolved(dispatcher.send(channel.id, "again"))
+    assert channel.sent == ["again"]
+
+
+async def test_failing_lookup_fails_everything_queued(dispatcher):
+    def broken(channel_id):
+        raise RuntimeError("lookup failed")
+
+    dispatcher.bot.get_channel = broken
+    first = dispatcher.send(1, "hello")
+    second = dispatcher.send(1, embed=discord.Embed(title="news"))
+
+    results = await resolved(asyncio.gather(first, second, return_exceptions=True))
+    assert [type(result) for result in results] == [RuntimeError, RuntimeError]
+    assert dispatcher.queue_depth() == 0
+
+    del dispatcher.bot.get_channel
+    channel = FakeChannel()
+    dispatcher.bot.channel = channel
+    await resolved(dispatcher.send(channel.id, "again"))
+    assert channel.sent == ["again"]
@@ -0,0 +1,144 @@
+"""
+Bulk import tests.
+"""
+
+import io
+import threading
+from contextlib import asynccontextmanager
+from datetime import date
+from types import SimpleNamespace
+import pytest
+from bot.cogs import admin
+from bot.db import guilds
+from bot.db.cache import query_cache
+from bot.db.models import InterviewManager
+from bot.db.storage import set_storage
+from bot.utils.transfer import parse_interviews
+from .test_storage_contract import ALICE, GUILD
+
+
+@pytest.fixture
+def manager(storage):
+    set_storage(storage)
+    yield InterviewManager
+    set_storage(None)
+    guilds._configs.clear()
+    query_cache.clear()
+
+
+def rows(count, threads):
+    """`count` interviews, recording the thread each one is parsed on"""
+    for i in range(count):
+        threads.add(threading.current_thread())
+        yield {
+            "user_id": ALICE,
+            "user_name": "alice",
+            "interview_date": date(2030, 1, 1 + i % 28),
+            "interview_time": "14:30",
+            "interview_type": "Technical",
+            "description": f"Round {i}",
+        }
+
+
+async def test_parses_off_the_event_loop_in_chunks(manager, storage, monkeypatch):
+    inserts = []
+    add_interviews = storage.add_interviews
+
+    async def counted(chunk):
+        inserts.append(len(chunk))
+        return await add_interviews(chunk)
+
+    monkeypatch.setattr(storage, "add_interviews", counted)
+    threads = set()
+
+    assert await manager.import_interviews(GUILD, rows(25, threads), 10) == 25
+    assert inserts == [10, 10, 5]
+    assert threading.current_thread() not in threads
+
+    stored = await storage.get_user_interviews(GUILD, ALICE)
+    assert sorted(row["description"] for row in stored) == sorted(
+        f"Round {i}" for i in range(25)
+    )
+
+
+async def test_parse_errors_reach_the_caller(manager):
+    lines = io.TextIOWrapper(io.BytesIO(b"user_id,date\n\xff\n"), encoding="utf-8")
+    parsed = parse_interviews(lines, "csv", "UTC", (ALICE, "alice"))
+
+    with pytest.raises(UnicodeDecodeError):
+        await manager.import_interviews(GUILD, (fields for _, fields, _ in parsed))
+
+
+class FakeContext:
+    """Just enough of a command context for !import"""
+
+    def __init__(self, filename):
+        self.message = SimpleNamespace(
+            attachments=[SimpleNamespace(filename=filename, url="url")]
+        )
+        self.guild = SimpleNamespace(id=GUILD, get_member=lambda user_id: None)
+        self.author = SimpleNamespace(id=ALICE, display_name="alice")
+        self.replies = []
+
+    async def send(self, content):
+        self.replies.append(content)
+
+    @asynccontextmanager
+    async def typing(self):
+        yield
+
+
+async def run_import(monkeypatch, filename, data):
+    async def download(url, fp):
+        fp.write(data)
+
+    monkeypatch.setattr(admin, "_download", download)
+    ctx = FakeContext(filename)
+    await admin.AdminCog.import_file.callback(admin.AdminCog(None), ctx)
+    return ctx.replies
+
+
+CSV_HEADER = b"date,time,type,description\n"
+
+
+async def test_import_reports_skipped_rows(manager, storage, monkeypatch):
+    data = CSV_HEADER + b"2030-01-01,14:30,Technical,First\n"
+    data += b"someday,14:30,Technical,Bad\n2030-01-02,,HR,Second\n"
+
+    replies = await run_import(monkeypatch, "interviews.csv", data)
+
+    assert replies == [
+        "✅ Imported 2 interview(s)!\n"
+        "⚠️ Skipped 1 invalid row(s):\n"
+        "Line 3: bad date `someday`, use YYYY-MM-DD"
+    ]
+    stored = await storage.get_user_interviews(GUILD, ALICE)
+    assert sorted(row["description"] for row in stored) == ["First", "Second"]
+
+
+@pytest.mark.parametrize(
+    "filename, tail, reply",
+    [
+        ("interviews.csv", b"2030-01-03,9:00,HR,\xff\n", "isn't UTF-8 text"),
+        # Over csv's field size limit
+        ("interviews.csv", b"2030-01-03,9:00,HR," + b"x" * 200_000, "Could not read"),
+        ("interviews.ics", b"DESCRIPTION:\xff\n", "isn't UTF-8 text"),
+    ],
+)
+async def test_unreadable_file_imports_nothing(
+    manager, storage, monkeypatch, filename, tail, reply
+):
+    if filename.endswith(".csv"):
+        rows = b"".join(b"2030-01-01,14:30,Technical,Round %d\n" % i for i in range(50))
+        data = CSV_HEADER + rows + tail
+    else:
+        event = (
+            b"BEGIN:VEVENT\nDTSTART:20300101T143000\nSUMMARY:Technical\nEND:VEVENT\n"
+        )
+        data = b"BEGIN:VCALENDAR\n" + event * 50 + tail + b"END:VCALENDAR\n"
+
+    replies = await run_import(monkeypatch, filename, data)
+
+    assert len(replies) == 1
+    assert reply in replies[0] and "Nothing was imported" in replies[0]
+    assert await storage.get_user_interviews(GUILD, ALICE) == []
@@ -0,0 +1,302 @@
+"""
+Command argument parser tests.
+"""
+
+from datetime import date, datetime, timedelta, timezone
+import pytest
+from hypothesis import given, strategies as st
+from bot.utils.dates import from_timestamp, to_timestamp
+from bot.utils.parser import (
+    ParseError,
+    Schedule,
+    parse_date,
+    parse_schedule,
+    parse_time,
+    parse_updates,
+    tokenize,
+)
+
+# Tokenizing
+
+
+def quote(value):
+    """How a user would type `value` so it reads back as one token"""
+    if value and not any(c.isspace() or c in '"“”\\=' for c in value):
+        return value
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def render(pairs):
+    return " ".join(
+        f"{key}={quote(value)}" if key else quote(value) for key, value in pairs
+    )
+
+
+keys = st.none() | st.from_regex(r"[A-Za-z_][A-Za-z0-9_]{0,8}", fullmatch=True)
+values = st.text(max_size=20)
+
+
+@given(st.lists(st.tuples(keys, values), max_size=8))
+def test_tokenize_round_trip(pairs):
+    tokens = tokenize(render(pairs))
+
+    assert [(token.key, token.value) for token in tokens] == pairs
+    # Raw text reads back as the same tokens
+    assert tokenize(" ".join(token.raw for token in tokens)) == tokens
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("", []),
+        ("  a   b ", [(None, "a"), (None, "b")]),
+        ('"a \\"b\\" \\\\c"', [(None, 'a "b" \\c')]),
+        ("“smart quotes”", [(None, "smart quotes")]),
+        ('desc="two words" x=1', [("desc", "two words"), ("x", "1")]),
+        ("key=", [("key", "")]),
+        ("a=b=c", [("a", "b=c")]),
+        ('say"hi"', [(None, 'say"hi"')]),
+    ],
+)
+def test_tokenize(text, expected):
+    assert [(token.key, token.value) for token in tokenize(text)] == expected
+
+
+@pytest.mark.parametrize("text", ['"open', 'a "open', "“open", 'desc="open'])
+def test_tokenize_unbalanced_quotes(text):
+    with pytest.raises(ParseError, match="Unbalanced quotes"):
+        tokenize(text)
+
+
+# Times
+
+
+@given(st.integers(0, 23), st.integers(0, 59))
+def test_parse_time_12_and_24_hour(hour, minute):
+    expected = f"{hour:02d}:{minute:02d}"
+    meridiem = "am" if hour < 12 else "pm"
+
+    assert parse_time(f"{hour}:{minute:02d}") == expected
+    assert parse_time(f"{(hour - 1) % 12 + 1}:{minute:02d}{meridiem}") == expected
+    assert (
+        parse_time(f"{(hour - 1) % 12 + 1}:{minute:02d} {meridiem.upper()}") == expected
+    )
+
+
+@pytest.mark.parametrize("text", ["14", "Technical", "14h30", "1430"])
+def test_parse_time_not_a_time(text):
+    assert parse_time(text) is None
+
+
+@pytest.mark.parametrize("text", ["24:00", "12:60", "0am", "13pm"])
+def test_parse_time_invalid(text):
+    with pytest.raises(ParseError, match="Invalid time"):
+        parse_time(text)
+
+
+# Relative dates
+
+# (today, phrase, date it means)
+RELATIVE_DATES = [
+    # Mid-month, a Wednesday
+    (date(2024, 5, 15), "today", date(2024, 5, 15)),
+    (date(2024, 5, 15), "Tomorrow", date(2024, 5, 16)),
+    (date(2024, 5, 15), "wed", date(2024, 5, 15)),
+    (date(2024, 5, 15), "next wed", date(2024, 5, 22)),
+    (date(2024, 5, 15), "thurs", date(2024, 5, 16)),
+    (date(2024, 5, 15), "in 1 day", date(2024, 5, 16)),
+    # Across the end of a month
+    (date(2024, 1, 31), "tomorrow", date(2024, 2, 1)),
+    (date(2024, 1, 31), "next monday", date(2024, 2, 5)),
+    (date(2024, 1, 31), "in 3 days", date(2024, 2, 3)),
+    (date(2024, 1, 31), "next week", date(2024, 2, 7)),
+    (date(2024, 4, 30), "in 2 weeks", date(2024, 5, 14)),
+    # Across the end of February, leap year or not
+    (date(2024, 2, 28), "tomorrow", date(2024, 2, 29)),
+    (date(2024, 2, 28), "in 2 days", date(2024, 3, 1)),
+    (date(2023, 2, 28), "tomorrow", date(2023, 3, 1)),
+    # Across the end of a year, a Saturday
+    (date(2023, 12, 30), "tomorrow", date(2023, 12, 31)),
+    (date(2023, 12, 30), "next monday", date(2024, 1, 1)),
+    (date(2023, 12, 30), "sat", date(2023, 12, 30)),
+    (date(2023, 12, 30), "next saturday", date(2024, 1, 6)),
+    (date(2023, 12, 30), "in 3 days", date(2024, 1, 2)),
+    (date(2023, 12, 30), "IN 1 WEEK", date(2024, 1, 6)),
+    (date(2024, 12, 31), "next week", date(2025, 1, 7)),
+    # Absolute dates don't depend on today
+    (date(2024, 5, 15), "2023-01-02", date(2023, 1, 2)),
+]
+
+
+@pytest.mark.parametrize("today, phrase, expected", RELATIVE_DATES)
+def test_relative_dates(today, phrase, expected):
+    words = phrase.split()
+    assert parse_date(words + ["14:30"], today) == (expected, len(words))
+
+
+@pytest.mark.parametrize(
+    "phrase", ["someday", "frisbee", "next", "in 3 months", "2024-02-30", "14:30"]
+)
+def test_not_a_date(phrase):
+    with pytest.raises(ParseError, match="Invalid date"):
+        parse_date(phrase.split(), date(2024, 5, 15))
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+# (guild timezone, when the command is sent, phrase, interview at 14:30
+# local time on the date the phrase means)
+DST_DATES = [
+    # Paris springs forward at 02:00 on 2024-03-31, local day ahead of UTC
+    ("Europe/Paris", utc(2024, 3, 30, 23, 30), "today", utc(2024, 3, 31, 12, 30)),
+    ("Europe/Paris", utc(2024, 3, 30, 12), "tomorrow", utc(2024, 3, 31, 12, 30)),
+    ("Europe/Paris", utc(2024, 3, 30, 12), "in 2 days", utc(2024, 4, 1, 12, 30)),
+    ("Europe/Paris", utc(2024, 3, 25, 12), "next sun", utc(2024, 3, 31, 12, 30)),
+    # And falls back at 03:00 on 2024-10-27
+    ("Europe/Paris", utc(2024, 10, 26, 22, 30), "today", utc(2024, 10, 27, 13, 30)),
+    ("Europe/Paris", utc(2024, 10, 26, 12), "tomorrow", utc(2024, 10, 27, 13, 30)),
+    ("Europe/Paris", utc(2024, 10, 20, 12), "in 1 week", utc(2024, 10, 27, 13, 30)),
+    # New York springs forward on 2024-03-10, local day behind UTC
+    ("America/New_York", utc(2024, 3, 10, 3), "today", utc(2024, 3, 9, 19, 30)),
+    ("America/New_York", utc(2024, 3, 10, 3), "tomorrow", utc(2024, 3, 10, 18, 30)),
+    # New year comes earlier in Tokyo than in UTC
+    ("Asia/Tokyo", utc(2024, 12, 31, 15), "today", utc(2025, 1, 1, 5, 30)),
+    ("Asia/Tokyo", utc(2024, 12, 31, 15), "in 3 days", utc(2025, 1, 4, 5, 30)),
+]
+
+
+@pytest.mark.parametrize("tz_name, sent_at, phrase, expected", DST_DATES)
+def test_relative_dates_across_dst(tz_name, sent_at, phrase, expected):
+    # Relative dates count from the guild's day, like guild_today()
+    today = from_timestamp(sent_at.timestamp(), tz_name).date()
+    entry = parse_schedule(f"{phrase} 14:30 Technical", today)
+
+    scheduled_at = to_timestamp(entry.interview_date, entry.interview_time, tz_name)
+    assert scheduled_at == expected.timestamp()
+    assert from_timestamp(scheduled_at, tz_name).strftime("%H:%M") == "14:30"
+
+
+def test_relative_dates_are_days_not_hours():
+    # The day Paris springs forward is 23 hours long, "tomorrow" is still
+    # the same time the next day
+    today = date(2024, 3, 30)
+    entry = parse_schedule("tomorrow 9:00 Technical", today)
+
+    length = to_timestamp(entry.interview_date, "09:00") - to_timestamp(today, "09:00")
+    assert length == timedelta(hours=23).total_seconds()
+
+
+# !schedule
+
+TODAY = date(2024, 5, 15)
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        (
+            "2024-06-01 14:30 Technical",
+            Schedule(date(2024, 6, 1), "14:30", "Technical", ""),
+        ),
+        (
+            "2024-06-01 Technical System design round",
+            Schedule(date(2024, 6, 1), None, "Technical", "System design round"),
+        ),
+        (
+            'tomorrow 2pm "Phone screen" with "Acme Corp"',
+            Schedule(date(2024, 5, 16), "14:00", "Phone screen", "with Acme Corp"),
+        ),
+        (
+            "next fri 9:05am HR",
+            Schedule(date(2024, 5, 17), "09:05", "HR", ""),
+        ),
+        (
+            "in 3 days Onsite",
+            Schedule(date(2024, 5, 18), None, "Onsite", ""),
+        ),
+        # A time without a type
+        (
+            "2024-06-01 14:30",
+            Schedule(date(2024, 6, 1), "14:30", "Interview", ""),
+        ),
+        # Just an hour isn't a time
+        (
+            "2024-06-01 14 Technical",
+            Schedule(date(2024, 6, 1), None, "14", "Technical"),
+        ),
+        # key=value means nothing here
+        (
+            "2024-06-01 Technical round=2",
+            Schedule(date(2024, 6, 1), None, "Technical", "round=2"),
+        ),
+    ],
+)
+def test_parse_schedule(text, expected):
+    assert parse_schedule(text, TODAY) == expected
+
+
+@pytest.mark.parametrize(
+    "text, error",
+    [
+        ("", "at least a date and a type"),
+        ("2024-06-01", "at least a date and a type"),
+        ("next fri", "at least a date and a type"),
+        ("someday Technical", "Invalid date"),
+        ("2024-13-01 Technical", "Invalid date"),
+        ("2024-06-01 25:00 Technical", "Invalid time"),
+        ("2024-06-01 13pm Technical", "Invalid time"),
+        ('tomorrow "Phone screen', "Unbalanced quotes"),
+    ],
+)
+def test_parse_schedule_errors(text, error):
+    with pytest.raises(ParseError, match=error):
+        parse_schedule(text, TODAY)
+
+
+# !update_interview
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        (
+            "time=14:30 type=HR",
+            {"interview_time": "14:30", "interview_type": "HR"},
+        ),
+        (
+            'desc="My description" date=tomorrow',
+            {"description": "My description", "interview_date": date(2024, 5, 16)},
+        ),
+        ('date="next fri"', {"interview_date": date(2024, 5, 17)}),
+        (
+            "DATE=2024-06-01 Time=2pm",
+            {"interview_date": date(2024, 6, 1), "interview_time": "14:00"},
+        ),
+        ("desc=“smart quotes”", {"description": "smart quotes"}),
+        ('desc=""', {"description": ""}),
+        # The first value of a key wins
+        ("time=2pm time=3pm", {"interview_time": "14:00"}),
+        # Unknown keys and loose words are ignored
+        ("foo=bar loose words", {}),
+        ("", {}),
+    ],
+)
+def test_parse_updates(text, expected):
+    assert parse_updates(text, TODAY) == expected
+
+
+@pytest.mark.parametrize(
+    "text, error",
+    [
+        ("date=someday", "Invalid date"),
+        ('date="next fri 14:30"', "Invalid date"),
+        ("time=25:00", "Invalid time"),
+        ("time=14", "Invalid time"),
+        ('desc="open', "Unbalanced quotes"),
+    ],
+)
+def test_parse_updates_errors(text, error):
+    with pytest.raises(ParseError, match=error):
+        parse_updates(text, TODAY)
@@ -0,0 +1,42 @@
+"""
+PostgreSQL-only behaviour: concurrent writers, which SQLite never has.
+"""
+
+from bot.db.postgres import _interview_values
+from .test_storage_contract import interview, read_all
+
+INSERT = """INSERT INTO interviews
+(guild_id, user_id, user_name, scheduled_at, has_time, timezone, interview_type, description, created_at)
+VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9) RETURNING id"""
+
+
+def values(**columns):
+    return _interview_values(interview(**columns))
+
+
+async def test_change_log_with_writers_committing_out_of_order(postgres):
+    start = await postgres.latest_change()
+
+    async with postgres.pool.acquire() as first, postgres.pool.acquire() as second:
+        # The first writer logs its change first but commits last
+        slow = first.transaction()
+        await slow.start()
+        early = await first.fetchval(INSERT, *values(description="early"))
+        late = await second.fetchval(INSERT, *values(description="late"))
+
+        # Nothing past the open transaction is final yet, so nothing is read
+        changes = await read_all(postgres, start)
+        assert changes.interviews == {}
+        await postgres.ack_changes("reader", changes.cursor)
+        await postgres.prune_changes(60)
+
+        await slow.commit()
+
+    changes = await read_all(postgres, changes.cursor)
+    assert set(changes.interviews) == {early, late}
+
+    # Pruning what was read keeps whatever comes next
+    await postgres.ack_changes("reader", changes.cursor)
+    await postgres.prune_changes(60)
+    row = await postgres.add_interview(interview())
+    assert list((await read_all(postgres, changes.cursor)).interviews) == [row["id"]]
@@ -0,0 +1,61 @@
+"""
+Query plans of the statements SQLiteStorage really runs, see
+benchmarks/query_plans.py.
+"""
+
+import inspect
+import pytest
+from benchmarks.query_plans import CALLS, capture_statements, explain, table_scans
+from bot.db import manager
+from bot.db.storage import Storage
+
+
+@pytest.fixture(scope="module")
+def plans(tmp_path_factory):
+    """{method: [(statement, plan)]} for every call in CALLS"""
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(
+            manager, "DB_FILE", str(tmp_path_factory.mktemp("plans") / "plans.db")
+        )
+        manager.init_db()
+        try:
+            conn = manager.get_db()
+            plans = {}
+            for method, statement in capture_statements(conn):
+                plans.setdefault(method, []).append(
+                    (statement, explain(conn, statement))
+                )
+            yield plans
+        finally:
+            manager.close_db()
+
+
+@pytest.mark.parametrize("method", sorted({method for method, _, _ in CALLS}))
+def test_no_table_scans(plans, method):
+    assert plans[method], f"{method} ran no statements"
+    for statement, plan in plans[method]:
+        assert not table_scans(plan), f"{statement}\n{plan}"
+
+
+@pytest.mark.parametrize(
+    "method, index",
+    [
+        ("get_upcoming_reminders", "idx_interviews_scheduled"),
+        ("get_future_interviews_page", "idx_interviews_guild_scheduled"),
+        ("get_user_history_page", "idx_interviews_archive_guild_user_scheduled"),
+        ("search_interviews", "interview_search VIRTUAL TABLE"),
+        ("read_changes", "change_log USING INTEGER PRIMARY KEY"),
+    ],
+)
+def test_uses_index(plans, method, index):
+    assert any(index in step for _, plan in plans[method] for step in plan)
+
+
+def test_every_storage_method_is_checked():
+    checked = {method for method, _, _ in CALLS}
+    methods = {
+        name
+        for name, value in vars(Storage).items()
+        if inspect.iscoroutinefunction(value) and name not in ("open", "close")
+    }
+    assert methods == checked
@@ -0,0 +1,486 @@
+"""
+Storage contract tests.
+Every method of the Storage protocol, run against each backend (see the
+`storage` fixture), so SQLite and PostgreSQL keep behaving the same.
+"""
+
+import asyncio
+import inspect
+from datetime import date, datetime
+import pytest
+from bot.db.storage import Changes, Storage, added_periods
+from bot.utils.dates import DEFAULT_TIMEZONE, to_timestamp
+
+GUILD = 1
+OTHER_GUILD = 2
+ALICE = 10
+BOB = 11
+
+# Far enough ahead that nothing is in the past, one day apart
+DAY = 24 * 60 * 60
+FUTURE = to_timestamp(date(2030, 1, 1), "14:30")
+
+
+def interview(**columns):
+    """Column values of a new interview, like InterviewManager builds them"""
+    values = {
+        "guild_id": GUILD,
+        "user_id": ALICE,
+        "user_name": "alice",
+        "scheduled_at": FUTURE,
+        "has_time": True,
+        "timezone": DEFAULT_TIMEZONE,
+        "interview_type": "Technical",
+        "description": "",
+        "created_at": datetime.now().isoformat(),
+    }
+    values.update(columns)
+    return values
+
+
+async def all_pages(fetch, cursor_of, limit=2):
+    """Every row of a keyset-paginated query, `limit` at a time"""
+    rows, after = [], None
+    while True:
+        page = await fetch(after=after, limit=limit)
+        rows += page
+        if len(page) < limit:
+            return rows
+        after = cursor_of(page[-1])
+
+
+def ids(rows):
+    return [row["id"] for row in rows]
+
+
+def protocol_methods():
+    return sorted(
+        name
+        for name, value in vars(Storage).items()
+        if inspect.iscoroutinefunction(value)
+    )
+
+
+@pytest.mark.parametrize("name", protocol_methods())
+async def test_implements_protocol(storage, name):
+    assert inspect.iscoroutinefunction(getattr(storage, name))
+
+
+# Interviews
+
+
+async def test_add_and_get_interview(storage):
+    row = await storage.add_interview(interview(description="System design"))
+
+    assert row["id"] > 0
+    assert row["description"] == "System design"
+    assert bool(row["has_time"])
+    assert await storage.get_interview(GUILD, row["id"]) == row
+    assert await storage.get_interview(OTHER_GUILD, row["id"]) is None
+    assert await storage.get_interview(GUILD, row["id"] + 1) is None
+
+
+async def test_add_interviews_counts_them(storage):
+    added = await storage.add_interviews(
+        [interview(), interview(), interview(user_id=BOB, user_name="bob")]
+    )
+
+    assert added == 3
+    assert await storage.get_user_total_count(GUILD, ALICE) == 2
+    assert await storage.get_user_total_count(GUILD, BOB) == 1
+    assert await storage.get_user_total_count(OTHER_GUILD, ALICE) == 0
+
+
+async def test_add_interview_batch_returns_rows_in_order(storage):
+    rows = await storage.add_interview_batch(
+        [interview(description=f"Round {i}") for i in range(5)]
+    )
+
+    assert [row["description"] for row in rows] == [f"Round {i}" for i in range(5)]
+    assert ids(rows) == sorted(ids(rows))
+    assert await storage.get_user_total_count(GUILD, ALICE) == 5
+
+
+async def test_update_interview(storage):
+    row = await storage.add_interview(interview(has_time=False))
+
+    before, after = await storage.update_interview(
+        GUILD, row["id"], ALICE, {"interview_type": "HR"}
+    )
+    assert before == row
+    assert after["interview_type"] == "HR"
+    assert after["scheduled_at"] == row["scheduled_at"]
+
+    # A new time keeps the date, and makes the interview timed
+    _, after = await storage.update_interview(
+        GUILD, row["id"], ALICE, {}, new_time="09:15"
+    )
+    assert after["scheduled_at"] == to_timestamp(date(2030, 1, 1), "09:15")
+    assert bool(after["has_time"])
+
+    # A new date keeps the time
+    _, after = await storage.update_interview(
+        GUILD, row["id"], ALICE, {}, new_date=date(2030, 2, 3)
+    )
+    assert after["scheduled_at"] == to_timestamp(date(2030, 2, 3), "09:15")
+
+
+async def test_update_interview_of_someone_else(storage):
+    row = await storage.add_interview(interview())
+
+    assert (
+        await storage.update_interview(GUILD, row["id"], BOB, {"description": "x"})
+        is None
+    )
+    assert (
+        await storage.update_interview(
+            OTHER_GUILD, row["id"], ALICE, {"description": "x"}
+        )
+        is None
+    )
+    assert await storage.update_interview(GUILD, row["id"], ALICE, {}) is None
+    assert await storage.get_interview(GUILD, row["id"]) == row
+
+
+async def test_delete_interview_uncounts_it(storage):
+    row = await storage.add_interview(interview())
+    week, month = added_periods(DEFAULT_TIMEZONE)
+
+    assert await storage.delete_interview(GUILD, row["id"], BOB) is None
+    assert await storage.delete_interview(GUILD, row["id"], ALICE) == row
+    assert await storage.delete_interview(GUILD, row["id"], ALICE) is None
+    assert await storage.get_interview(GUILD, row["id"]) is None
+    assert await storage.get_user_total_count(GUILD, ALICE) == 0
+    assert await storage.get_interview_counts(GUILD, "weekly", week, month) == []
+
+
+async def test_user_interviews(storage):
+    old = await storage.add_interview(interview(scheduled_at=FUTURE - 10 * DAY))
+    new = await storage.add_interview(interview())
+    await storage.add_interview(interview(user_id=BOB))
+    await storage.archive_interviews_chunk(GUILD, FUTURE - DAY, 10)
+
+    assert ids(await storage.get_user_interviews(GUILD, ALICE, FUTURE - DAY)) == [
+        new["id"]
+    ]
+    # Without `since`, the archived one is included
+    assert ids(await storage.get_user_interviews(GUILD, ALICE)) == [
+        old["id"],
+        new["id"],
+    ]
+
+
+async def test_interviews_between(storage):
+    rows = [
+        await storage.add_interview(interview(scheduled_at=FUTURE + i * DAY))
+        for i in range(4)
+    ]
+    await storage.add_interview(interview(guild_id=OTHER_GUILD))
+
+    between = await storage.get_interviews_between(
+        GUILD, FUTURE + DAY, FUTURE + 3 * DAY
+    )
+    assert ids(between) == ids(rows[1:3])
+    assert ids(await storage.get_interviews_between(GUILD, FUTURE + DAY)) == ids(
+        rows[1:]
+    )
+
+
+async def test_future_interviews_page(storage):
+    # Ties on scheduled_at are broken by ID
+    rows = [
+        await storage.add_interview(interview(scheduled_at=FUTURE + (i // 2) * DAY))
+        for i in range(7)
+    ]
+    await storage.add_interview(interview(scheduled_at=FUTURE - DAY))
+
+    paged = await all_pages(
+        lambda **page: storage.get_future_interviews_page(GUILD, FUTURE, **page),
+        lambda row: (row["scheduled_at"], row["id"]),
+    )
+    assert ids(paged) == ids(rows)
+
+
+async def test_interviews_page(storage):
+    rows = [
+        await storage.add_interview(interview(scheduled_at=FUTURE + i * DAY))
+        for i in range(5)
+    ]
+    await storage.archive_interviews_chunk(GUILD, FUTURE + 2 * DAY, 10)
+
+    for archived, expected in ((True, rows[:2]), (False, rows[2:])):
+        paged = await all_pages(
+            lambda **page: storage.get_interviews_page(GUILD, archived, **page),
+            lambda row: row["id"],
+        )
+        assert ids(paged) == ids(expected)
+
+
+async def test_user_history_page(storage):
+    rows = [
+        await storage.add_interview(interview(scheduled_at=FUTURE + i * DAY))
+        for i in range(5)
+    ]
+    await storage.add_interview(interview(user_id=BOB))
+    await storage.archive_interviews_chunk(GUILD, FUTURE + 2 * DAY, 10)
+
+    paged = await all_pages(
+        lambda **page: storage.get_user_history_page(GUILD, ALICE, **page),
+        lambda row: (row["scheduled_at"], row["id"]),
+    )
+    assert ids(paged) == ids(rows)[::-1]
+
+
+async def test_search_interviews(storage):
+    design = await storage.add_interview(interview(description="System design"))
+    systems = await storage.add_interview(
+        interview(user_id=BOB, user_name="bob", description="Systems programming")
+    )
+    await storage.add_interview(interview(description="Behavioural"))
+    archived = await storage.add_interview(
+        interview(scheduled_at=FUTURE - DAY, interview_type="System")
+    )
+    await storage.archive_interviews_chunk(GUILD, FUTURE, 10)
+    await storage.add_interview(interview(guild_id=OTHER_GUILD, description="System"))
+
+    # Words match as prefixes, in both tiers
+    found = await storage.search_interviews(GUILD, "syst", limit=100)
+    assert set(ids(found)) == {design["id"], systems["id"], archived["id"]}
+    assert all("rank" in row for row in found)
+
+    # Every word has to match, user names count, and a user can be singled out
+    assert ids(await storage.search_interviews(GUILD, "system des")) == [design["id"]]
+    assert ids(await storage.search_interviews(GUILD, "bob")) == [systems["id"]]
+    assert set(ids(await storage.search_interviews(GUILD, "syst", ALICE))) == {
+        design["id"],
+        archived["id"],
+    }
+
+    # Pages follow (rank, id) and add up to the whole result
+    paged = await all_pages(
+        lambda **page: storage.search_interviews(GUILD, "syst", **page),
+        lambda row: (row["rank"], row["id"]),
+        limit=1,
+    )
+    assert ids(paged) == ids(found)
+    assert [(row["rank"], row["id"]) for row in paged] == sorted(
+        (row["rank"], row["id"]) for row in paged
+    )
+
+    # Nothing to search for, and search syntax is taken literally
+    assert await storage.search_interviews(GUILD, "  !! ") == []
+    assert await storage.search_interviews(GUILD, 'design" OR "x') == []
+
+
+async def test_interview_counts(storage):
+    week, month = added_periods(DEFAULT_TIMEZONE)
+    await storage.add_interviews([interview(user_id=BOB, user_name="bob")] * 3)
+    alice = await storage.add_interview(interview())
+
+    for period in ("lifetime", "weekly", "monthly"):
+        counts = await storage.get_interview_counts(GUILD, period, week, month)
+        assert [
+            (row["user_name"], row["count"], row["lifetime"]) for row in counts
+        ] == [
+            ("bob", 3, 3),
+            ("alice", 1, 1),
+        ]
+
+    # Counters from an earlier week or month don't count now, and users with
+    # nothing in the period are left out
+    assert await storage.get_interview_counts(GUILD, "weekly", "1999-W01", month) == []
+    assert await storage.get_interview_counts(GUILD, "monthly", week, "1999-01") == []
+    await storage.delete_interview(GUILD, alice["id"], ALICE)
+    counts = await storage.get_interview_counts(GUILD, "weekly", week, month)
+    assert [row["user_name"] for row in counts] == ["bob"]
+    assert (
+        await storage.get_interview_counts(OTHER_GUILD, "lifetime", week, month) == []
+    )
+
+
+async def test_archive_interviews_chunk(storage):
+    rows = [
+        await storage.add_interview(interview(scheduled_at=FUTURE + i * DAY))
+        for i in range(5)
+    ]
+
+    # Oldest first, at most `limit`, only before `before`
+    moved = await storage.archive_interviews_chunk(GUILD, FUTURE + 3 * DAY, 2)
+    assert ids(moved) == ids(rows[:2])
+    moved = await storage.archive_interviews_chunk(GUILD, FUTURE + 3 * DAY, 2)
+    assert ids(moved) == ids(rows[2:3])
+    assert await storage.archive_interviews_chunk(GUILD, FUTURE + 3 * DAY, 2) == []
+
+    assert await storage.get_interview(GUILD, rows[0]["id"]) is None
+    history = await storage.get_user_interviews(GUILD, ALICE)
+    assert history == rows
+    # Archiving isn't cancelling, the counters stay
+    assert await storage.get_user_total_count(GUILD, ALICE) == 5
+
+
+async def test_adopt_legacy_interviews(storage):
+    await storage.add_interviews([interview(guild_id=0)] * 2)
+    await storage.add_interview(interview())
+    # Archived before the guild was known
+    await storage.add_interview(
+        interview(guild_id=0, scheduled_at=FUTURE - DAY, description="legacy")
+    )
+    archived = await storage.archive_interviews_chunk(0, FUTURE, 10)
+
+    assert await storage.adopt_legacy_interviews(GUILD) == 3
+    assert len(await storage.get_user_interviews(GUILD, ALICE)) == 4
+    assert await storage.get_user_total_count(GUILD, ALICE) == 4
+    assert await storage.get_user_total_count(0, ALICE) == 0
+    assert ids(await storage.get_interviews_page(GUILD, True)) == ids(archived)
+    assert ids(await storage.search_interviews(GUILD, "legacy")) == ids(archived)
+    assert await storage.get_user_interviews(0, ALICE) == []
+    assert await storage.adopt_legacy_interviews(GUILD) == 0
+
+
+async def test_upcoming_reminders(storage):
+    timed = await storage.add_interview(interview())
+    await storage.add_interview(interview(has_time=False))
+    await storage.add_interview(interview(scheduled_at=FUTURE - 2 * DAY))
+    other = await storage.add_interview(interview(guild_id=OTHER_GUILD))
+
+    upcoming = await storage.get_upcoming_reminders(FUTURE - DAY)
+    assert ids(upcoming) == ids([timed, other])
+
+
+# Guild settings
+
+
+async def test_guild_config(storage):
+    assert await storage.load_guild_configs() == []
+
+    config = {
+        "guild_id": GUILD,
+        "channel_id": 123,
+        "timezone": "Asia/Tokyo",
+        "reminder_hour": 9,
+    }
+    await storage.save_guild_config(config)
+    await storage.save_guild_config({**config, "reminder_hour": 7})
+
+    assert await storage.load_guild_configs() == [{**config, "reminder_hour": 7}]
+
+
+# Leases
+
+
+async def test_leases(storage):
+    won, holder, expires_at = await storage.acquire_lease("tasks", "a", 30)
+    assert (won, holder) == (True, "a")
+
+    # Taken, until its holder lets go
+    assert (await storage.acquire_lease("tasks", "b", 30))[:2] == (False, "a")
+    won, _, renewed_until = await storage.acquire_lease("tasks", "a", 60)
+    assert won and renewed_until > expires_at
+    await storage.release_lease("tasks", "b")
+    assert (await storage.acquire_lease("tasks", "b", 30))[:2] == (False, "a")
+    await storage.release_lease("tasks", "a")
+    assert (await storage.acquire_lease("tasks", "b", 30))[:2] == (True, "b")
+
+    # Leases are independent, and expire
+    assert (await storage.acquire_lease("other", "a", 0.05))[0]
+    await asyncio.sleep(0.2)
+    assert (await storage.acquire_lease("other", "c", 30))[:2] == (True, "c")
+
+
+# Change log
+
+
+async def read_all(storage, after, limit=100):
+    """Every change after `after`, merged like a tailer would apply them"""
+    interviews, deleted, configs = {}, {}, set()
+    while True:
+        changes = await storage.read_changes(after, limit)
+        if changes.cursor == after:
+            return Changes(after, interviews, deleted, configs)
+        for interview_id in changes.deleted:
+            interviews.pop(interview_id, None)
+        interviews.update(changes.interviews)
+        deleted.update(changes.deleted)
+        configs |= changes.configs
+        after = changes.cursor
+
+
+async def test_change_log(storage):
+    start = await storage.latest_change()
+    assert await storage.read_changes(start, 100) == (start, {}, {}, set())
+
+    kept = await storage.add_interview(interview())
+    gone = await storage.add_interview(interview(guild_id=OTHER_GUILD, user_id=BOB))
+    await storage.delete_interview(OTHER_GUILD, gone["id"], BOB)
+    await storage.save_guild_config(
+        {"guild_id": 3, "channel_id": None, "timezone": "UTC", "reminder_hour": 8}
+    )
+
+    # Current rows, and whose deleted ones were
+    changes = await read_all(storage, start)
+    assert changes.interviews == {kept["id"]: kept}
+    assert changes.deleted == {
+        gone["id"]: {"id": gone["id"], "guild_id": OTHER_GUILD, "user_id": BOB}
+    }
+    assert changes.configs == {3}
+    # Everything committed is behind the latest cursor
+    latest = await storage.latest_change()
+    assert (await storage.read_changes(latest, 100))[1:] == ({}, {}, set())
+
+    # Read a change at a time, the same changes come back
+    assert await read_all(storage, start, limit=1) == changes
+
+    # Nothing new, then only what's new
+    assert (await storage.read_changes(changes.cursor, 100)).cursor == changes.cursor
+    updated = (
+        await storage.update_interview(GUILD, kept["id"], ALICE, {"description": "x"})
+    )[1]
+    assert (await read_all(storage, changes.cursor))[1:] == (
+        {kept["id"]: updated},
+        {},
+        set(),
+    )
+
+
+async def test_ack_changes(storage):
+    start = await storage.latest_change()
+
+    # Unknown the first time only
+    assert await storage.ack_changes("a", start) is False
+    assert await storage.ack_changes("a", start) is True
+    assert await storage.ack_changes("b", start) is False
+
+
+async def test_prune_changes_keeps_what_readers_need(storage):
+    start = await storage.latest_change()
+    await storage.add_interview(interview())
+    middle = (await read_all(storage, start)).cursor
+    row = await storage.add_interview(interview())
+
+    # Nobody has read anything, nothing goes
+    await storage.prune_changes(60)
+    assert len((await read_all(storage, start)).interviews) == 2
+
+    # Only what every reader has applied goes
+    await storage.ack_changes("a", middle)
+    await storage.ack_changes("b", start)
+    await storage.prune_changes(60)
+    assert len((await read_all(storage, start)).interviews) == 2
+
+    await storage.ack_changes("b", middle)
+    await storage.prune_changes(60)
+    assert list((await read_all(storage, start)).interviews) == [row["id"]]
+
+
+async def test_prune_changes_drops_stale_readers(storage):
+    start = await storage.latest_change()
+    await storage.ack_changes("gone", start)
+    await asyncio.sleep(0.2)
+    await storage.add_interview(interview())
+    end = (await read_all(storage, start)).cursor
+    await storage.ack_changes("live", end)
+
+    await storage.prune_changes(0.1)
+    assert (await read_all(storage, start)).interviews == {}
+    # It finds out it was given up on when it comes back
+    assert await storage.ack_changes("gone", start) is False